@@ -1,13 +1,48 @@
-from flask import Flask, render_template, request, redirect, url_for, send_file
-import pandas as pd
+from flask import Flask, Response, render_template, request, redirect, url_for, jsonify, send_file
 import os
-from werkzeug.utils import secure_filename
-from src.milk_quality.pipelines.prediction import PredictionPipeline
+from src.milk_quality.utils import load_environment
+
+# Apply .env before the modules below read their MILK_* settings
+load_environment()
+
+from src.milk_quality.pipelines.prediction import (
+    PredictionPipeline,
+    parse_prediction_payload,
+)
+from src.milk_quality.result_store import ResultStore
+from src.milk_quality.result_stream import (
+    DEFAULT_PAGE_SIZE,
+    STREAM_CHUNK_ROWS,
+    accepts_gzip,
+    gzip_chunks,
+    iter_csv,
+    paginate,
+    stream_rows,
+)
+from src.milk_quality.micro_batcher import MicroBatcherConfig
+from src.milk_quality.metrics import CONTENT_TYPE, registry
+from src.milk_quality.request_profiler import PROFILE_HEADER, RequestProfiler, WSGIProfilerMiddleware
 
 app = Flask(__name__)
-UPLOAD_FOLDER = "artifacts"
-PREDICTION_CSV = os.path.join(UPLOAD_FOLDER, "predictions.csv")
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+
+# Set MILK_PROFILING=1 to sample the stacks of selected requests into
+# artifacts/profiles; otherwise the middleware is not installed at all
+profiler = RequestProfiler()
+if profiler.config.enabled:
+    app.wsgi_app = WSGIProfilerMiddleware(app.wsgi_app, profiler)
+
+# Shared across requests; the model and encoder are cached by the model registry.
+# Point MILK_MODEL_PATH at artifacts/model_compiled.pkl to serve the lookup-table model.
+# Point it at artifacts/model.joblib to serve the memory-mapped model format.
+# Set MILK_BATCHING=1 to coalesce concurrent small requests into one predict call.
+pipeline = PredictionPipeline(
+    model_path=os.getenv("MILK_MODEL_PATH", "artifacts/model.pkl"),
+    encoder_path="artifacts/label_encoder.pkl",
+    batcher_config=MicroBatcherConfig(),
+)
+
+# Per-request prediction results, so concurrent uploads never overwrite each other
+result_store = ResultStore()
 
 
 @app.route("/")
@@ -20,35 +55,143 @@ def predict():
     if request.method == "POST":
         file = request.files["file"]
         if file:
-            filename = secure_filename(file.filename)
-            input_path = os.path.join(UPLOAD_FOLDER, filename)
-            file.save(input_path)
-
-            # Run prediction pipeline
-            pipeline = PredictionPipeline(
-                model_path="artifacts/model.pkl",
-                encoder_path="artifacts/label_encoder.pkl",
-            )
-            pipeline.predict(input_csv_path=input_path, output_csv_path=PREDICTION_CSV)
-            return redirect(url_for("result"))
+            # Run prediction pipeline and keep the result under its own ID
+            try:
+                scored = pipeline.predict_csv_bytes(file.read())
+            except ValueError as e:
+                # A malformed CSV or rows that violate the milk schema
+                return jsonify(error=str(e)), 400
+            result_id = result_store.put(scored)
+            return redirect(url_for("result", result_id=result_id))
     return render_template("predict.html")  # Show file upload form
 
 
-@app.route("/result")
-def result():
-    if os.path.exists(PREDICTION_CSV):
-        df = pd.read_csv(PREDICTION_CSV)
-        table_html = df.to_html(classes="table table-bordered", index=False)
-        return render_template("result.html", table=table_html)
-    return "No prediction file found."
+@app.route("/api/predict", methods=["POST"])
+def api_predict():
+    # Score JSON records or CSV/Arrow bytes in memory and return predictions
+    try:
+        df = parse_prediction_payload(request.get_data(), request.content_type)
+        predictions = pipeline.predict_dataframe(df)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    return jsonify(predictions=predictions.tolist(), count=len(predictions))
+
+
+@app.route("/api/batching/stats")
+def batching_stats():
+    # Report micro-batch counts and fill rate
+    if pipeline.batcher is None:
+        return jsonify(enabled=False)
+    return jsonify(enabled=True, **pipeline.batcher.stats())
+
+
+@app.route("/metrics")
+def metrics():
+    # Prediction and pipeline metrics in the Prometheus text format
+    return Response(registry.render(), content_type=CONTENT_TYPE)
+
+
+def profiler_error():
+    if not profiler.config.enabled:
+        return jsonify(error="Profiling is disabled; set MILK_PROFILING=1."), 404
+    if not profiler.config.token:
+        return jsonify(error="Set MILK_PROFILE_TOKEN to use the profiling endpoints."), 403
+    if not profiler.authorized(request.headers.get(PROFILE_HEADER)):
+        return jsonify(error=f"Send the profiling token in {PROFILE_HEADER}."), 403
+    return None
+
+
+@app.route("/admin/profile", methods=["POST"])
+def arm_profiler():
+    # Profile the next N requests
+    error = profiler_error()
+    if error:
+        return error
+    requests = min(max(request.args.get("requests", 1, type=int), 1), 100)
+    return jsonify(armed=profiler.arm(requests))
+
+
+@app.route("/admin/profiles")
+def list_profiles():
+    error = profiler_error()
+    if error:
+        return error
+    limit = min(max(request.args.get("limit", 20, type=int), 1), 100)
+    return jsonify(profiles=profiler.list_profiles(limit))
+
+
+@app.route("/admin/profiles/<profile_id>")
+def get_profile(profile_id):
+    # Folded stacks of one profile, ready for flamegraph.pl or speedscope
+    error = profiler_error()
+    if error:
+        return error
+    path = profiler.folded_path(profile_id)
+    if path is None:
+        return jsonify(error="No such profile."), 404
+    return send_file(
+        os.path.abspath(path),
+        mimetype="text/plain",
+        as_attachment=True,
+        download_name=f"{profile_id}.folded",
+    )
+
+
+@app.route("/result/<result_id>")
+def result(result_id):
+    # Render one page of the results, optionally filtered by predicted grade
+    view = result_store.get_view(result_id)
+    if view is None:
+        return "No prediction file found.", 404
+    context = paginate(
+        view,
+        page=request.args.get("page", 1, type=int),
+        page_size=request.args.get("page_size", DEFAULT_PAGE_SIZE, type=int),
+        grade=request.args.get("grade"),
+    )
+    return render_template("result.html", result_id=result_id, **context)
+
+
+@app.route("/result/<result_id>/rows")
+def result_rows(result_id):
+    # Stream the results as NDJSON or an HTML table
+    view = result_store.get_view(result_id)
+    if view is None:
+        return jsonify(error="No prediction file found."), 404
+    try:
+        body, media_type = stream_rows(
+            view,
+            fmt=request.args.get("format", "ndjson"),
+            grade=request.args.get("grade"),
+            offset=request.args.get("offset", 0, type=int),
+            limit=request.args.get("limit", type=int),
+        )
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    return Response(body, content_type=media_type)
+
 
+@app.route("/download/<result_id>")
+def download(result_id):
+    # Stream the predictions CSV, gzipped when the client accepts it
+    view = result_store.get_view(result_id)
+    if view is None:
+        return "No file to download.", 404
 
-@app.route("/download")
-def download():
-    if os.path.exists(PREDICTION_CSV):
-        return send_file(PREDICTION_CSV, as_attachment=True)
-    return "No file to download."
+    body = iter_csv(view.iter_chunks(STREAM_CHUNK_ROWS))
+    headers = {
+        "Content-Disposition": 'attachment; filename="predictions.csv"',
+        "Vary": "Accept-Encoding",
+    }
+    if accepts_gzip(request.headers.get("Accept-Encoding")):
+        body = gzip_chunks(body)
+        headers["Content-Encoding"] = "gzip"
+    return Response(body, mimetype="text/csv", headers=headers)
 
 
 if __name__ == "__main__":
+    # Load the model before serving; set MILK_WARM_UP=0 to load it on the first request
+    if os.getenv("MILK_WARM_UP", "1") == "1":
+        pipeline.warm_up()
     app.run(host="0.0.0.0", port=5000, debug=True)
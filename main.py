@@ -1,17 +1,58 @@
-from fastapi import FastAPI, Request, UploadFile, File, Form
-from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse
+from fastapi import FastAPI, Request, Response, UploadFile, File, Form, Query
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, StreamingResponse, FileResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-import pandas as pd
+from fastapi.concurrency import run_in_threadpool
 import os
+from typing import Optional
+from src.milk_quality.utils import load_environment
+
+# Apply .env before the modules below read their MILK_* settings
+load_environment()
+
 from src.milk_quality.pipelines.prediction import PredictionPipeline
+from src.milk_quality.result_store import ResultStore
+from src.milk_quality.result_stream import (
+    DEFAULT_PAGE_SIZE,
+    STREAM_CHUNK_ROWS,
+    accepts_gzip,
+    gzip_chunks,
+    iter_csv,
+    paginate,
+    stream_rows,
+)
+from src.milk_quality.micro_batcher import MicroBatcherConfig
+from src.milk_quality.metrics import CONTENT_TYPE, ASGIMetricsMiddleware, registry
+from src.milk_quality.inference_executor import InferenceExecutor, InferenceQueueFull
+from src.milk_quality.request_profiler import PROFILE_HEADER, ASGIProfilerMiddleware, RequestProfiler
 
 # Initialize FastAPI app
 app = FastAPI()
 
-UPLOAD_FOLDER = "artifacts"
-PREDICTION_CSV = os.path.join(UPLOAD_FOLDER, "predictions.csv")
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+# Request counts and latency per route, exposed with the pipeline metrics on /metrics
+app.add_middleware(ASGIMetricsMiddleware)
+
+# Set MILK_PROFILING=1 to sample the stacks of selected requests into
+# artifacts/profiles; otherwise the middleware is not installed at all
+profiler = RequestProfiler()
+if profiler.config.enabled:
+    app.add_middleware(ASGIProfilerMiddleware, profiler=profiler)
+
+# Shared across requests; the model and encoder are cached by the model registry.
+# Point MILK_MODEL_PATH at artifacts/model_compiled.pkl to serve the lookup-table model.
+# Point it at artifacts/model.joblib to serve the memory-mapped model format.
+# Set MILK_BATCHING=1 to coalesce concurrent small requests into one predict call.
+pipeline = PredictionPipeline(
+    model_path=os.getenv("MILK_MODEL_PATH", "artifacts/model.pkl"),
+    encoder_path="artifacts/label_encoder.pkl",
+    batcher_config=MicroBatcherConfig(),
+)
+
+# Per-request prediction results, so concurrent uploads never overwrite each other
+result_store = ResultStore()
+
+# Bounded pool that keeps CPU-bound scoring off the event loop
+inference = InferenceExecutor()
 
 # Mount static folder if you have CSS/JS files
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -20,6 +61,30 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
 
+@app.exception_handler(InferenceQueueFull)
+async def inference_queue_full(request: Request, exc: InferenceQueueFull):
+    """Shed load instead of queueing without bound"""
+    return JSONResponse(
+        content={"error": "Inference queue is full, retry later."},
+        status_code=503,
+        headers={"Retry-After": "1"},
+    )
+
+
+@app.on_event("startup")
+async def warm_up_model():
+    """Load the model before serving; set MILK_WARM_UP=0 to load it on the first request"""
+    if os.getenv("MILK_WARM_UP", "1") == "1":
+        await run_in_threadpool(pipeline.warm_up)
+
+
+@app.on_event("shutdown")
+def shutdown_inference():
+    inference.shutdown()
+    if pipeline.batcher is not None:
+        pipeline.batcher.close()
+
+
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request):
     """Show home page with Get Started button"""
@@ -35,38 +100,145 @@ async def show_predict_page(request: Request):
 @app.post("/predict")
 async def predict(request: Request, file: UploadFile = File(...)):
     """Handle file upload and trigger prediction pipeline"""
-    filename = file.filename
-    input_path = os.path.join(UPLOAD_FOLDER, filename)
-
-    with open(input_path, "wb") as f:
-        f.write(await file.read())
-
-    # Run prediction pipeline
-    pipeline = PredictionPipeline(
-        model_path="artifacts/model.pkl",
-        encoder_path="artifacts/label_encoder.pkl",
+    data = await file.read()
+
+    # Run prediction pipeline in the inference pool and keep the result under its own ID
+    try:
+        scored = await inference.run(pipeline.predict_csv_bytes, data)
+    except ValueError as e:
+        # A malformed CSV or rows that violate the milk schema
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+    result_id = await run_in_threadpool(result_store.put, scored)
+
+    return RedirectResponse(url=f"/result/{result_id}", status_code=303)
+
+
+@app.post("/api/predict")
+async def api_predict(request: Request):
+    """Score JSON records or CSV/Arrow bytes in memory and return predictions"""
+    body = await request.body()
+    content_type = request.headers.get("content-type")
+    try:
+        if pipeline.batcher is not None:
+            # Parse and validate in the pool, then coalesce with other in-flight
+            # requests; the batcher's queue counts against the same pending bound
+            features = await inference.run(pipeline.prepare_payload, body, content_type)
+            predictions = await inference.track(lambda: pipeline.submit_features(features))
+        else:
+            predictions = await inference.run(pipeline.predict_payload, body, content_type)
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+
+    return {"predictions": predictions.tolist(), "count": len(predictions)}
+
+
+@app.get("/api/batching/stats")
+async def batching_stats():
+    """Report micro-batch counts and fill rate"""
+    if pipeline.batcher is None:
+        return {"enabled": False}
+    return {"enabled": True, **pipeline.batcher.stats()}
+
+
+@app.get("/metrics")
+async def metrics():
+    """Expose counters and histograms in the Prometheus text format"""
+    return Response(content=registry.render(), media_type=CONTENT_TYPE)
+
+
+def profiler_error(request: Request) -> Optional[JSONResponse]:
+    if not profiler.config.enabled:
+        return JSONResponse(content={"error": "Profiling is disabled; set MILK_PROFILING=1."}, status_code=404)
+    if not profiler.config.token:
+        return JSONResponse(content={"error": "Set MILK_PROFILE_TOKEN to use the profiling endpoints."}, status_code=403)
+    if not profiler.authorized(request.headers.get(PROFILE_HEADER)):
+        return JSONResponse(content={"error": f"Send the profiling token in {PROFILE_HEADER}."}, status_code=403)
+    return None
+
+
+@app.post("/admin/profile")
+async def arm_profiler(request: Request, requests: int = Query(1, ge=1, le=100)):
+    """Profile the next N requests"""
+    error = profiler_error(request)
+    if error:
+        return error
+    return {"armed": profiler.arm(requests)}
+
+
+@app.get("/admin/profiles")
+async def list_profiles(request: Request, limit: int = Query(20, ge=1, le=100)):
+    error = profiler_error(request)
+    if error:
+        return error
+    return {"profiles": profiler.list_profiles(limit)}
+
+
+@app.get("/admin/profiles/{profile_id}")
+async def get_profile(request: Request, profile_id: str):
+    """Folded stacks of one profile, ready for flamegraph.pl or speedscope"""
+    error = profiler_error(request)
+    if error:
+        return error
+    path = profiler.folded_path(profile_id)
+    if path is None:
+        return JSONResponse(content={"error": "No such profile."}, status_code=404)
+    return FileResponse(path, media_type="text/plain", filename=f"{profile_id}.folded")
+
+
+@app.get("/result/{result_id}", response_class=HTMLResponse)
+async def result(
+    request: Request,
+    result_id: str,
+    page: int = 1,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    grade: Optional[str] = None,
+):
+    """Display one page of the prediction results, optionally filtered by predicted grade"""
+    view = await run_in_threadpool(result_store.get_view, result_id)
+    if view is None:
+        return HTMLResponse(content="No prediction file found.", status_code=404)
+    context = await run_in_threadpool(paginate, view, page, page_size, grade)
+    return templates.TemplateResponse(
+        "result.html", {"request": request, "result_id": result_id, **context}
     )
-    pipeline.predict(input_csv_path=input_path, output_csv_path=PREDICTION_CSV)
-
-    return RedirectResponse(url="/result", status_code=303)
-
-
-@app.get("/result", response_class=HTMLResponse)
-async def result(request: Request):
-    """Display prediction results as HTML table"""
-    if os.path.exists(PREDICTION_CSV):
-        df = pd.read_csv(PREDICTION_CSV)
-        table_html = df.to_html(classes="table table-bordered", index=False)
-        return templates.TemplateResponse("result.html", {"request": request, "table": table_html})
-    return HTMLResponse(content="No prediction file found.", status_code=404)
 
 
-@app.get("/download")
-async def download():
-    """Download the predictions CSV"""
-    if os.path.exists(PREDICTION_CSV):
-        return FileResponse(PREDICTION_CSV, filename="predictions.csv", media_type="text/csv")
-    return HTMLResponse(content="No file to download.", status_code=404)
+@app.get("/result/{result_id}/rows")
+async def result_rows(
+    result_id: str,
+    fmt: str = Query("ndjson", alias="format"),
+    grade: Optional[str] = None,
+    offset: int = 0,
+    limit: Optional[int] = None,
+):
+    """Stream the prediction results as NDJSON or an HTML table"""
+    view = await run_in_threadpool(result_store.get_view, result_id)
+    if view is None:
+        return JSONResponse(content={"error": "No prediction file found."}, status_code=404)
+    try:
+        body, media_type = stream_rows(view, fmt, grade, offset, limit)
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+    # Starlette iterates the sync generator in the threadpool, a chunk at a time
+    return StreamingResponse(body, media_type=media_type)
+
+
+@app.get("/download/{result_id}")
+async def download(request: Request, result_id: str):
+    """Stream the predictions CSV, gzipped when the client accepts it"""
+    view = await run_in_threadpool(result_store.get_view, result_id)
+    if view is None:
+        return HTMLResponse(content="No file to download.", status_code=404)
+
+    body = iter_csv(view.iter_chunks(STREAM_CHUNK_ROWS))
+    headers = {
+        "Content-Disposition": 'attachment; filename="predictions.csv"',
+        "Vary": "Accept-Encoding",
+    }
+    if accepts_gzip(request.headers.get("accept-encoding")):
+        body = gzip_chunks(body)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(body, media_type="text/csv", headers=headers)
 
 
 # Run with: uvicorn app:app --host 0.0.0.0 --port 5000 --reload
@@ -1,42 +1,265 @@
 import os
+import glob
+import shutil
 import pandas as pd
+from bson import ObjectId
 from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional
 import sys
-from src.milk_quality.utils import get_collection_as_dataframe, write_csv
+from src.milk_quality.utils import iter_collection_batches, save_json, load_json
+from src.milk_quality.dataset_io import infer_format, read_dataset, write_dataset
+from src.milk_quality.schema import enforce_schema
 from src.milk_quality.logger import logging
 from src.milk_quality.exception import CustomException
 
 
 @dataclass
 class DataIngestionConfig:
+    # The extension picks the format: raw.csv (default), raw.parquet or raw.feather.
+    # CSV is appended batch by batch; columnar formats are rewritten from the store.
     raw_data_path: str = os.path.join("artifacts", "raw.csv")
+    # Documents fetched per cursor round trip and written per CSV append
+    batch_size: int = 10_000
+    # Incremental mode: only documents with _id above the saved high-water mark
+    # are fetched and appended. A full reload happens only when requested.
+    incremental: bool = True
+    # ObjectIds carry the writing client's clock, so a slow or skewed client can
+    # insert below the high-water mark. Each run re-reads this many seconds
+    # before it and skips the _ids it has already ingested.
+    overlap_seconds: int = 600
+    checkpoint_path: str = os.path.join("artifacts", "ingestion_checkpoint.json")
+    # Local columnar copy of everything ingested so far, one Parquet part per batch
+    store_dir: str = os.path.join("artifacts", "raw_store")
+
+
+def encode_watermark(value) -> dict:
+    if isinstance(value, ObjectId):
+        return {"type": "objectid", "value": str(value)}
+    return {"type": "raw", "value": value}
+
+
+def decode_watermark(watermark: dict):
+    if watermark["type"] == "objectid":
+        return ObjectId(watermark["value"])
+    return watermark["value"]
+
+
+def overlap_start(watermark: ObjectId, seconds: int) -> ObjectId:
+    # The smallest ObjectId a client could have generated `seconds` before watermark
+    return ObjectId.from_datetime(watermark.generation_time - timedelta(seconds=seconds))
+
+
+def csv_header(path: str) -> Optional[list]:
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return None
+    return list(pd.read_csv(path, nrows=0).columns)
 
 
 class DataIngestion:
-    def __init__(self):
+    def __init__(self, collection=None):
         self.ingestion_config = DataIngestionConfig()
+        # Defaults to the collection configured in .env; tests can pass a mongomock one
+        self.collection = collection
+
+    def load_checkpoint(self) -> Optional[dict]:
+        if not os.path.exists(self.ingestion_config.checkpoint_path):
+            return None
+        return load_json(self.ingestion_config.checkpoint_path)
+
+    def _save_checkpoint(self, checkpoint: dict) -> None:
+        # Write then rename, so a crash never leaves a truncated checkpoint
+        tmp_path = f"{self.ingestion_config.checkpoint_path}.tmp"
+        save_json(tmp_path, checkpoint)
+        os.replace(tmp_path, self.ingestion_config.checkpoint_path)
+
+    def load_raw_store(self) -> pd.DataFrame:
+        """
+        Read every Parquet part in the local store, in ingestion order.
+        """
+        parts = sorted(glob.glob(os.path.join(self.ingestion_config.store_dir, "part-*.parquet")))
+        if not parts:
+            return pd.DataFrame()
+        return pd.concat([read_dataset(part) for part in parts], ignore_index=True)
 
-    def initiate_data_ingestion(self) -> pd.DataFrame:
+    def _discard_uncheckpointed(self, checkpoint: dict) -> None:
+        """
+        Remove what a crashed run wrote after its last checkpoint: Parquet parts
+        numbered from next_part on, and raw CSV bytes past csv_bytes. The batch
+        they came from is fetched again, so it must not be kept twice.
+        """
+        config = self.ingestion_config
+        next_part = checkpoint["next_part"]
+        for path in glob.glob(os.path.join(config.store_dir, "part-*.parquet")):
+            if int(os.path.basename(path)[len("part-"):-len(".parquet")]) >= next_part:
+                logging.warning(f"Removing part written after the last checkpoint: {path}")
+                os.remove(path)
+        csv_bytes = checkpoint.get("csv_bytes")
+        if csv_bytes is not None and os.path.getsize(config.raw_data_path) > csv_bytes:
+            logging.warning("Truncating raw CSV rows appended after the last checkpoint.")
+            with open(config.raw_data_path, "r+b") as f:
+                f.truncate(csv_bytes)
+
+    def _reset(self) -> None:
+        config = self.ingestion_config
+        shutil.rmtree(config.store_dir, ignore_errors=True)
+        for path in (config.checkpoint_path, config.raw_data_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def initiate_data_ingestion(
+        self, return_dataframe: bool = True, full_reload: bool = False
+    ) -> Optional[pd.DataFrame]:
         """
         Ingest data from MongoDB and save raw CSV.
+
+        In incremental mode (the default) only documents added since the last
+        checkpoint are fetched, plus an overlap of overlap_seconds for clients
+        whose ObjectIds sort below it (deduplicated on _id). They are appended
+        to raw.csv in its existing column order and written as new Parquet
+        parts in the local store. Pass full_reload=True to start over.
+        The returned DataFrame holds only the rows ingested by this run; use
+        load_raw_store() for the full dataset.
         """
         logging.info("Data Ingestion started.")
 
         try:
-            # Load data from MongoDB
-            df = get_collection_as_dataframe()
-            logging.info("Data loaded successfully from MongoDB.")
+            config = self.ingestion_config
+            raw_data_path = config.raw_data_path
+
+            checkpoint = None
+            if config.incremental and not full_reload:
+                checkpoint = self.load_checkpoint()
+            if checkpoint is None or not os.path.exists(raw_data_path):
+                # No usable checkpoint: rebuild everything from scratch
+                logging.info("Running full ingestion.")
+                self._reset()
+                checkpoint = None
+            else:
+                logging.info(
+                    f"Running incremental ingestion from _id {checkpoint['watermark']['value']} "
+                    f"({checkpoint['total_rows']} rows already ingested)."
+                )
+                if "next_part" in checkpoint:
+                    self._discard_uncheckpointed(checkpoint)
 
             # Create directories if needed
-            os.makedirs(
-                os.path.dirname(self.ingestion_config.raw_data_path), exist_ok=True
+            os.makedirs(os.path.dirname(raw_data_path), exist_ok=True)
+            os.makedirs(config.store_dir, exist_ok=True)
+
+            query = {}
+            watermark = None
+            # _ids fetched again by the overlap that were already ingested
+            recent_ids = set()
+            if checkpoint is not None:
+                watermark = decode_watermark(checkpoint["watermark"])
+                if isinstance(watermark, ObjectId):
+                    start = overlap_start(watermark, config.overlap_seconds)
+                    query = {"_id": {"$gte": start}}
+                    if "recent_ids" in checkpoint:
+                        recent_ids = {ObjectId(value) for value in checkpoint["recent_ids"]}
+                    else:
+                        # Older checkpoints do not list them, but everything up to
+                        # the mark was ingested
+                        for ids in iter_collection_batches(
+                            self.collection,
+                            batch_size=config.batch_size,
+                            query={"_id": {"$gte": start, "$lte": watermark}},
+                            projection={"_id": 1},
+                            exclude_id=False,
+                        ):
+                            recent_ids.update(ids["_id"])
+                else:
+                    logging.warning(
+                        "Custom _ids cannot be re-read by time; documents inserted below "
+                        "the high-water mark are only picked up by a full reload."
+                    )
+                    query = {"_id": {"$gt": watermark}}
+
+            total_rows = checkpoint["total_rows"] if checkpoint else 0
+            new_rows = 0
+            append_csv = infer_format(raw_data_path) == "csv"
+            write_header = not os.path.exists(raw_data_path)
+            # Appended rows follow the existing header's column order
+            csv_columns = csv_header(raw_data_path) if append_csv else None
+            if checkpoint is not None and "next_part" in checkpoint:
+                part_no = checkpoint["next_part"]
+            else:
+                part_no = len(glob.glob(os.path.join(config.store_dir, "part-*.parquet")))
+            new_parts = []
+
+            batches = iter_collection_batches(
+                self.collection,
+                batch_size=config.batch_size,
+                query=query,
+                sort=[("_id", 1)],
+                exclude_id=False,
             )
+            for chunk in batches:
+                # Sorted by _id, but the overlap starts below the saved mark
+                if watermark is None or chunk["_id"].iloc[-1] > watermark:
+                    watermark = chunk["_id"].iloc[-1]
+                ids = chunk["_id"]
+                chunk = chunk[~ids.isin(recent_ids)].drop(columns=["_id"])
+                if isinstance(watermark, ObjectId):
+                    earliest = overlap_start(watermark, config.overlap_seconds)
+                    recent_ids = {value for value in recent_ids.union(ids) if value >= earliest}
+                if chunk.empty:
+                    # Only documents the overlap had already ingested
+                    continue
+                # Bad documents are dropped here so they never reach the raw store;
+                # the watermark still advances past them.
+                chunk = enforce_schema(chunk, require_target=True, context="ingestion batch")
+
+                # Parquet part first (atomic rename), then the CSV append, then the
+                # checkpoint. The checkpoint records the next part number and the
+                # CSV size, so a restart after a crash between these steps removes
+                # the half-committed batch before fetching it again.
+                part_path = os.path.join(config.store_dir, f"part-{part_no:06d}.parquet")
+                write_dataset(chunk, part_path)
+                new_parts.append(part_path)
+                if append_csv:
+                    if csv_columns is None:
+                        csv_columns = list(chunk.columns)
+                    elif set(chunk.columns) != set(csv_columns):
+                        raise ValueError(
+                            f"Ingested columns {sorted(chunk.columns)} do not match the raw CSV "
+                            f"header {csv_columns}; run a full reload."
+                        )
+                    chunk[csv_columns].to_csv(raw_data_path, mode="a", index=False, header=write_header)
+                    write_header = False
 
-            # Save as raw CSV
-            write_csv(df, self.ingestion_config.raw_data_path)
-            logging.info(f"Raw data saved at: {self.ingestion_config.raw_data_path}")
+                part_no += 1
+                new_rows += len(chunk)
+                total_rows += len(chunk)
+                self._save_checkpoint(
+                    {
+                        "watermark": encode_watermark(watermark),
+                        "recent_ids": sorted(str(value) for value in recent_ids),
+                        "total_rows": total_rows,
+                        "next_part": part_no,
+                        "csv_bytes": os.path.getsize(raw_data_path) if append_csv else None,
+                        "updated_at": datetime.now(timezone.utc).isoformat(),
+                    }
+                )
+
+            if not append_csv:
+                if new_rows or not os.path.exists(raw_data_path):
+                    write_dataset(self.load_raw_store(), raw_data_path)
+            elif write_header:
+                # Nothing was ever ingested; leave an empty raw CSV behind
+                open(raw_data_path, "w").close()
+
+            logging.info(
+                f"Raw data saved at: {raw_data_path} "
+                f"({new_rows} new rows, {total_rows} rows in total)"
+            )
 
-            return df
+            if not return_dataframe:
+                return None
+            if not new_parts:
+                return pd.DataFrame()
+            return pd.concat([read_dataset(part) for part in new_parts], ignore_index=True)
 
         except Exception as e:
             logging.error("Data ingestion failed.", exc_info=True)
@@ -5,71 +5,150 @@ from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
 from src.milk_quality.logger import logging
 from src.milk_quality.exception import CustomException
-from src.milk_quality.utils import save_object
+from src.milk_quality.utils import load_object, save_object
+from src.milk_quality.dataset_io import artifact_path, read_dataset, write_dataset
+from src.milk_quality.schema import enforce_schema
+from src.milk_quality.components import preprocessor
+from src.milk_quality.components.preprocessor import FeaturePreprocessor
+from src.milk_quality import dataset_io, schema
+from src.milk_quality.stage_cache import stage_cache
 
 
 class DataTransformationConfig:
     processed_data_dir = os.path.join("artifacts")
     preprocessor_obj_file_path = os.path.join(processed_data_dir, "label_encoder.pkl")
-    train_csv_path = os.path.join(processed_data_dir, "train.csv")
-    test_csv_path = os.path.join(processed_data_dir, "test.csv")
+    # Fitted imputation applied to features at training and prediction time
+    feature_preprocessor_path = os.path.join(processed_data_dir, "feature_preprocessor.pkl")
+    # csv (default, backwards compatible), parquet or feather
+    dataset_format = os.getenv("MILK_DATASET_FORMAT", "csv")
+    train_csv_path = artifact_path(processed_data_dir, "train", dataset_format)
+    test_csv_path = artifact_path(processed_data_dir, "test", dataset_format)
+    test_size = 0.3
+    random_state = 42
 
 
 class DataTransformation:
     def __init__(self):
         self.config = DataTransformationConfig()
 
+    def stage_spec(self, df: pd.DataFrame) -> dict:
+        # Cache key parts and outputs, shared with the training DAG
+        return {
+            "inputs": {"raw": df},
+            "params": {
+                "test_size": self.config.test_size,
+                "random_state": self.config.random_state,
+                "dataset_format": self.config.dataset_format,
+            },
+            "code": [__file__, schema.__file__, dataset_io.__file__, preprocessor.__file__],
+            "outputs": [
+                self.config.train_csv_path,
+                self.config.test_csv_path,
+                self.config.preprocessor_obj_file_path,
+                self.config.feature_preprocessor_path,
+            ],
+        }
+
     def initiate_data_transformation(self, df: pd.DataFrame):
+        """
+        Split and encode df, skipping the work when df, the split parameters and
+        this code are unchanged since the cached run.
+        """
+        result = stage_cache.run("data_transformation", lambda: self._transform(df), **self.stage_spec(df))
+        return tuple(result)
+
+    def load_split(self):
+        """
+        Read a saved split back: (train_df, test_df, label_encoder, feature_preprocessor).
+        """
+        return (
+            enforce_schema(
+                read_dataset(self.config.train_csv_path), require_target=True, context="training set"
+            ),
+            enforce_schema(
+                read_dataset(self.config.test_csv_path), require_target=True, context="test set"
+            ),
+            load_object(self.config.preprocessor_obj_file_path),
+            load_object(self.config.feature_preprocessor_path),
+        )
+
+    def split(self, df: pd.DataFrame):
+        """
+        Validate, encode, split and impute df in memory.
+
+        Returns (train_df, test_df, label_encoder, feature_preprocessor). The
+        preprocessor is fitted on the training split only.
+        """
+        # Drop rows that violate the milk schema and downcast the rest
+        df = enforce_schema(df, require_target=True, context="data transformation")
+
+        # Separate features and target
+        X = df.drop("Grade", axis=1)
+        y = df["Grade"]
+
+        # Encode target using LabelEncoder
+        label_encoder = LabelEncoder()
+        y_encoded = label_encoder.fit_transform(y)
+        logging.info(
+            f"Target classes after encoding: {list(label_encoder.classes_)}"
+        )
+
+        # Split into train-test sets
+        X_train, X_test, y_train, y_test = train_test_split(
+            X,
+            y_encoded,
+            test_size=self.config.test_size,
+            random_state=self.config.random_state,
+        )
+
+        # Fill missing values with the training-set mode of each feature
+        feature_preprocessor = FeaturePreprocessor().fit(X_train)
+        n_missing = int(X.isna().to_numpy().sum())
+        if n_missing:
+            logging.warning(f"{n_missing} missing values found; filling with the training mode.")
+        else:
+            logging.info("No missing values found.")
+
+        # Combined train and test frames
+        train_df = feature_preprocessor.transform(X_train).copy()
+        train_df["Grade"] = y_train
+        test_df = feature_preprocessor.transform(X_test).copy()
+        test_df["Grade"] = y_test
+        return train_df, test_df, label_encoder, feature_preprocessor
+
+    def result_paths(self):
+        """
+        What initiate_data_transformation returns: (train path, test path, encoder path).
+        """
+        return (
+            self.config.train_csv_path,
+            self.config.test_csv_path,
+            self.config.preprocessor_obj_file_path,
+        )
+
+    def _transform(self, df: pd.DataFrame):
         logging.info("Data Transformation initiated.")
         try:
-            # Handle missing values (for future use)
-            if df.isnull().sum().sum() > 0:
-                logging.warning("Missing values found. Filling with mode for now.")
-                df.fillna(df.mode().iloc[0], inplace=True)
-            else:
-                logging.info("No missing values found.")
-
-            # Separate features and target
-            X = df.drop("Grade", axis=1)
-            y = df["Grade"]
-
-            # Encode target using LabelEncoder
-            label_encoder = LabelEncoder()
-            y_encoded = label_encoder.fit_transform(y)
-            logging.info(
-                f"Target classes after encoding: {list(label_encoder.classes_)}"
-            )
-
-            # Split into train-test sets
-            X_train, X_test, y_train, y_test = train_test_split(
-                X, y_encoded, test_size=0.3, random_state=42
-            )
+            train_df, test_df, label_encoder, feature_preprocessor = self.split(df)
 
             # Create output directory
             os.makedirs(self.config.processed_data_dir, exist_ok=True)
 
-            # Save combined train and test CSVs
-            train_df = X_train.copy()
-            train_df["Grade"] = y_train
-            test_df = X_test.copy()
-            test_df["Grade"] = y_test
-
-            train_df.to_csv(self.config.train_csv_path, index=False)
-            test_df.to_csv(self.config.test_csv_path, index=False)
+            write_dataset(train_df, self.config.train_csv_path)
+            write_dataset(test_df, self.config.test_csv_path)
 
-            logging.info("train.csv and test.csv saved successfully.")
+            logging.info("Train and test datasets saved successfully.")
 
             # Save label encoder
             save_object(self.config.preprocessor_obj_file_path, label_encoder)
             logging.info("Label encoder saved successfully.")
 
+            save_object(self.config.feature_preprocessor_path, feature_preprocessor)
+            logging.info("Feature preprocessor saved successfully.")
+
             logging.info("Data transformation completed successfully.")
 
-            return (
-                self.config.train_csv_path,
-                self.config.test_csv_path,
-                self.config.preprocessor_obj_file_path,
-            )
+            return self.result_paths()
 
         except Exception as e:
             raise CustomException(e, sys)
@@ -0,0 +1,266 @@
+import os
+import sys
+import time
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.milk_quality.logger import logging
+from src.milk_quality.exception import CustomException
+from src.milk_quality.utils import load_object, save_object
+from src.milk_quality.dataset_io import read_dataset
+from src.milk_quality import dataset_io
+from src.milk_quality.stage_cache import stage_cache
+from sklearn.ensemble import (
+    ExtraTreesClassifier,
+    GradientBoostingClassifier,
+    HistGradientBoostingClassifier,
+    RandomForestClassifier,
+)
+
+# Tree ensembles that split on float32 features or on bins between observed values
+FLOAT32_MODELS = (
+    RandomForestClassifier,
+    ExtraTreesClassifier,
+    GradientBoostingClassifier,
+    HistGradientBoostingClassifier,
+)
+
+
+class ModelCompilerConfig:
+    compiled_model_path = os.path.join("artifacts", "model_compiled.pkl")
+    # Refuse to enumerate grids larger than this many feature combinations
+    max_grid_cells = 5_000_000
+    grid_chunk_rows = 200_000
+
+
+class LookupTablePredictor:
+    """
+    Model outputs precomputed over the grid of observed feature values.
+
+    Each feature value is mapped to its position in a sorted level array, the
+    positions are combined into a flat index and the answer is read from a NumPy
+    table. Rows containing a value outside the grid are sent to the original model,
+    so predictions always match it exactly.
+
+    Values are matched in value_dtype. Forests and gradient boosting compare
+    features as float32 (histogram gradient boosting splits between observed
+    values), so matching in float32 lets 6.6 read as float64 (CSV, JSON) and as
+    float32 (compact Parquet/Feather) hit the same cell.
+    """
+
+    def __init__(
+        self,
+        model,
+        feature_names: List[str],
+        levels: List[np.ndarray],
+        table: np.ndarray,
+        value_dtype=np.float64,
+    ):
+        self.model = model
+        self.value_dtype = value_dtype
+        self.feature_names = list(feature_names)
+        self.feature_names_in_ = np.asarray(self.feature_names, dtype=object)
+        self.classes_ = getattr(model, "classes_", None)
+        self.levels = levels
+        self.table = table
+        sizes = [len(level) for level in levels]
+        # Row-major strides matching np.ravel_multi_index
+        self.strides = np.array(
+            [int(np.prod(sizes[i + 1:])) for i in range(len(sizes))], dtype=np.int64
+        )
+
+    def lookup(self, X):
+        """
+        Return (flat table index, hit mask) for every row of X.
+
+        X is a DataFrame, or a 2-D array with columns in feature_names order
+        (the faster path for single-row requests).
+        """
+        if isinstance(X, pd.DataFrame):
+            # Column-wise access avoids materialising a 2-D copy of the frame
+            columns = [X[name].to_numpy(dtype=self.value_dtype) for name in self.feature_names]
+        else:
+            X = np.asarray(X, dtype=self.value_dtype)
+            columns = [X[:, j] for j in range(X.shape[1])]
+
+        flat_index = np.zeros(len(columns[0]), dtype=np.int64)
+        hit = np.ones(len(columns[0]), dtype=bool)
+        for j, (level, column) in enumerate(zip(self.levels, columns)):
+            position = np.searchsorted(level, column)
+            np.minimum(position, len(level) - 1, out=position)
+            hit &= level[position] == column
+            flat_index += position * self.strides[j]
+        return flat_index, hit
+
+    def predict(self, X) -> np.ndarray:
+        flat_index, hit = self.lookup(X)
+        if hit.all():
+            return self.table[flat_index]
+
+        predictions = np.empty(len(hit), dtype=self.table.dtype)
+        predictions[hit] = self.table[flat_index[hit]]
+        misses = ~hit
+        if isinstance(X, pd.DataFrame):
+            unseen = X.loc[misses, self.feature_names]
+        else:
+            unseen = pd.DataFrame(np.asarray(X)[misses], columns=self.feature_names)
+        predictions[misses] = self.model.predict(unseen)
+        return predictions
+
+
+class ModelCompiler:
+    def __init__(self):
+        self.config = ModelCompilerConfig()
+
+    def build(self, model, feature_frames: List[pd.DataFrame]) -> LookupTablePredictor:
+        """
+        Enumerate the observed feature grid and record the model's output for each cell.
+        """
+        feature_names = list(getattr(model, "feature_names_in_", feature_frames[0].columns))
+        features = pd.concat([df[feature_names] for df in feature_frames], ignore_index=True)
+        value_dtype = (
+            np.float32 if isinstance(model, FLOAT32_MODELS) else np.float64
+        )
+        levels = [
+            np.unique(features[name].to_numpy(dtype=value_dtype)) for name in feature_names
+        ]
+        sizes = [len(level) for level in levels]
+        n_cells = int(np.prod(sizes))
+        logging.info(f"Compiling model over grid {dict(zip(feature_names, sizes))} = {n_cells} cells")
+        if n_cells > self.config.max_grid_cells:
+            raise ValueError(
+                f"Feature grid has {n_cells} cells, above the limit of {self.config.max_grid_cells}."
+            )
+
+        table = None
+        for start in range(0, n_cells, self.config.grid_chunk_rows):
+            flat = np.arange(start, min(start + self.config.grid_chunk_rows, n_cells))
+            positions = np.unravel_index(flat, sizes)
+            grid = pd.DataFrame(
+                {
+                    name: level[position]
+                    for name, level, position in zip(feature_names, levels, positions)
+                }
+            )
+            # Match the dtypes the model was trained with
+            grid = grid.astype(features.dtypes.to_dict())
+            outputs = model.predict(grid)
+            if table is None:
+                table = np.empty(n_cells, dtype=outputs.dtype)
+            table[flat] = outputs
+
+        return LookupTablePredictor(model, feature_names, levels, table, value_dtype)
+
+    def _stage(
+        self, model_path: str, train_csv_path: str, test_csv_path: str, output_path: str
+    ) -> dict:
+        # Cache key parts and outputs, shared by both entry points
+        return {
+            "inputs": {"model": model_path, "train": train_csv_path, "test": test_csv_path},
+            "params": {"max_grid_cells": self.config.max_grid_cells},
+            "code": [__file__, dataset_io.__file__],
+            "outputs": [output_path],
+        }
+
+    def compile(
+        self,
+        model_path: str,
+        train_csv_path: str,
+        test_csv_path: str,
+        output_path: Optional[str] = None,
+    ) -> str:
+        """
+        Compile the trained model into a lookup table, verify it on the held-out test set and save it.
+
+        Skipped when the model, the data and this code are unchanged since the
+        cached run.
+        """
+        output_path = output_path or self.config.compiled_model_path
+        return stage_cache.run(
+            "model_compilation",
+            lambda: self._compile(model_path, train_csv_path, test_csv_path, output_path),
+            **self._stage(model_path, train_csv_path, test_csv_path, output_path),
+        )
+
+    def compile_trained(
+        self,
+        model,
+        X_train: pd.DataFrame,
+        X_test: pd.DataFrame,
+        model_path: str,
+        train_csv_path: str,
+        test_csv_path: str,
+        output_path: Optional[str] = None,
+    ) -> str:
+        """
+        Like compile, for a model and features already in memory. They must be
+        what model_path, train_csv_path and test_csv_path hold: those files key the cache.
+        """
+        output_path = output_path or self.config.compiled_model_path
+        return stage_cache.run(
+            "model_compilation",
+            lambda: self.compile_model(model, X_train, X_test, output_path),
+            **self._stage(model_path, train_csv_path, test_csv_path, output_path),
+        )
+
+    def _compile(
+        self, model_path: str, train_csv_path: str, test_csv_path: str, output_path: str
+    ) -> str:
+        logging.info("Model compilation started.")
+        try:
+            model = load_object(model_path)
+
+            train_df = read_dataset(train_csv_path)
+            test_df = read_dataset(test_csv_path)
+            X_train = train_df.drop("Grade", axis=1)
+            X_test = test_df.drop("Grade", axis=1)
+            return self.compile_model(model, X_train, X_test, output_path)
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def compile_model(
+        self, model, X_train: pd.DataFrame, X_test: pd.DataFrame, output_path: str
+    ) -> str:
+        """
+        Compile an in-memory model over the training features, verify it on the
+        held-out test rows and save it.
+        """
+        try:
+            # Test rows stay out of the grid, so the rows they hit check cells the
+            # table filled in rather than answers it was built from
+            compiled = self.build(model, [X_train])
+
+            # Exact agreement with the original model is required before saving
+            start = time.perf_counter()
+            expected = model.predict(X_test)
+            model_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            actual = compiled.predict(X_test)
+            compiled_seconds = time.perf_counter() - start
+
+            mismatches = int((expected != actual).sum())
+            if mismatches:
+                raise ValueError(
+                    f"Compiled model disagrees with the original on {mismatches} test rows."
+                )
+
+            # Misses are answered by the original model, so only hits test the table
+            _, hit = compiled.lookup(X_test)
+            if not hit.any():
+                raise ValueError("No test row falls on the feature grid; the table is unverified.")
+            logging.info(
+                f"Compiled model matches original on {len(X_test)} held-out test rows "
+                f"({int(hit.sum())} answered by the table); predict time "
+                f"{model_seconds * 1000:.2f} ms -> {compiled_seconds * 1000:.3f} ms"
+            )
+
+            save_object(output_path, compiled)
+            logging.info(f"Compiled model saved at: {output_path}")
+            return output_path
+
+        except Exception as e:
+            raise CustomException(e, sys)
@@ -0,0 +1,352 @@
+import time
+import numpy as np
+import pandas as pd
+from scipy.stats import randint, uniform
+from sklearn.model_selection import (
+    ParameterSampler,
+    StratifiedKFold,
+    cross_val_score,
+    train_test_split,
+)
+from sklearn.ensemble import (
+    RandomForestClassifier,
+    GradientBoostingClassifier,
+    HistGradientBoostingClassifier,
+)
+from joblib import effective_n_jobs
+from sklearn.base import clone
+from sklearn.metrics import f1_score
+from src.milk_quality.logger import logging
+
+
+class ModelSearchConfig:
+    # Estimator and parameter distributions searched for each family
+    search_spaces = {
+        "RandomForest": (
+            RandomForestClassifier,
+            {
+                "n_estimators": randint(25, 300),
+                "max_depth": [None, 6, 10, 16],
+                "min_samples_leaf": randint(1, 5),
+                "max_features": ["sqrt", "log2", None],
+            },
+        ),
+        "GradientBoosting": (
+            GradientBoostingClassifier,
+            {
+                "n_estimators": randint(25, 300),
+                "learning_rate": uniform(0.02, 0.3),
+                "max_depth": randint(2, 6),
+                "subsample": uniform(0.6, 0.4),
+            },
+        ),
+        "HistGradientBoosting": (
+            HistGradientBoostingClassifier,
+            {
+                "max_iter": randint(50, 400),
+                "learning_rate": uniform(0.02, 0.3),
+                "max_leaf_nodes": randint(8, 64),
+                "l2_regularization": uniform(0.0, 1.0),
+            },
+        ),
+    }
+    # Sampled configurations per family; successive halving drops the weak ones
+    # after each round on a growing share of the training rows.
+    n_candidates = 24
+    halving_factor = 3
+    cv_folds = 3
+    n_jobs = -1
+    # Each family gets an equal share of what is left of the budget: its search
+    # uses fewer rows, then fewer candidates, when a probe fit predicts it would overrun.
+    # Families that have not started when the budget runs out are skipped.
+    time_budget_seconds = 600.0
+    # Rows the probe fit (used to predict a family's search time) is timed on
+    probe_rows = 2000
+    # Candidates within this CV F1 of the best are ranked by inference latency instead
+    f1_tolerance = 0.005
+    latency_rows = 1000
+    latency_repeats = 5
+    random_state = 42
+
+
+def measure_latency_per_row(model, X: pd.DataFrame, rows: int, repeats: int) -> float:
+    """
+    Best-of-repeats batch predict time divided by the number of rows, in seconds.
+    """
+    reps = int(np.ceil(rows / len(X)))
+    batch = pd.concat([X] * reps, ignore_index=True).iloc[:rows]
+    model.predict(batch.iloc[:1])  # warm-up
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        model.predict(batch)
+        best = min(best, time.perf_counter() - start)
+    return best / len(batch)
+
+
+class ModelSearch:
+    def __init__(self):
+        self.config = ModelSearchConfig()
+
+    def _schedule(self, n_candidates: int, max_resources: int, rows_floor: int):
+        """
+        (candidates, rows) per halving round: the last round trains on
+        max_resources rows and each round before it on factor times fewer.
+        """
+        factor = self.config.halving_factor
+        rounds = 1 + int(np.floor(np.log(n_candidates) / np.log(factor)))
+        min_resources = max(max_resources // factor ** (rounds - 1), rows_floor)
+        return [
+            (
+                int(np.ceil(n_candidates / factor**i)),
+                max_resources if i == rounds - 1 else min(min_resources * factor**i, max_resources),
+            )
+            for i in range(rounds)
+        ]
+
+    def _search_seconds(
+        self, n_candidates: int, max_resources: int, rows_floor: int, fit_seconds, workers: int
+    ) -> float:
+        # Candidates run one after another, their folds in parallel; then the
+        # winner is refit on every row
+        folds = self.config.cv_folds
+        total = 0.0
+        for n, rows in self._schedule(n_candidates, max_resources, rows_floor):
+            total += n * folds * fit_seconds(rows) / min(workers, folds)
+        return total + fit_seconds(max_resources)
+
+    def plan_budget(self, estimator, X_train, y_train, seconds: float):
+        """
+        Return (n_candidates, max_resources) for a halving search expected to
+        finish within `seconds`, or None when even the smallest search would not.
+
+        One default fit is timed on probe_rows rows; a fit on r rows is assumed
+        to cost that much times r / probe_rows, and never less. Training rows are
+        cut first, then candidates. This only sizes the search: sampled
+        hyperparameters can cost more than the defaults, so halving_search also
+        stops at its deadline.
+        """
+        n_rows = len(X_train)
+        rng = np.random.default_rng(self.config.random_state)
+        probe = rng.permutation(n_rows)[: self.config.probe_rows]
+        start = time.perf_counter()
+        estimator.fit(X_train.iloc[probe], y_train[probe])
+        probe_seconds = time.perf_counter() - start
+
+        def fit_seconds(rows):
+            return probe_seconds * max(rows, len(probe)) / len(probe)
+
+        workers = effective_n_jobs(self.config.n_jobs)
+        factor = self.config.halving_factor
+        n_candidates, max_resources = self.config.n_candidates, n_rows
+        # Halving needs a few rows per class and fold in its first round
+        rows_floor = 2 * self.config.cv_folds * len(np.unique(y_train))
+
+        def fits(n, r):
+            return self._search_seconds(n, r, rows_floor, fit_seconds, workers) <= seconds
+
+        while not fits(n_candidates, max_resources):
+            rounds = 1 + int(np.floor(np.log(n_candidates) / np.log(factor)))
+            smaller = max_resources // 2
+            if smaller >= max(rows_floor * factor ** (rounds - 1), len(probe)):
+                max_resources = smaller
+            elif n_candidates > factor:
+                n_candidates -= 1
+            else:
+                return None
+        return n_candidates, max_resources
+
+    def _subsample(self, X_train, y_train, n_rows: int):
+        if n_rows >= len(X_train):
+            return X_train, y_train
+        index = np.arange(len(X_train))
+        try:
+            index, _ = train_test_split(
+                index, train_size=n_rows, stratify=y_train, random_state=self.config.random_state
+            )
+        except ValueError:
+            # A class too small to stratify on
+            index, _ = train_test_split(index, train_size=n_rows, random_state=self.config.random_state)
+        index = np.sort(index)
+        return X_train.iloc[index], y_train[index]
+
+    def halving_search(
+        self, estimator, space, X_train, y_train, n_candidates: int, max_resources: int, deadline: float
+    ) -> dict:
+        """
+        Successive halving over n_candidates sampled configurations, stopped at deadline.
+
+        Each round cross-validates the surviving candidates on a growing share
+        of the rows and keeps the best 1/factor of them. The clock is checked
+        before every candidate. Past the deadline the round is abandoned and the
+        last completed round decides; a first round keeps what it finished. At
+        least one candidate is always evaluated, and the winner is refit on
+        every row.
+        """
+        rows_floor = 2 * self.config.cv_folds * len(np.unique(y_train))
+        cv = StratifiedKFold(self.config.cv_folds, shuffle=True, random_state=self.config.random_state)
+        survivors = list(ParameterSampler(space, n_candidates, random_state=self.config.random_state))
+        ranked = []
+        candidates_per_round = []
+        budget_exceeded = False
+
+        for _, n_rows in self._schedule(n_candidates, max_resources, rows_floor):
+            X_round, y_round = self._subsample(X_train, y_train, n_rows)
+            scores = []
+            for params in survivors:
+                if (ranked or scores) and time.perf_counter() > deadline:
+                    budget_exceeded = True
+                    break
+                fold_scores = cross_val_score(
+                    clone(estimator).set_params(**params),
+                    X_round,
+                    y_round,
+                    cv=cv,
+                    scoring="f1_weighted",
+                    n_jobs=self.config.n_jobs,
+                )
+                score = float(np.mean(fold_scores))
+                # A configuration that failed to fit scores NaN; rank it last
+                scores.append((score if np.isfinite(score) else -np.inf, params))
+            if budget_exceeded and ranked:
+                break
+            ranked = sorted(scores, key=lambda item: item[0], reverse=True)
+            candidates_per_round.append(len(scores))
+            if budget_exceeded:
+                break
+            survivors = [params for _, params in ranked[: int(np.ceil(len(ranked) / self.config.halving_factor))]]
+
+        best_score, best_params = ranked[0]
+        model = clone(estimator).set_params(**best_params).fit(X_train, y_train)
+        return {
+            "model": model,
+            "best_params": best_params,
+            "cv_f1": best_score,
+            "candidates_per_round": candidates_per_round,
+            "budget_exceeded": budget_exceeded or time.perf_counter() > deadline,
+        }
+
+    def search(self, X_train, y_train, X_test, y_test):
+        """
+        Run a halving random search per family and pick the winner on CV F1 and latency.
+
+        The test set is only scored for the report, never used to choose. A
+        family's search stops at its share of the budget; report["budget_exceeded"]
+        is set when any search or the whole run went over.
+
+        Returns (best_name, best_model, report) where report holds per-family
+        scores, latencies and search timings.
+        """
+        started = time.perf_counter()
+        candidates = {}
+        skipped = []
+
+        families = list(self.config.search_spaces.items())
+        for i, (name, (estimator_cls, space)) in enumerate(families):
+            elapsed = time.perf_counter() - started
+            remaining = self.config.time_budget_seconds - elapsed
+            if remaining <= 0:
+                logging.warning(
+                    f"Search time budget exhausted after {elapsed:.1f}s; skipping {name}."
+                )
+                skipped.append(name)
+                continue
+
+            estimator = estimator_cls(random_state=self.config.random_state)
+            share = remaining / (len(families) - i)
+            plan = self.plan_budget(clone(estimator), X_train, y_train, share)
+            if plan is None and candidates:
+                logging.warning(
+                    f"Even the smallest {name} search would overrun its {share:.1f}s budget; skipping it."
+                )
+                skipped.append(name)
+                continue
+            # With nothing evaluated yet, run the smallest search rather than return no model
+            n_candidates, max_resources = plan or (
+                self.config.halving_factor,
+                min(len(X_train), self.config.probe_rows),
+            )
+            logging.info(
+                f"Searching {name} ({n_candidates} candidates, "
+                f"up to {max_resources} rows, {share:.0f}s budget)."
+            )
+            search_start = time.perf_counter()
+            result = self.halving_search(
+                estimator,
+                space,
+                X_train,
+                y_train,
+                n_candidates,
+                max_resources,
+                deadline=search_start + share,
+            )
+            search_seconds = time.perf_counter() - search_start
+            if result["budget_exceeded"]:
+                logging.warning(
+                    f"{name} search overran its {share:.1f}s budget ({search_seconds:.1f}s); "
+                    f"kept the best of {result['candidates_per_round']} candidates per round."
+                )
+
+            model = result["model"]
+            # Reported only: the test set plays no part in choosing the model
+            test_f1 = f1_score(y_test, model.predict(X_test), average="weighted")
+            latency = measure_latency_per_row(
+                model, X_test, self.config.latency_rows, self.config.latency_repeats
+            )
+
+            candidates[name] = {
+                "model": model,
+                "best_params": {k: _to_builtin(v) for k, v in result["best_params"].items()},
+                "cv_f1": result["cv_f1"],
+                "test_f1": float(test_f1),
+                "latency_us_per_row": latency * 1e6,
+                "search_seconds": search_seconds,
+                "budget_seconds": share,
+                "max_resources": max_resources,
+                "halving_rounds": len(result["candidates_per_round"]),
+                "candidates_per_round": result["candidates_per_round"],
+                "budget_exceeded": result["budget_exceeded"],
+            }
+            logging.info(
+                f"{name}: CV F1 {result['cv_f1']:.4f}, test F1 {test_f1:.4f}, "
+                f"{latency * 1e6:.2f} us/row, searched in {search_seconds:.1f}s"
+            )
+
+        if not candidates:
+            raise ValueError("Model search finished without evaluating any candidate.")
+
+        # Cross-validated accuracy first, then serving cost among the near-ties
+        top_f1 = max(c["cv_f1"] for c in candidates.values())
+        shortlist = {
+            name: c
+            for name, c in candidates.items()
+            if c["cv_f1"] >= top_f1 - self.config.f1_tolerance
+        }
+        best_name = min(shortlist, key=lambda name: shortlist[name]["latency_us_per_row"])
+        best_model = candidates[best_name]["model"]
+        logging.info(
+            f"Search selected {best_name} out of shortlist {sorted(shortlist)} "
+            f"(F1 tolerance {self.config.f1_tolerance})."
+        )
+
+        report = {
+            "mode": "search",
+            "best_model": best_name,
+            "best_cv_f1": candidates[best_name]["cv_f1"],
+            "best_test_f1": candidates[best_name]["test_f1"],
+            "total_search_seconds": time.perf_counter() - started,
+            "time_budget_seconds": self.config.time_budget_seconds,
+            "budget_exceeded": time.perf_counter() - started > self.config.time_budget_seconds
+            or any(c["budget_exceeded"] for c in candidates.values()),
+            "skipped": skipped,
+            "candidates": {
+                name: {k: v for k, v in c.items() if k != "model"}
+                for name, c in candidates.items()
+            },
+        }
+        return best_name, best_model, report
+
+
+def _to_builtin(value):
+    # numpy scalars in best_params_ are not JSON serialisable
+    return value.item() if isinstance(value, np.generic) else value
@@ -1,83 +1,377 @@
 import os
 import sys
+import time
+import hashlib
+import threading
+import numpy as np
 import pandas as pd
+import sklearn
+from typing import Optional
+from joblib import Parallel, delayed
 from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
 from sklearn.metrics import f1_score
 from src.milk_quality.logger import logging
 from src.milk_quality.exception import CustomException
-from src.milk_quality.utils import save_object
+from src.milk_quality.utils import save_object, load_object, save_json, load_json
+from src.milk_quality import dataset_io, model_store, schema
+from src.milk_quality.stage_cache import stage_cache
+
+# Part of the training stage's code hash; model_search itself is only imported
+# when a search runs, as it pulls in scipy and sklearn.experimental
+MODEL_SEARCH_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "model_search.py")
 
 
 class ModelTrainerConfig:
     model_path = os.path.join("artifacts", "model.pkl")
+    # Same model in the memory-mapped format, with a versioned manifest
+    model_artifact_path = os.path.join("artifacts", "model.joblib")
+    metrics_path = os.path.join("artifacts", "model_metrics.json")
+    # Fitted candidates keyed on a hash of the training data and hyperparameters.
+    # After each training run the least recently used fits beyond cache_max_entries,
+    # and any unused for cache_max_age_days, are deleted; the directory can also be
+    # removed by hand at any time.
+    cache_dir = os.path.join("artifacts", "model_cache")
+    cache_max_entries = int(os.getenv("MILK_MODEL_CACHE_MAX_ENTRIES", "20"))
+    cache_max_age_days = float(os.getenv("MILK_MODEL_CACHE_MAX_AGE_DAYS", "30"))
+    # Candidates trained concurrently (-1 = all of them at once)
+    n_jobs = -1
+    # "threads" avoids worker start-up and data pickling (tree fitting releases
+    # the GIL); "processes" isolates candidates fully for large pure-Python work.
+    parallel_backend = "threads"
+    # Train F1 is only an overfitting signal, so score it on a bounded sample
+    train_eval_max_rows = 10_000
+    # Set MILK_MODEL_SEARCH=1 to run the hyperparameter search instead of the defaults
+    search = os.getenv("MILK_MODEL_SEARCH", "0") == "1"
+
+
+def candidate_cache_key(model, X_train: pd.DataFrame, y_train) -> str:
+    """
+    Hash the training data, estimator class, hyperparameters and sklearn version.
+    """
+    digest = hashlib.sha256()
+    digest.update(",".join(map(str, X_train.columns)).encode())
+    digest.update(pd.util.hash_pandas_object(X_train, index=False).to_numpy().tobytes())
+    digest.update(np.ascontiguousarray(y_train).tobytes())
+    digest.update(type(model).__name__.encode())
+    # n_jobs changes how fast a model fits, not what it learns
+    params = {k: v for k, v in model.get_params().items() if k != "n_jobs"}
+    digest.update(repr(sorted(params.items())).encode())
+    digest.update(sklearn.__version__.encode())
+    return digest.hexdigest()[:16]
+
+
+def load_cached_fit(cache_path: str):
+    """
+    Load a cached fit, or return None when there is none or it cannot be read
+    (an unreadable entry is deleted so it is refit and rewritten).
+    """
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        model = load_object(cache_path)
+    except Exception as e:
+        logging.warning(f"Discarding unreadable cached fit {cache_path}: {e}")
+        try:
+            os.remove(cache_path)
+        except OSError:
+            pass
+        return None
+    # Mark it recently used for prune_fit_cache
+    os.utime(cache_path)
+    return model
+
+
+def fit_candidate(name, model, X_train, y_train, X_test, y_test, train_eval_index, cache_dir):
+    """
+    Fit (or load from cache) one candidate and return its scores and timings.
+    """
+    cache_key = candidate_cache_key(model, X_train, y_train)
+    cache_path = os.path.join(cache_dir, f"{name}_{cache_key}.pkl")
+
+    start = time.perf_counter()
+    cached = load_cached_fit(cache_path)
+    cache_hit = cached is not None
+    if cache_hit:
+        model = cached
+    else:
+        model.fit(X_train, y_train)
+        # Unique temporary name, so concurrent runs writing the same key never
+        # interleave; the rename publishes a complete file or nothing
+        tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        save_object(tmp_path, model)
+        os.replace(tmp_path, cache_path)
+    fit_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    test_preds = model.predict(X_test)
+    predict_seconds = time.perf_counter() - start
+
+    train_preds = model.predict(X_train.iloc[train_eval_index])
+    train_f1 = f1_score(y_train[train_eval_index], train_preds, average="weighted")
+    test_f1 = f1_score(y_test, test_preds, average="weighted")
+
+    metrics = {
+        "train_f1": float(train_f1),
+        "test_f1": float(test_f1),
+        "f1_gap": float(train_f1 - test_f1),
+        "fit_seconds": fit_seconds,
+        "predict_seconds": predict_seconds,
+        "predict_rows": int(len(X_test)),
+        "cache_hit": cache_hit,
+        "cache_key": cache_key,
+    }
+    return name, model, metrics
+
+
+def prune_fit_cache(cache_dir: str, max_entries: int, max_age_days: float) -> int:
+    """
+    Delete cached fits unused for max_age_days, then the least recently used
+    beyond max_entries, and temporary files a crashed write left over a day ago.
+    Returns how many were deleted.
+    """
+    if not os.path.isdir(cache_dir):
+        return 0
+    entries, stale_tmp = [], []
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            # Renamed or removed by a concurrent run
+            continue
+        if name.endswith(".pkl"):
+            entries.append((mtime, path))
+        elif name.endswith(".tmp") and time.time() - mtime > 86400:
+            # Left behind by a run that crashed mid-write
+            stale_tmp.append(path)
+    # Newest first; fits loaded or written this run were just touched
+    entries.sort(reverse=True)
+    cutoff = time.time() - max_age_days * 86400
+    stale = [path for i, (mtime, path) in enumerate(entries) if i >= max_entries or mtime < cutoff]
+    stale += stale_tmp
+    for path in stale:
+        try:
+            os.remove(path)
+        except OSError as e:
+            logging.warning(f"Could not remove cached fit {path}: {e}")
+    if stale:
+        logging.info(f"Pruned {len(stale)} cached fit(s) from {cache_dir}.")
+    return len(stale)
+
+
+def share_cores(models: dict, concurrent: int) -> dict:
+    """
+    Split the cores between candidates that fit at the same time, so the
+    multi-threaded ones (RandomForest) do not oversubscribe them.
+    """
+    cores = max(1, (os.cpu_count() or 1) // max(concurrent, 1))
+    for model in models.values():
+        if "n_jobs" in model.get_params():
+            model.set_params(n_jobs=cores)
+    return models
 
 
 class ModelTrainer:
     def __init__(self):
         self.config = ModelTrainerConfig()
 
+    def stage_spec(self, train_csv_path: str, test_csv_path: str, search: bool) -> dict:
+        # Cache key parts and outputs, shared with the training DAG
+        return {
+            "inputs": {"train": train_csv_path, "test": test_csv_path},
+            "params": {
+                "search": search,
+                "train_eval_max_rows": self.config.train_eval_max_rows,
+                "sklearn": sklearn.__version__,
+            },
+            "code": [
+                __file__,
+                MODEL_SEARCH_SOURCE,
+                model_store.__file__,
+                schema.__file__,
+                dataset_io.__file__,
+            ],
+            "outputs": [
+                self.config.model_path,
+                self.config.model_artifact_path,
+                model_store.manifest_path(self.config.model_artifact_path),
+                self.config.metrics_path,
+            ],
+        }
+
     def train_and_evaluate(
-        self, train_csv_path: str, test_csv_path: str, encoder_path: str
+        self,
+        train_csv_path: str,
+        test_csv_path: str,
+        encoder_path: str,
+        search: Optional[bool] = None,
     ):
-        logging.info("Model training started.")
-        try:
-            # Load train/test data
-            train_df = pd.read_csv(train_csv_path)
-            test_df = pd.read_csv(test_csv_path)
+        """
+        Train, pick and save the best model; returns (model_path, name, test F1).
 
-            X_train = train_df.drop("Grade", axis=1)
-            y_train = train_df["Grade"]
+        Skipped when the train/test data, settings and training code are unchanged
+        since the cached run and the saved model is still intact.
+        """
+        search = self.config.search if search is None else search
+        result = stage_cache.run(
+            "model_training",
+            lambda: self._train_and_evaluate(train_csv_path, test_csv_path, search),
+            **self.stage_spec(train_csv_path, test_csv_path, search),
+        )
+        return tuple(result)
 
-            X_test = test_df.drop("Grade", axis=1)
-            y_test = test_df["Grade"]
+    def load_trained(self, result):
+        """
+        (name, model, report) of a cached model_training run, from its result and outputs.
+        """
+        model_path, name, _ = result
+        return name, load_object(model_path), load_json(self.config.metrics_path)
 
-            # Models to test
-            models = {
-                "RandomForest": RandomForestClassifier(),
-                "GradientBoosting": GradientBoostingClassifier(),
-            }
+    @staticmethod
+    def _features(train_df: pd.DataFrame, test_df: pd.DataFrame):
+        X_train = train_df.drop("Grade", axis=1)
+        y_train = train_df["Grade"].to_numpy()
 
-            best_model = None
-            best_score = 0
-            best_model_name = ""
+        X_test = test_df.drop("Grade", axis=1)
+        y_test = test_df["Grade"].to_numpy()
+        return X_train, y_train, X_test, y_test
 
-            for name, model in models.items():
-                logging.info(f"Training model: {name}")
-                model.fit(X_train, y_train)
+    def _train_and_evaluate(self, train_csv_path: str, test_csv_path: str, search: bool):
+        # Load train/test data
+        try:
+            train_df = schema.enforce_schema(
+                dataset_io.read_dataset(train_csv_path), require_target=True, context="training set"
+            )
+            test_df = schema.enforce_schema(
+                dataset_io.read_dataset(test_csv_path), require_target=True, context="test set"
+            )
+        except Exception as e:
+            raise CustomException(e, sys)
 
-                train_preds = model.predict(X_train)
-                test_preds = model.predict(X_test)
+        best_model_name, _, report = self._fit_and_save(*self._features(train_df, test_df), search)
+        return self.config.model_path, best_model_name, report["best_test_f1"]
 
-                train_f1 = f1_score(y_train, train_preds, average="weighted")
-                test_f1 = f1_score(y_test, test_preds, average="weighted")
+    def _fit_and_save(self, X_train, y_train, X_test, y_test, search: bool):
+        """
+        Fit the candidates (or run the search), then save the best model, its
+        memory-mapped export and the metrics report; returns (name, model, report).
+        """
+        logging.info("Model training started.")
+        try:
+            if search:
+                from src.milk_quality.components.model_search import ModelSearch
 
-                logging.info(f"{name} Train F1 Score: {train_f1:.4f}")
-                logging.info(f"{name} Test  F1 Score: {test_f1:.4f}")
+                best_model_name, best_model, report = ModelSearch().search(
+                    X_train, y_train, X_test, y_test
+                )
+            else:
+                models = self.candidate_models()
+                train_eval_index = self.train_eval_index(len(X_train))
 
-                # Overfitting check
-                f1_gap = train_f1 - test_f1
-                if f1_gap > 0.03:
-                    logging.warning(
-                        f"Potential Overfitting Detected in {name} (Train-Test F1 Gap: {f1_gap:.4f})"
-                    )
-                else:
-                    logging.info(
-                        f"No overfitting detected in {name} (Gap: {f1_gap:.4f})"
+                # Fit all candidates in parallel; cached fits are loaded instead
+                logging.info(f"Training candidates in parallel: {list(models)}")
+                n_jobs = (
+                    len(models) if self.config.n_jobs < 0 else min(self.config.n_jobs, len(models))
+                )
+                share_cores(models, n_jobs)
+                results = Parallel(n_jobs=n_jobs, prefer=self.config.parallel_backend)(
+                    delayed(fit_candidate)(
+                        name,
+                        model,
+                        X_train,
+                        y_train,
+                        X_test,
+                        y_test,
+                        train_eval_index,
+                        self.config.cache_dir,
                     )
+                    for name, model in models.items()
+                )
+                best_model_name, best_model, report = self.select_best(results)
+                self.prune_cache()
 
-                if test_f1 > best_score:
-                    best_score = test_f1
-                    best_model = model
-                    best_model_name = name
+            best_score = report["best_test_f1"]
 
             # Save best model
             save_object(self.config.model_path, best_model)
+            model_store.export_model(best_model, self.config.model_artifact_path, X_test)
             logging.info(
                 f"Best model: {best_model_name} with F1 Score: {best_score:.4f}"
             )
             logging.info(f"Model saved at: {self.config.model_path}")
 
-            return self.config.model_path, best_model_name, best_score
+            save_json(self.config.metrics_path, report)
+
+            return best_model_name, best_model, report
 
         except Exception as e:
             raise CustomException(e, sys)
+
+    @staticmethod
+    def candidate_models() -> dict:
+        # Models to test
+        return {
+            "RandomForest": RandomForestClassifier(),
+            "GradientBoosting": GradientBoostingClassifier(),
+        }
+
+    def prune_cache(self) -> int:
+        return prune_fit_cache(
+            self.config.cache_dir, self.config.cache_max_entries, self.config.cache_max_age_days
+        )
+
+    def train_eval_index(self, n_rows: int) -> np.ndarray:
+        """
+        Rows of the training set used to score train F1 (a bounded sample).
+        """
+        index = np.arange(n_rows)
+        if n_rows > self.config.train_eval_max_rows:
+            rng = np.random.default_rng(42)
+            index = np.sort(rng.choice(index, self.config.train_eval_max_rows, replace=False))
+        return index
+
+    @staticmethod
+    def select_best(results):
+        """
+        Log each fit_candidate result and return (best_name, best_model, report).
+        """
+        best_model = None
+        best_score = 0
+        best_model_name = ""
+        candidate_metrics = {}
+
+        for name, model, metrics in results:
+            candidate_metrics[name] = metrics
+            train_f1 = metrics["train_f1"]
+            test_f1 = metrics["test_f1"]
+
+            logging.info(
+                f"{name} fit in {metrics['fit_seconds']:.3f}s"
+                f"{' (cached)' if metrics['cache_hit'] else ''}, "
+                f"predicted {metrics['predict_rows']} rows in {metrics['predict_seconds']:.3f}s"
+            )
+            logging.info(f"{name} Train F1 Score: {train_f1:.4f}")
+            logging.info(f"{name} Test  F1 Score: {test_f1:.4f}")
+
+            # Overfitting check
+            f1_gap = metrics["f1_gap"]
+            if f1_gap > 0.03:
+                logging.warning(
+                    f"Potential Overfitting Detected in {name} (Train-Test F1 Gap: {f1_gap:.4f})"
+                )
+            else:
+                logging.info(
+                    f"No overfitting detected in {name} (Gap: {f1_gap:.4f})"
+                )
+
+            if test_f1 > best_score:
+                best_score = test_f1
+                best_model = model
+                best_model_name = name
+
+        report = {
+            "best_model": best_model_name,
+            "best_test_f1": best_score,
+            "candidates": candidate_metrics,
+        }
+        return best_model_name, best_model, report
@@ -0,0 +1,56 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.milk_quality.schema import FEATURE_COLUMNS, downcast
+
+
+class FeaturePreprocessor:
+    """
+    Fitted feature preprocessing shared by training and prediction.
+
+    fit() learns one fill value per feature (its most frequent value, the
+    smallest on ties, as DataFrame.mode picks) from a single float64 matrix.
+    transform() puts the features in training order and fills missing values.
+    Only float columns can hold NaN, so integer columns are never scanned and a
+    frame without gaps is returned as is.
+    """
+
+    def __init__(self, feature_names: Optional[List[str]] = None):
+        self.feature_names = list(feature_names or FEATURE_COLUMNS)
+        self.fill_values: Dict[str, float] = {}
+
+    def fit(self, X: pd.DataFrame) -> "FeaturePreprocessor":
+        values = X[self.feature_names].to_numpy(dtype=np.float64, na_value=np.nan)
+        fill_values = {}
+        for i, name in enumerate(self.feature_names):
+            column = values[:, i]
+            column = column[~np.isnan(column)]
+            if column.size == 0:
+                raise ValueError(f"Cannot fit a fill value for {name}: no observed values.")
+            levels, counts = np.unique(column, return_counts=True)
+            fill_values[name] = float(levels[np.argmax(counts)])
+        self.fill_values = fill_values
+        return self
+
+    def transform(self, X: pd.DataFrame) -> pd.DataFrame:
+        if not self.fill_values:
+            raise ValueError("FeaturePreprocessor is not fitted.")
+        # Skip the column selection when X is already in training order
+        features = X if list(X.columns) == self.feature_names else X[self.feature_names]
+        float_columns = [
+            name for name, dtype in zip(self.feature_names, features.dtypes) if dtype.kind == "f"
+        ]
+        gaps = {
+            name: self.fill_values[name]
+            for name in float_columns
+            if np.isnan(features[name].to_numpy()).any()
+        }
+        if not gaps:
+            return features
+        # Filled columns get their compact integer dtypes back
+        return downcast(features.fillna(gaps))
+
+    def fit_transform(self, X: pd.DataFrame) -> pd.DataFrame:
+        return self.fit(X).transform(X)
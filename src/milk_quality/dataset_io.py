@@ -0,0 +1,136 @@
+import os
+import sys
+from typing import Iterator, List, Optional
+
+import pandas as pd
+
+from src.milk_quality.schema import downcast
+from src.milk_quality.logger import logging
+from src.milk_quality.exception import CustomException
+
+FORMAT_EXTENSIONS = {
+    "csv": ".csv",
+    "parquet": ".parquet",
+    "feather": ".feather",
+}
+EXTENSION_FORMATS = {
+    ".csv": "csv",
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".feather": "feather",
+    ".arrow": "feather",
+    ".ipc": "feather",
+}
+
+
+def artifact_path(directory: str, name: str, fmt: str) -> str:
+    """
+    Build <directory>/<name><extension> for a dataset format.
+    """
+    if fmt not in FORMAT_EXTENSIONS:
+        raise ValueError(f"Unsupported dataset format: {fmt}")
+    return os.path.join(directory, f"{name}{FORMAT_EXTENSIONS[fmt]}")
+
+
+def infer_format(path: str) -> str:
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in EXTENSION_FORMATS:
+        raise ValueError(f"Cannot infer dataset format from: {path}")
+    return EXTENSION_FORMATS[extension]
+
+
+def read_dataset(
+    path: str,
+    fmt: Optional[str] = None,
+    columns: Optional[List[str]] = None,
+    memory_map: bool = True,
+    compact: bool = True,
+) -> pd.DataFrame:
+    """
+    Read a CSV, Parquet or Feather dataset into a DataFrame.
+
+    Parquet and Feather files are memory-mapped by default; uncompressed Feather
+    columns are then read without copying.
+    """
+    try:
+        fmt = fmt or infer_format(path)
+        if fmt == "csv":
+            df = pd.read_csv(path, usecols=columns)
+        elif fmt == "parquet":
+            df = pd.read_parquet(path, columns=columns, memory_map=memory_map)
+        elif fmt == "feather":
+            from pyarrow import feather
+
+            df = feather.read_table(path, columns=columns, memory_map=memory_map).to_pandas()
+        else:
+            raise ValueError(f"Unsupported dataset format: {fmt}")
+
+        if compact:
+            df = downcast(df)
+        logging.info(f"{fmt} dataset loaded from: {path} with shape {df.shape}")
+        return df
+
+    except Exception as e:
+        logging.error("Failed to read dataset.", exc_info=True)
+        raise CustomException(e, sys)
+
+
+def write_dataset(
+    df: pd.DataFrame,
+    path: str,
+    fmt: Optional[str] = None,
+    compact: bool = True,
+) -> str:
+    """
+    Write a DataFrame as CSV, Parquet (zstd) or Feather (uncompressed, so it can
+    be memory-mapped). The file is written to a temporary name and renamed into
+    place.
+    """
+    try:
+        fmt = fmt or infer_format(path)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if compact:
+            df = downcast(df)
+
+        tmp_path = f"{path}.tmp"
+        if fmt == "csv":
+            df.to_csv(tmp_path, index=False)
+        elif fmt == "parquet":
+            df.to_parquet(tmp_path, index=False, compression="zstd")
+        elif fmt == "feather":
+            df.reset_index(drop=True).to_feather(tmp_path, compression="uncompressed")
+        else:
+            raise ValueError(f"Unsupported dataset format: {fmt}")
+        os.replace(tmp_path, path)
+
+        logging.info(f"{fmt} dataset written to: {path}")
+        return path
+
+    except Exception as e:
+        logging.error("Failed to write dataset.", exc_info=True)
+        raise CustomException(e, sys)
+
+
+def iter_dataset_chunks(
+    path: str, chunksize: int, fmt: Optional[str] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    Yield a dataset in DataFrames of at most chunksize rows.
+    """
+    fmt = fmt or infer_format(path)
+    if fmt == "csv":
+        yield from pd.read_csv(path, chunksize=chunksize)
+    elif fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path, memory_map=True).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    elif fmt == "feather":
+        from pyarrow import feather
+
+        # Memory-mapped, so slicing only touches the pages of the current chunk
+        table = feather.read_table(path, memory_map=True)
+        for offset in range(0, table.num_rows, chunksize):
+            yield table.slice(offset, chunksize).to_pandas()
+    else:
+        raise ValueError(f"Unsupported dataset format: {fmt}")
@@ -1,5 +1,5 @@
 import sys
-from milk_quality.logger import logging
+from src.milk_quality.logger import logging
 
 def error_message_detail(error: Exception, error_detail: sys) -> str:
     _, _, exc_tb = error_detail.exc_info()
@@ -15,3 +15,15 @@ class CustomException(Exception):
 
     def __str__(self) -> str:
         return self.error_message
+
+    def __reduce__(self):
+        # Rebuild from the formatted message so the exception survives pickling
+        # (e.g. when raised inside a process pool worker).
+        return _restore_custom_exception, (self.error_message,)
+
+
+def _restore_custom_exception(error_message: str) -> CustomException:
+    exc = CustomException.__new__(CustomException)
+    Exception.__init__(exc, error_message)
+    exc.error_message = error_message
+    return exc
@@ -0,0 +1,88 @@
+import os
+import asyncio
+import functools
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from src.milk_quality.logger import logging
+
+
+@dataclass
+class InferenceExecutorConfig:
+    # "thread" shares the in-process model registry; "process" sidesteps the GIL
+    # at the cost of pickling inputs/outputs and one model copy per worker.
+    kind: str = os.getenv("MILK_INFERENCE_EXECUTOR", "thread")
+    max_workers: int = int(os.getenv("MILK_INFERENCE_WORKERS", str(os.cpu_count() or 1)))
+    # Jobs running or waiting for a worker; anything beyond this is rejected.
+    max_pending: int = int(os.getenv("MILK_INFERENCE_MAX_PENDING", "32"))
+
+
+class InferenceQueueFull(Exception):
+    """Raised when the inference executor already has max_pending jobs."""
+
+
+class InferenceExecutor:
+    """
+    Bounded pool that runs blocking inference work off the asyncio event loop.
+    """
+
+    def __init__(self, config: Optional[InferenceExecutorConfig] = None):
+        self.config = config or InferenceExecutorConfig()
+        self._executor: Optional[Executor] = None
+        self._slots = threading.BoundedSemaphore(self.config.max_pending)
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> Executor:
+        # Created lazily so importing the app does not fork worker processes.
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    if self.config.kind == "process":
+                        self._executor = ProcessPoolExecutor(self.config.max_workers)
+                    elif self.config.kind == "thread":
+                        self._executor = ThreadPoolExecutor(
+                            self.config.max_workers, thread_name_prefix="inference"
+                        )
+                    else:
+                        raise ValueError(
+                            f"Unknown inference executor kind: {self.config.kind}"
+                        )
+                    logging.info(
+                        f"Started {self.config.kind} inference pool with "
+                        f"{self.config.max_workers} workers, {self.config.max_pending} slots"
+                    )
+        return self._executor
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run fn(*args, **kwargs) in the pool, or raise InferenceQueueFull at capacity.
+        """
+        return await self.track(
+            lambda: self._get_executor().submit(functools.partial(fn, *args, **kwargs))
+        )
+
+    async def track(self, submit: Callable[[], Future]) -> Any:
+        """
+        Await the Future submit() returns while holding one of the max_pending
+        slots, or raise InferenceQueueFull at capacity.
+
+        Work queued elsewhere (the micro-batcher) shares the pool's bound this way.
+        """
+        if not self._slots.acquire(blocking=False):
+            logging.warning("Inference queue full; rejecting request.")
+            raise InferenceQueueFull()
+        try:
+            future = submit()
+        except Exception:
+            self._slots.release()
+            raise
+        # Free the slot when the job really finishes, even if the caller went away.
+        future.add_done_callback(lambda _: self._slots.release())
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
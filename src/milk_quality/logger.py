@@ -3,16 +3,30 @@ import os
 from datetime import datetime
 
 log_dir = os.path.join(os.getcwd(), "logs")
-os.makedirs(log_dir, exist_ok=True)
 
 LOG_FILE = f"{datetime.now().strftime('%m_%d_%Y_%H_%M_%S')}.log"
 LOG_FILE_PATH = os.path.join(log_dir, LOG_FILE)
 
+
+class DeferredFileHandler(logging.FileHandler):
+    """
+    FileHandler that creates the log directory and file on the first record,
+    so importing the package never touches the filesystem.
+    """
+
+    def __init__(self, filename: str):
+        super().__init__(filename, delay=True)
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+        return super()._open()
+
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
     handlers=[
-        logging.FileHandler(LOG_FILE_PATH),
+        DeferredFileHandler(LOG_FILE_PATH),
         logging.StreamHandler()
     ]
 )
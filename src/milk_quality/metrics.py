@@ -0,0 +1,400 @@
+import os
+import math
+import time
+import threading
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Upper bounds in seconds, from sub-millisecond predictions to minute-long stages
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, math.inf,
+)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class MetricsConfig:
+    # Set MILK_METRICS=0 to turn every counter, histogram and timer into a no-op
+    enabled = os.getenv("MILK_METRICS", "1") == "1"
+
+
+_enabled = MetricsConfig.enabled
+
+
+def set_enabled(enabled: bool) -> None:
+    global _enabled
+    _enabled = enabled
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+class CounterChild:
+    """
+    One labelled series of a counter.
+    """
+
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        if _enabled:
+            with self._lock:
+                self.value += amount
+
+
+class _Timer:
+    __slots__ = ("_child", "_start")
+
+    def __init__(self, child: "HistogramChild"):
+        self._child = child
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._child.observe(time.perf_counter() - self._start)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class HistogramChild:
+    """
+    One labelled series of a histogram: per-bucket counts, sum and count.
+    """
+
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        if _enabled:
+            # First bucket whose upper bound is >= value, as Prometheus' le
+            index = bisect_left(self.buckets, value)
+            with self._lock:
+                self.counts[index] += 1
+                self.sum += value
+                self.count += 1
+
+    def time(self):
+        """
+        Context manager observing the seconds its block takes.
+        """
+        return _Timer(self) if _enabled else _NULL_TIMER
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._unlabelled = self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values) -> object:
+        """
+        The series for these label values (in labelnames order), created on first use.
+
+        Hot paths bind their series once at import and reuse it.
+        """
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def series(self) -> List[Tuple[Tuple[str, ...], object]]:
+        with self._lock:
+            return list(self._children.items())
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> CounterChild:
+        return CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._unlabelled.inc(amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        buckets = tuple(sorted(float(b) for b in buckets))
+        self.buckets = buckets if buckets[-1] == math.inf else buckets + (math.inf,)
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> HistogramChild:
+        return HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._unlabelled.observe(value)
+
+    def time(self):
+        return self._unlabelled.time()
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [
+        '{}="{}"'.format(name, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == math.inf else repr(bound)
+
+
+def bucket_quantile(quantile: float, buckets: Tuple[float, ...], counts: List[int]) -> Optional[float]:
+    """
+    Estimate a quantile from bucket counts by linear interpolation inside the
+    bucket, as Prometheus' histogram_quantile does.
+    """
+    total = sum(counts)
+    if total == 0:
+        return None
+    rank = quantile * total
+    cumulative = 0
+    for i, (bound, count) in enumerate(zip(buckets, counts)):
+        if cumulative + count >= rank and count:
+            lower = buckets[i - 1] if i else 0.0
+            if bound == math.inf:
+                return lower
+            return lower + (bound - lower) * (rank - cumulative) / count
+        cumulative += count
+    return buckets[-2] if len(buckets) > 1 else None
+
+
+class MetricsRegistry:
+    """
+    Process-wide counters and histograms, rendered in the Prometheus text format.
+
+    Recording is a bucket bisect and a few additions under a per-series lock;
+    with metrics disabled it is a single flag check. Snapshots are plain dicts,
+    so worker processes can send theirs back to be merged.
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, documentation: str, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} is already registered with another type or labels.")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, tuple(labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, tuple(labelnames), buckets=buckets)
+
+    def metrics(self) -> List[_Metric]:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def render(self) -> str:
+        """
+        All metrics in the Prometheus text exposition format (version 0.0.4).
+        """
+        lines = []
+        for metric in self.metrics():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for values, child in metric.series():
+                if metric.kind == "counter":
+                    lines.append(f"{metric.name}{_format_labels(metric.labelnames, values)} {child.value}")
+                    continue
+                with child._lock:
+                    counts, total, count = list(child.counts), child.sum, child.count
+                cumulative = 0
+                for bound, bucket_count in zip(child.buckets, counts):
+                    cumulative += bucket_count
+                    le = f'le="{_format_bound(bound)}"'
+                    lines.append(
+                        f"{metric.name}_bucket{_format_labels(metric.labelnames, values, le)} {cumulative}"
+                    )
+                labels = _format_labels(metric.labelnames, values)
+                lines.append(f"{metric.name}_sum{labels} {total}")
+                lines.append(f"{metric.name}_count{labels} {count}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self, reset: bool = False) -> dict:
+        """
+        Every series' current values as a picklable dict; reset=True also zeroes them.
+        """
+        snapshot = {}
+        for metric in self.metrics():
+            series = {}
+            for values, child in metric.series():
+                with child._lock:
+                    if metric.kind == "counter":
+                        series[values] = child.value
+                        if reset:
+                            child.value = 0.0
+                    else:
+                        series[values] = (list(child.counts), child.sum, child.count)
+                        if reset:
+                            child.counts = [0] * len(child.buckets)
+                            child.sum = 0.0
+                            child.count = 0
+            snapshot[metric.name] = {
+                "kind": metric.kind,
+                "documentation": metric.documentation,
+                "labelnames": metric.labelnames,
+                "buckets": getattr(metric, "buckets", None),
+                "series": series,
+            }
+        return snapshot
+
+    def merge(self, snapshot: dict) -> None:
+        """
+        Add a snapshot (e.g. from a worker process) into this registry.
+        """
+        for name, data in snapshot.items():
+            if data["kind"] == "counter":
+                metric = self.counter(name, data["documentation"], data["labelnames"])
+                for values, value in data["series"].items():
+                    metric.labels(*values).inc(value)
+                continue
+            metric = self.histogram(name, data["documentation"], data["labelnames"], data["buckets"])
+            for values, (counts, total, count) in data["series"].items():
+                child = metric.labels(*values)
+                with child._lock:
+                    child.counts = [a + b for a, b in zip(child.counts, counts)]
+                    child.sum += total
+                    child.count += count
+
+    def summary(self) -> dict:
+        """
+        Compact per-series view for logs and reports: counter values, and count,
+        total, mean and estimated p50/p95/p99 for histograms.
+        """
+        summary = {}
+        for name, data in self.snapshot().items():
+            for values, value in data["series"].items():
+                key = name + _format_labels(data["labelnames"], values)
+                if data["kind"] == "counter":
+                    summary[key] = value
+                    continue
+                counts, total, count = value
+                if not count:
+                    continue
+                summary[key] = {
+                    "count": count,
+                    "sum": total,
+                    "mean": total / count,
+                    "p50": bucket_quantile(0.5, data["buckets"], counts),
+                    "p95": bucket_quantile(0.95, data["buckets"], counts),
+                    "p99": bucket_quantile(0.99, data["buckets"], counts),
+                }
+        return summary
+
+    def format_summary(self) -> str:
+        lines = []
+        for key, value in self.summary().items():
+            if isinstance(value, dict):
+                lines.append(
+                    f"{key}: n={value['count']} total={value['sum']:.3f}s mean={value['mean'] * 1000:.2f}ms "
+                    f"p95~{value['p95'] * 1000:.2f}ms"
+                )
+            else:
+                lines.append(f"{key}: {value:g}")
+        return "\n".join(lines)
+
+
+registry = MetricsRegistry()
+
+
+class ASGIMetricsMiddleware:
+    """
+    Count and time HTTP requests by method, route template and status.
+
+    Routes are labelled with their path template (/result/{result_id}), not the
+    request path, so label values stay bounded; requests no API route matched
+    (static files, 404s) are labelled "other". Latency runs until the last body
+    chunk is sent, so streamed responses are timed in full.
+    """
+
+    def __init__(self, app, metrics: MetricsRegistry = registry):
+        self.app = app
+        self.requests = metrics.counter(
+            "milk_http_requests_total", "HTTP requests served.", ("method", "route", "status")
+        )
+        self.seconds = metrics.histogram(
+            "milk_http_request_seconds", "HTTP request latency.", ("method", "route")
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _enabled:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router records the matched route in the shared scope
+            route = getattr(scope.get("route"), "path", "other")
+            self.seconds.labels(scope["method"], route).observe(time.perf_counter() - start)
+            self.requests.labels(scope["method"], route, status).inc()
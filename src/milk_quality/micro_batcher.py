@@ -0,0 +1,165 @@
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future, InvalidStateError
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.milk_quality.logger import logging
+
+
+@dataclass
+class MicroBatcherConfig:
+    enabled: bool = os.getenv("MILK_BATCHING", "0") == "1"
+    # Flush a batch once it holds this many rows...
+    max_batch_size: int = int(os.getenv("MILK_BATCH_MAX_ROWS", "64"))
+    # ...or once the oldest request in it has waited this long.
+    max_wait_ms: float = float(os.getenv("MILK_BATCH_MAX_WAIT_MS", "5"))
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent small prediction requests into one vectorized call.
+
+    Callers submit DataFrames and get a Future for their own slice of the output.
+    A single background thread drains the queue, concatenates whatever arrived
+    within the wait window (up to max_batch_size rows) and calls predict_fn once.
+    """
+
+    def __init__(
+        self,
+        predict_fn: Callable[[pd.DataFrame], np.ndarray],
+        config: Optional[MicroBatcherConfig] = None,
+    ):
+        self.config = config or MicroBatcherConfig()
+        self._predict_fn = predict_fn
+        self._queue: "queue.Queue[Optional[Tuple[pd.DataFrame, Future]]]" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._requests = 0
+        self._rows = 0
+        self._max_rows_seen = 0
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="micro-batcher", daemon=True
+        )
+        self._thread.start()
+
+    def submit(self, df: pd.DataFrame) -> Future:
+        """
+        Queue df for prediction; the Future resolves to an array of len(df).
+        """
+        if self._closed:
+            raise RuntimeError("MicroBatcher is closed.")
+        future: Future = Future()
+        self._queue.put((df, future))
+        return future
+
+    def predict(self, df: pd.DataFrame) -> np.ndarray:
+        return self.submit(df).result()
+
+    @staticmethod
+    def _claim(item: Tuple[pd.DataFrame, Future]) -> bool:
+        # Marks the future running so it can no longer be cancelled; False when
+        # the caller already cancelled it (e.g. the client disconnected)
+        return item[1].set_running_or_notify_cancel()
+
+    def _collect(self, first: Tuple[pd.DataFrame, Future]) -> List[Tuple[pd.DataFrame, Future]]:
+        batch = [first] if self._claim(first) else []
+        rows = sum(len(df) for df, _ in batch)
+        deadline = time.perf_counter() + self.config.max_wait_ms / 1000.0
+        while rows < self.config.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # Close requested; flush what we have and let _run exit.
+                self._queue.put(None)
+                break
+            if self._claim(item):
+                batch.append(item)
+                rows += len(item[0])
+        return batch
+
+    @staticmethod
+    def _resolve(future: Future, result=None, exception: Optional[BaseException] = None) -> None:
+        try:
+            if exception is not None:
+                future.set_exception(exception)
+            else:
+                future.set_result(result)
+        except InvalidStateError:
+            # Already resolved elsewhere; nothing is waiting on this outcome
+            pass
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            # This is the only batcher thread: no error may end it, or every
+            # later request would wait forever
+            try:
+                self._process(self._collect(first))
+            except Exception:
+                logging.error("Micro-batcher loop failed; continuing.", exc_info=True)
+
+    def _process(self, batch: List[Tuple[pd.DataFrame, Future]]) -> None:
+        if not batch:
+            return
+        frames = [df for df, _ in batch]
+        futures = [future for _, future in batch]
+
+        try:
+            combined = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+            predictions = self._predict_fn(combined)
+        except Exception as e:
+            logging.error("Micro-batch prediction failed.", exc_info=True)
+            for future in futures:
+                self._resolve(future, exception=e)
+            return
+
+        start = 0
+        for df, future in batch:
+            end = start + len(df)
+            self._resolve(future, predictions[start:end])
+            start = end
+
+        with self._stats_lock:
+            self._batches += 1
+            self._requests += len(batch)
+            self._rows += len(combined)
+            self._max_rows_seen = max(self._max_rows_seen, len(combined))
+
+    def stats(self) -> dict:
+        """
+        Batch counters and fill rate (average rows per batch / max_batch_size).
+        """
+        with self._stats_lock:
+            avg_rows = self._rows / self._batches if self._batches else 0.0
+            return {
+                "batches": self._batches,
+                "requests": self._requests,
+                "rows": self._rows,
+                "avg_rows_per_batch": avg_rows,
+                "avg_requests_per_batch": self._requests / self._batches if self._batches else 0.0,
+                "max_rows_per_batch": self._max_rows_seen,
+                "fill_rate": avg_rows / self.config.max_batch_size,
+                "max_batch_size": self.config.max_batch_size,
+                "max_wait_ms": self.config.max_wait_ms,
+                "queue_depth": self._queue.qsize(),
+            }
+
+    def close(self) -> None:
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._thread.join()
@@ -0,0 +1,76 @@
+import os
+import sys
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from src.milk_quality.model_store import load_artifact
+from src.milk_quality.logger import logging
+from src.milk_quality.exception import CustomException
+
+
+@dataclass(frozen=True)
+class RegistryEntry:
+    obj: Any
+    signature: Tuple[int, int]
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of deserialized artifacts keyed by absolute file path.
+
+    Each artifact is loaded once and kept in memory. When its mtime or size changes
+    on disk it is reloaded and swapped in with a single dict assignment, so callers
+    that already hold the old object keep using it until they are done.
+    """
+
+    def __init__(self, loader: Callable[[str], Any] = load_artifact):
+        self._loader = loader
+        self._entries: Dict[str, RegistryEntry] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _signature(path: str) -> Tuple[int, int]:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self, file_path: str) -> Any:
+        """
+        Return the cached object for file_path, reloading it if the file changed.
+        """
+        try:
+            path = os.path.abspath(file_path)
+            signature = self._signature(path)
+
+            entry = self._entries.get(path)
+            if entry is not None and entry.signature == signature:
+                return entry.obj
+
+            with self._lock:
+                # Another thread may have reloaded while we waited for the lock.
+                entry = self._entries.get(path)
+                if entry is None or entry.signature != signature:
+                    obj = self._loader(path)
+                    action = "Loaded" if entry is None else "Reloaded"
+                    entry = RegistryEntry(obj=obj, signature=signature)
+                    self._entries[path] = entry
+                    logging.info(f"{action} artifact into registry: {path}")
+                return entry.obj
+
+        except Exception as e:
+            logging.error("Failed to get artifact from registry.", exc_info=True)
+            raise CustomException(e, sys)
+
+    def invalidate(self, file_path: Optional[str] = None) -> None:
+        """
+        Drop one cached artifact, or all of them when no path is given.
+        """
+        with self._lock:
+            if file_path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(file_path), None)
+
+
+# Shared by every PredictionPipeline in the process.
+model_registry = ModelRegistry()
@@ -0,0 +1,163 @@
+import os
+import sys
+import json
+import hashlib
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from src.milk_quality.utils import ARTIFACT_LOAD_SECONDS, load_object
+from src.milk_quality.logger import logging
+from src.milk_quality.exception import CustomException
+
+# joblib and sklearn are imported inside the functions that need them; an
+# estimator's own unpickling imports the parts of sklearn it uses.
+
+# Version 1 artifacts could hold a NumPy re-implementation of tree ensembles;
+# version 2 always stores the fitted estimator.
+MODEL_FORMAT_VERSION = 2
+MODEL_ARTIFACT_EXTENSION = ".joblib"
+
+
+class ModelStoreConfig:
+    # Loads check the artifact's size against the manifest. Hashing the whole
+    # file reads every page that memory-mapping would otherwise leave on disk,
+    # so set MILK_VERIFY_MODEL_CHECKSUM=1 to do that too (e.g. once at deploy)
+    verify_checksum = os.getenv("MILK_VERIFY_MODEL_CHECKSUM", "0") == "1"
+    # An export replaces the manifest just before the artifact; a load that
+    # lands in between waits this long and checks once more
+    mismatch_retry_seconds = float(os.getenv("MILK_MODEL_MISMATCH_RETRY_SECONDS", "0.5"))
+
+
+def manifest_path(artifact_path: str) -> str:
+    return f"{artifact_path}.manifest.json"
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def export_model(model, artifact_path: str, X_check: pd.DataFrame) -> str:
+    """
+    Save model in the memory-mappable format with a versioned manifest.
+
+    The fitted estimator is dumped uncompressed, so joblib memory-maps its
+    NumPy arrays (the tree node arrays, for ensembles) on load. The manifest
+    holds the format version, feature order, classes and the artifact's SHA-256.
+    """
+    import joblib
+    import sklearn
+
+    try:
+        os.makedirs(os.path.dirname(artifact_path) or ".", exist_ok=True)
+        tmp_path = f"{artifact_path}.tmp"
+        # Uncompressed, so the arrays can be memory-mapped on load
+        joblib.dump(model, tmp_path, compress=0)
+
+        manifest = {
+            "format_version": MODEL_FORMAT_VERSION,
+            "kind": "estimator",
+            "model_class": type(model).__name__,
+            "feature_names": [str(name) for name in getattr(model, "feature_names_in_", X_check.columns)],
+            "classes": np.asarray(model.classes_).tolist(),
+            "sha256": _file_sha256(tmp_path),
+            "size": os.path.getsize(tmp_path),
+            "sklearn_version": sklearn.__version__,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        }
+        manifest_tmp_path = f"{manifest_path(artifact_path)}.tmp"
+        with open(manifest_tmp_path, "w") as f:
+            json.dump(manifest, f, indent=4)
+        # Manifest first, then the artifact, so the model registry (which reloads
+        # when the artifact changes) finds the matching manifest. A load that
+        # starts between the two sees the new manifest with the old artifact;
+        # load_model retries once for that window.
+        os.replace(manifest_tmp_path, manifest_path(artifact_path))
+        os.replace(tmp_path, artifact_path)
+
+        logging.info(f"Model exported to: {artifact_path}")
+        return artifact_path
+
+    except Exception as e:
+        logging.error("Failed to export model.", exc_info=True)
+        raise CustomException(e, sys)
+
+
+def load_manifest(artifact_path: str) -> dict:
+    with open(manifest_path(artifact_path)) as f:
+        return json.load(f)
+
+
+def _artifact_mismatch(artifact_path: str, manifest: dict, verify: bool) -> Optional[str]:
+    if os.path.getsize(artifact_path) != manifest["size"]:
+        return "size"
+    if verify and _file_sha256(artifact_path) != manifest["sha256"]:
+        return "checksum"
+    return None
+
+
+def load_model(artifact_path: str, mmap_mode: Optional[str] = "r", verify: Optional[bool] = None):
+    """
+    Load a model saved by export_model, memory-mapping its arrays.
+
+    Refuses artifacts written by a newer format version or whose size does not
+    match the manifest. The SHA-256 is only compared when verify (or
+    MILK_VERIFY_MODEL_CHECKSUM=1) asks for it. A mismatch is checked once more
+    after a short wait, in case an export was replacing the files.
+    """
+    import joblib
+
+    try:
+        manifest = load_manifest(artifact_path)
+        verify = ModelStoreConfig.verify_checksum if verify is None else verify
+        mismatch = _artifact_mismatch(artifact_path, manifest, verify)
+        if mismatch:
+            logging.warning(f"Model artifact {mismatch} does not match its manifest; checking again.")
+            time.sleep(ModelStoreConfig.mismatch_retry_seconds)
+            manifest = load_manifest(artifact_path)
+            mismatch = _artifact_mismatch(artifact_path, manifest, verify)
+        if mismatch:
+            raise ValueError(f"Model artifact {mismatch} does not match its manifest: {artifact_path}")
+        if manifest["format_version"] > MODEL_FORMAT_VERSION:
+            raise ValueError(
+                f"Model format version {manifest['format_version']} is newer than supported "
+                f"({MODEL_FORMAT_VERSION}): {artifact_path}"
+            )
+        if manifest["kind"] != "estimator":
+            raise ValueError(
+                f"Model artifact kind {manifest['kind']} is no longer supported; "
+                f"re-run training to export it again: {artifact_path}"
+            )
+        import sklearn
+
+        if manifest["sklearn_version"] != sklearn.__version__:
+            logging.warning(
+                f"Model was saved with scikit-learn {manifest['sklearn_version']}, "
+                f"running {sklearn.__version__}."
+            )
+
+        with ARTIFACT_LOAD_SECONDS.labels("joblib").time():
+            model = joblib.load(artifact_path, mmap_mode=mmap_mode)
+        if list(getattr(model, "feature_names_in_", manifest["feature_names"])) != manifest["feature_names"]:
+            raise ValueError(f"Model feature order does not match its manifest: {artifact_path}")
+        return model
+
+    except Exception as e:
+        logging.error("Failed to load model artifact.", exc_info=True)
+        raise CustomException(e, sys)
+
+
+def load_artifact(file_path: str):
+    """
+    Load any artifact: the memory-mapped model format by extension, dill otherwise.
+    """
+    if file_path.endswith(MODEL_ARTIFACT_EXTENSION):
+        return load_model(file_path)
+    return load_object(file_path)
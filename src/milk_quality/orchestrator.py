@@ -0,0 +1,128 @@
+import os
+import sys
+import time
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from src.milk_quality.metrics import registry
+from src.milk_quality.logger import logging
+from src.milk_quality.exception import CustomException
+
+PIPELINE_STEP_SECONDS = registry.histogram(
+    "milk_pipeline_step_seconds", "Time per training pipeline step.", ("step",)
+)
+PIPELINE_STEP_FAILURES = registry.counter(
+    "milk_pipeline_step_failures_total", "Training pipeline steps that raised.", ("step",)
+)
+
+
+@dataclass
+class PipelineStep:
+    name: str
+    fn: Callable[..., Any]
+    # Names of the steps whose results are passed to fn, in this order
+    deps: Tuple[str, ...] = field(default_factory=tuple)
+
+
+class PipelineDAG:
+    """
+    Run pipeline steps as a dependency graph on a thread pool.
+
+    A step starts as soon as every step it depends on has finished and receives
+    their results as positional arguments, so DataFrames and fitted models move
+    between steps in memory. Threads rather than processes: pandas and sklearn
+    release the GIL in their heavy loops and nothing has to be pickled.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None):
+        # Same default as ThreadPoolExecutor: several steps only write files
+        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
+        self.steps: Dict[str, PipelineStep] = {}
+
+    def add(self, name: str, fn: Callable[..., Any], deps: Tuple[str, ...] = ()) -> "PipelineDAG":
+        if name in self.steps:
+            raise ValueError(f"Duplicate pipeline step: {name}")
+        for dep in deps:
+            if dep not in self.steps:
+                # Steps are added in topological order, which also rules out cycles
+                raise ValueError(f"Step {name} depends on unknown step {dep}")
+        self.steps[name] = PipelineStep(name, fn, tuple(deps))
+        return self
+
+    def run(self) -> Tuple[Dict[str, Any], dict]:
+        """
+        Run every step and return (results by step name, timing report).
+
+        The first failing step stops new steps from starting and is re-raised
+        once the running ones finish.
+        """
+        results: Dict[str, Any] = {}
+        timings: Dict[str, dict] = {}
+        remaining = {name: set(step.deps) for name, step in self.steps.items()}
+        lock = threading.Lock()
+        started = time.perf_counter()
+
+        def run_step(step: PipelineStep):
+            step_start = time.perf_counter()
+            logging.info(f"Pipeline step {step.name} started.")
+            try:
+                value = step.fn(*(results[dep] for dep in step.deps))
+            except CustomException:
+                PIPELINE_STEP_FAILURES.labels(step.name).inc()
+                raise
+            except Exception as e:
+                PIPELINE_STEP_FAILURES.labels(step.name).inc()
+                raise CustomException(e, sys)
+            step_end = time.perf_counter()
+            PIPELINE_STEP_SECONDS.labels(step.name).observe(step_end - step_start)
+            with lock:
+                timings[step.name] = {
+                    "deps": list(step.deps),
+                    "start_offset_seconds": step_start - started,
+                    "seconds": step_end - step_start,
+                    "thread": threading.current_thread().name,
+                }
+            logging.info(f"Pipeline step {step.name} finished in {step_end - step_start:.3f}s.")
+            return value
+
+        error = None
+        with ThreadPoolExecutor(self.max_workers, thread_name_prefix="pipeline") as executor:
+            running = {}
+
+            def submit_ready():
+                for name in [n for n, deps in remaining.items() if not deps]:
+                    del remaining[name]
+                    running[executor.submit(run_step, self.steps[name])] = name
+
+            submit_ready()
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        logging.error(f"Pipeline step {name} failed.")
+                        error = error or e
+                        continue
+                    for deps in remaining.values():
+                        deps.discard(name)
+                if error is None:
+                    submit_ready()
+
+        if error is not None:
+            raise error
+
+        wall_seconds = time.perf_counter() - started
+        step_seconds = sum(t["seconds"] for t in timings.values())
+        report = {
+            "wall_seconds": wall_seconds,
+            "step_seconds": step_seconds,
+            # Above 1 when independent steps overlapped
+            "parallelism": step_seconds / wall_seconds if wall_seconds > 0 else 0.0,
+            "max_workers": self.max_workers,
+            "steps": {name: timings[name] for name in self.steps},
+        }
+        return results, report
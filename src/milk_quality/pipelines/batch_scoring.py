@@ -0,0 +1,301 @@
+import os
+import sys
+import json
+import glob
+import time
+import hashlib
+import shutil
+import argparse
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import pandas as pd
+
+from src.milk_quality.utils import load_environment, save_json
+
+# Apply .env before the modules below read their MILK_* settings
+load_environment()
+
+from src.milk_quality.pipelines.prediction import PREDICTION_STAGE_SECONDS, PredictionPipeline
+from src.milk_quality.metrics import registry
+from src.milk_quality.dataset_io import EXTENSION_FORMATS, iter_dataset_chunks
+from src.milk_quality.logger import logging
+from src.milk_quality.exception import CustomException
+
+SUCCESS_MARKER = "_SUCCESS"
+# What a partition's parts were scored with; resuming with anything else is refused
+PARTITION_MANIFEST = "_partition.json"
+
+# Set once per worker process by _init_worker
+_worker_pipeline: Optional[PredictionPipeline] = None
+
+
+@dataclass
+class BatchScoringConfig:
+    model_path: str = os.path.join("artifacts", "model.pkl")
+    encoder_path: str = os.path.join("artifacts", "label_encoder.pkl")
+    output_dir: str = os.path.join("artifacts", "batch_predictions")
+    workers: int = os.cpu_count() or 1
+    chunksize: int = 100_000
+    # Concatenate each input's parts into <output_dir>/<name>_predictions.csv
+    merge: bool = True
+    # Skip parts (and whole inputs) already written by an earlier run
+    resume: bool = True
+
+
+def _init_worker(model_path: str, encoder_path: str) -> None:
+    # Load the model once per worker process, not once per shard.
+    global _worker_pipeline
+    # Forked workers start with a copy of the parent's metrics; only report their own
+    registry.snapshot(reset=True)
+    _worker_pipeline = PredictionPipeline(model_path=model_path, encoder_path=encoder_path)
+    _worker_pipeline.load_artifacts()
+    _worker_pipeline.load_preprocessor()
+
+
+def _score_shard(chunk: pd.DataFrame, part_path: str) -> Tuple[int, dict]:
+    scored = _worker_pipeline.add_predictions(chunk)
+    tmp_path = f"{part_path}.tmp"
+    with PREDICTION_STAGE_SECONDS.labels("write").time():
+        scored.to_csv(tmp_path, index=False)
+    # Atomic rename: a part file either exists complete or not at all
+    os.replace(tmp_path, part_path)
+    # The worker's metrics since its last shard, merged by the parent
+    return len(scored), registry.snapshot(reset=True)
+
+
+def _collect(futures) -> int:
+    rows = 0
+    for future in futures:
+        shard_rows, metrics = future.result()
+        registry.merge(metrics)
+        rows += shard_rows
+    return rows
+
+
+def expand_inputs(inputs: List[str]) -> List[str]:
+    """
+    Resolve files, directories (their CSV/Parquet/Feather files) and glob patterns.
+    """
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.extend(
+                sorted(
+                    path
+                    for path in glob.glob(os.path.join(item, "*"))
+                    if os.path.splitext(path)[1].lower() in EXTENSION_FORMATS
+                )
+            )
+        elif os.path.isfile(item):
+            paths.append(item)
+        else:
+            matches = sorted(glob.glob(item))
+            if not matches:
+                raise FileNotFoundError(f"No input files match: {item}")
+            paths.extend(matches)
+    # Keep order, drop duplicates
+    return list(dict.fromkeys(paths))
+
+
+def _files_sha256(paths: List[str]) -> str:
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(path.encode())
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+    return digest.hexdigest()
+
+
+class BatchScorer:
+    def __init__(self, config: Optional[BatchScoringConfig] = None):
+        self.config = config or BatchScoringConfig()
+
+    def _partition_dir(self, input_path: str) -> str:
+        # Name plus a hash of the full path, so a/x.csv, b/x.csv and x.parquet never share one
+        name = os.path.splitext(os.path.basename(input_path))[0]
+        key = hashlib.sha256(os.path.abspath(input_path).encode()).hexdigest()[:10]
+        return os.path.join(self.config.output_dir, f"{name}-{key}")
+
+    def _model_sha256(self) -> str:
+        # Model, encoder and preprocessor together decide the scores in every part
+        pipeline = PredictionPipeline(
+            model_path=self.config.model_path, encoder_path=self.config.encoder_path
+        )
+        return _files_sha256([pipeline.model_path, pipeline.encoder_path, pipeline.preprocessor_path])
+
+    def _prepare_partition(self, partition_dir: str, fingerprint: dict) -> None:
+        """
+        Check that parts already in partition_dir were scored with this input
+        (path, size and mtime), chunksize and model before they are reused, or
+        start the partition afresh when not resuming.
+        """
+        manifest_path = os.path.join(partition_dir, PARTITION_MANIFEST)
+        if not self.config.resume:
+            shutil.rmtree(partition_dir, ignore_errors=True)
+        elif os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                recorded = json.load(f)
+            changed = sorted(key for key in fingerprint if recorded.get(key) != fingerprint[key])
+            if changed:
+                raise ValueError(
+                    f"Cannot resume {partition_dir}: its parts were scored with a different "
+                    f"{', '.join(changed)}. Rerun with --no-resume or delete the directory."
+                )
+            return
+        elif os.path.isdir(partition_dir) and os.listdir(partition_dir):
+            raise ValueError(
+                f"Cannot resume {partition_dir}: it has no {PARTITION_MANIFEST} recording how "
+                f"its parts were scored. Rerun with --no-resume or delete the directory."
+            )
+        os.makedirs(partition_dir, exist_ok=True)
+        save_json(manifest_path, fingerprint)
+
+    def _merge_parts(self, partition_dir: str, part_paths: List[str]) -> str:
+        merged_path = f"{partition_dir}_predictions.csv"
+        tmp_path = f"{merged_path}.tmp"
+        with open(tmp_path, "wb") as out:
+            for i, part_path in enumerate(part_paths):
+                with open(part_path, "rb") as part:
+                    header = part.readline()
+                    if i == 0:
+                        out.write(header)
+                    shutil.copyfileobj(part, out)
+        os.replace(tmp_path, merged_path)
+        return merged_path
+
+    def score(self, inputs: List[str]) -> dict:
+        """
+        Score every input dataset across a process pool and return a throughput report.
+        """
+        logging.info("Batch scoring started.")
+        try:
+            input_paths = expand_inputs(inputs)
+            logging.info(f"Batch scoring {len(input_paths)} input file(s) with {self.config.workers} workers.")
+            os.makedirs(self.config.output_dir, exist_ok=True)
+
+            start = time.perf_counter()
+            model_sha256 = self._model_sha256()
+            report = {"files": {}, "rows_scored": 0, "rows_skipped": 0}
+            max_in_flight = self.config.workers * 2
+
+            with ProcessPoolExecutor(
+                max_workers=self.config.workers,
+                initializer=_init_worker,
+                initargs=(self.config.model_path, self.config.encoder_path),
+            ) as executor:
+                for input_path in input_paths:
+                    partition_dir = self._partition_dir(input_path)
+                    stat = os.stat(input_path)
+                    fingerprint = {
+                        "input": os.path.abspath(input_path),
+                        # A rewritten input at the same path must not pass as completed
+                        "input_size": stat.st_size,
+                        "input_mtime_ns": stat.st_mtime_ns,
+                        "chunksize": self.config.chunksize,
+                        "model_sha256": model_sha256,
+                    }
+                    self._prepare_partition(partition_dir, fingerprint)
+                    marker = os.path.join(partition_dir, SUCCESS_MARKER)
+                    if self.config.resume and os.path.exists(marker):
+                        logging.info(f"Skipping completed input: {input_path}")
+                        report["files"][input_path] = {"status": "skipped"}
+                        continue
+
+                    file_start = time.perf_counter()
+                    part_paths, pending = [], set()
+                    file_rows = skipped_rows = 0
+
+                    reader = iter_dataset_chunks(input_path, self.config.chunksize)
+                    for part_no, chunk in enumerate(reader):
+                        part_path = os.path.join(partition_dir, f"part-{part_no:05d}.csv")
+                        part_paths.append(part_path)
+                        if self.config.resume and os.path.exists(part_path):
+                            skipped_rows += len(chunk)
+                            continue
+
+                        # Bound the number of chunks held in memory at once
+                        if len(pending) >= max_in_flight:
+                            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                            file_rows += _collect(done)
+                        pending.add(executor.submit(_score_shard, chunk, part_path))
+
+                    file_rows += _collect(wait(pending).done)
+
+                    merged_path = None
+                    if self.config.merge and part_paths:
+                        merged_path = self._merge_parts(partition_dir, part_paths)
+                    open(marker, "w").close()
+
+                    file_seconds = time.perf_counter() - file_start
+                    report["files"][input_path] = {
+                        "status": "scored",
+                        "parts": len(part_paths),
+                        "rows_scored": file_rows,
+                        "rows_skipped": skipped_rows,
+                        "seconds": file_seconds,
+                        "partition_dir": partition_dir,
+                        "merged_path": merged_path,
+                    }
+                    report["rows_scored"] += file_rows
+                    report["rows_skipped"] += skipped_rows
+                    logging.info(
+                        f"Scored {input_path}: {file_rows} rows in {file_seconds:.2f}s "
+                        f"({skipped_rows} rows resumed from earlier parts)"
+                    )
+
+            elapsed = time.perf_counter() - start
+            report["seconds"] = elapsed
+            report["rows_per_second"] = report["rows_scored"] / elapsed if elapsed > 0 else 0.0
+            report["workers"] = self.config.workers
+            report["metrics"] = registry.summary()
+            save_json(os.path.join(self.config.output_dir, "batch_report.json"), report)
+            logging.info(
+                f"Batch scoring finished: {report['rows_scored']} rows in {elapsed:.2f}s "
+                f"({report['rows_per_second']:.0f} rows/sec)"
+            )
+            return report
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+
+def main(argv: Optional[List[str]] = None) -> dict:
+    defaults = BatchScoringConfig()
+    parser = argparse.ArgumentParser(description="Score milk sample datasets in parallel.")
+    parser.add_argument(
+        "inputs", nargs="+", help="CSV/Parquet/Feather files, directories or glob patterns"
+    )
+    parser.add_argument("--output-dir", default=defaults.output_dir)
+    parser.add_argument("--model-path", default=defaults.model_path)
+    parser.add_argument("--encoder-path", default=defaults.encoder_path)
+    parser.add_argument("--workers", type=int, default=defaults.workers)
+    parser.add_argument("--chunksize", type=int, default=defaults.chunksize)
+    parser.add_argument("--no-merge", action="store_true", help="Keep partitioned outputs only")
+    parser.add_argument("--no-resume", action="store_true", help="Rescore parts that already exist")
+    args = parser.parse_args(argv)
+
+    config = BatchScoringConfig(
+        model_path=args.model_path,
+        encoder_path=args.encoder_path,
+        output_dir=args.output_dir,
+        workers=args.workers,
+        chunksize=args.chunksize,
+        merge=not args.no_merge,
+        resume=not args.no_resume,
+    )
+    report = BatchScorer(config).score(args.inputs)
+    print(
+        f"Scored {report['rows_scored']} rows in {report['seconds']:.2f}s "
+        f"({report['rows_per_second']:.0f} rows/sec). Outputs in: {config.output_dir}"
+    )
+    print(registry.format_summary())
+    return report
+
+
+# Run with: python -m src.milk_quality.pipelines.batch_scoring artifacts/*.csv --workers 4
+if __name__ == "__main__":
+    main()
@@ -1,48 +1,333 @@
+import io
 import os
 import sys
+import json
+import time
+import numpy as np
 import pandas as pd
-from src.milk_quality.utils import load_object
+from typing import Callable, Optional
+from concurrent.futures import Future
+from src.milk_quality.model_registry import model_registry
+from src.milk_quality.micro_batcher import MicroBatcher, MicroBatcherConfig
+from src.milk_quality.dataset_io import iter_dataset_chunks, read_dataset, write_dataset
+from src.milk_quality.schema import FEATURE_COLUMNS, SchemaError, enforce_schema
+from src.milk_quality.metrics import registry
 from src.milk_quality.logger import logging
 from src.milk_quality.exception import CustomException
 
+CSV_MEDIA_TYPES = ("text/csv", "application/csv")
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+ARROW_FILE_MEDIA_TYPE = "application/vnd.apache.arrow.file"
+
+PREDICTION_STAGE_SECONDS = registry.histogram(
+    "milk_prediction_stage_seconds",
+    "Time per prediction stage: parse, validate, model, decode or write.",
+    ("stage",),
+)
+PREDICTED_ROWS = registry.counter("milk_predicted_rows_total", "Rows scored by the model.")
+# Bound once so the hot path skips the label lookup
+_PARSE_SECONDS = PREDICTION_STAGE_SECONDS.labels("parse")
+_VALIDATE_SECONDS = PREDICTION_STAGE_SECONDS.labels("validate")
+_MODEL_SECONDS = PREDICTION_STAGE_SECONDS.labels("model")
+_DECODE_SECONDS = PREDICTION_STAGE_SECONDS.labels("decode")
+_WRITE_SECONDS = PREDICTION_STAGE_SECONDS.labels("write")
+
+
+def parse_prediction_payload(body: bytes, content_type: str) -> pd.DataFrame:
+    """
+    Build a feature DataFrame from a raw request body.
+
+    Accepts JSON (a list of records, a single record, or {"records": [...]}),
+    CSV, or Arrow IPC bytes. Raises ValueError for anything malformed.
+    """
+    with _PARSE_SECONDS.time():
+        return _parse_payload(body, content_type)
+
+
+def _parse_payload(body: bytes, content_type: str) -> pd.DataFrame:
+    media_type = (content_type or "application/json").split(";")[0].strip().lower()
+
+    if media_type in CSV_MEDIA_TYPES:
+        try:
+            df = pd.read_csv(io.BytesIO(body))
+        except Exception as e:
+            raise ValueError(f"Invalid CSV payload: {e}")
+    elif media_type in (ARROW_STREAM_MEDIA_TYPE, ARROW_FILE_MEDIA_TYPE):
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ValueError("Arrow payloads require pyarrow to be installed.")
+        try:
+            if media_type == ARROW_STREAM_MEDIA_TYPE:
+                table = pa.ipc.open_stream(body).read_all()
+            else:
+                table = pa.ipc.open_file(pa.BufferReader(body)).read_all()
+        except Exception as e:
+            raise ValueError(f"Invalid Arrow payload: {e}")
+        df = table.to_pandas()
+    elif media_type == "application/json" or media_type.endswith("+json"):
+        try:
+            payload = json.loads(body)
+        except ValueError as e:
+            raise ValueError(f"Invalid JSON payload: {e}")
+        if isinstance(payload, dict):
+            payload = payload.get("records", [payload])
+        if not isinstance(payload, list) or not all(
+            isinstance(record, dict) for record in payload
+        ):
+            raise ValueError("JSON payload must be a record or a list of records.")
+        df = pd.DataFrame.from_records(payload)
+    else:
+        raise ValueError(f"Unsupported content type: {media_type}")
+
+    if df.empty:
+        raise ValueError("Payload contains no records.")
+
+    missing = [col for col in FEATURE_COLUMNS if col not in df.columns]
+    if missing:
+        raise ValueError(f"Missing feature columns: {missing}")
+
+    return df
+
 
 class PredictionPipeline:
-    def __init__(self, model_path: str, encoder_path: str):
+    def __init__(
+        self,
+        model_path: str,
+        encoder_path: str,
+        batcher_config: Optional[MicroBatcherConfig] = None,
+        preprocessor_path: Optional[str] = None,
+    ):
         self.model_path = model_path
         self.encoder_path = encoder_path
+        # Saved next to the label encoder by DataTransformation
+        self.preprocessor_path = preprocessor_path or os.path.join(
+            os.path.dirname(encoder_path), "feature_preprocessor.pkl"
+        )
+
+        # Optional micro-batching of concurrent predict_dataframe calls
+        self.batcher = None
+        if batcher_config is not None and batcher_config.enabled:
+            self.batcher = MicroBatcher(self._predict_features, batcher_config)
+            logging.info(
+                f"Micro-batching enabled: up to {batcher_config.max_batch_size} rows "
+                f"or {batcher_config.max_wait_ms} ms per batch"
+            )
+
+    def __getstate__(self):
+        # The batcher owns a thread and cannot be pickled into process pool
+        # workers; they score directly.
+        state = self.__dict__.copy()
+        state["batcher"] = None
+        return state
+
+    def load_artifacts(self):
+        """
+        Return the (model, encoder) pair from the process-wide registry.
+        """
+        model = model_registry.get(self.model_path)
+        encoder = model_registry.get(self.encoder_path)
+        return model, encoder
+
+    def load_preprocessor(self):
+        """
+        Return the fitted FeaturePreprocessor, or None for models trained before it existed.
+        """
+        if not os.path.exists(self.preprocessor_path):
+            return None
+        return model_registry.get(self.preprocessor_path)
+
+    def warm_up(self) -> bool:
+        """
+        Load the model, encoder and preprocessor (and the libraries they unpickle)
+        now, so the first request does not pay for it.
+
+        Returns False when an artifact cannot be loaded yet; it is then loaded on
+        the first request as before.
+        """
+        try:
+            self.load_artifacts()
+            self.load_preprocessor()
+            return True
+        except Exception:
+            logging.warning("Model warm-up failed; artifacts will be loaded on the first request.")
+            return False
+
+    def predict_dataframe(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        Predict decoded grades for an in-memory DataFrame without touching disk.
+
+        Raises SchemaError (a ValueError) when any row violates the milk schema.
+        """
+        with _VALIDATE_SECONDS.time():
+            features = self.prepare_features(df)
+        try:
+            if self.batcher is not None:
+                return self.batcher.predict(features)
+            return self._predict_features(features)
+
+        except Exception as e:
+            raise CustomException(e, sys)
+
+    def submit_dataframe(self, df: pd.DataFrame) -> Future:
+        """
+        Queue df on the micro-batcher and return a Future of its decoded grades.
+
+        Validation runs in the calling thread; async callers should run
+        prepare_payload in a worker and pass its result to submit_features.
+        """
+        with _VALIDATE_SECONDS.time():
+            features = self.prepare_features(df)
+        return self.submit_features(features)
+
+    def submit_features(self, features: pd.DataFrame) -> Future:
+        """
+        Queue already prepared features on the micro-batcher.
+        """
+        if self.batcher is None:
+            raise RuntimeError("Micro-batching is not enabled for this pipeline.")
+        return self.batcher.submit(features)
+
+    def prepare_payload(self, body: bytes, content_type: str) -> pd.DataFrame:
+        """
+        Parse a raw request body into validated, imputed model features.
+        """
+        df = parse_prediction_payload(body, content_type)
+        with _VALIDATE_SECONDS.time():
+            return self.prepare_features(df)
+
+    def prepare_features(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Select the feature columns in model order, validated, downcast and imputed
+        exactly as in training.
+
+        Bad rows are rejected rather than dropped so predictions stay aligned
+        with the input rows.
+        """
+        missing = [col for col in FEATURE_COLUMNS if col not in df.columns]
+        if missing:
+            raise SchemaError(f"Missing feature columns: {missing}")
+        features = enforce_schema(df[FEATURE_COLUMNS], on_invalid="raise", context="prediction input")
+
+        preprocessor = self.load_preprocessor()
+        if preprocessor is not None:
+            return preprocessor.transform(features)
+        if features.isna().to_numpy().any():
+            raise SchemaError(
+                f"Prediction input has missing values and no feature preprocessor "
+                f"was found at {self.preprocessor_path}."
+            )
+        return features
+
+    def _predict_features(self, features: pd.DataFrame) -> np.ndarray:
+        model, encoder = self.load_artifacts()
+        with _MODEL_SECONDS.time():
+            predictions = model.predict(features)
+        with _DECODE_SECONDS.time():
+            grades = encoder.inverse_transform(predictions)
+        PREDICTED_ROWS.inc(len(grades))
+        return grades
+
+    def predict_payload(self, body: bytes, content_type: str) -> np.ndarray:
+        """
+        Parse a raw request body and predict it; raises ValueError for bad payloads.
+        """
+        df = parse_prediction_payload(body, content_type)
+        return self.predict_dataframe(df)
+
+    def predict_csv_bytes(self, data: bytes) -> pd.DataFrame:
+        """
+        Parse an uploaded CSV and return it with a 'Predicted_Grade' column.
+
+        Raises ValueError for a malformed CSV, like parse_prediction_payload.
+        """
+        df = parse_prediction_payload(data, "text/csv")
+        return self.add_predictions(df)
+
+    def add_predictions(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Return the input without 'Grade' and with a 'Predicted_Grade' column.
+        """
+        # Drop the target column if it exists
+        if "Grade" in df.columns:
+            df = df.drop(columns=["Grade"])
+            logging.info("Dropped target column 'Grade' from input data.")
+
+        df = df.copy()
+        df["Predicted_Grade"] = self.predict_dataframe(df)
+        return df
 
     def predict(
         self, input_csv_path: str, output_csv_path: str = "artifacts/predictions.csv"
     ) -> str:
         logging.info("Prediction started.")
         try:
-            # Load input data
-            df = pd.read_csv(input_csv_path)
-            logging.info(f"Input CSV loaded. Shape: {df.shape}")
+            # Load input data (CSV, Parquet or Feather, by extension)
+            with _PARSE_SECONDS.time():
+                df = read_dataset(input_csv_path)
+            logging.info(f"Input data loaded. Shape: {df.shape}")
 
-            # Drop the target column if it exists
-            if "Grade" in df.columns:
-                df = df.drop(columns=["Grade"])
-                logging.info("Dropped target column 'Grade' from input data.")
+            # Predict on the cached model and encoder
+            df = self.add_predictions(df)
 
-            # Load model and encoder
-            model = load_object(self.model_path)
-            encoder = load_object(self.encoder_path)
-            logging.info("Model and LabelEncoder loaded successfully.")
+            # Save the output in the format given by its extension
+            with _WRITE_SECONDS.time():
+                write_dataset(df, output_csv_path)
+            logging.info(f"Predictions saved at: {output_csv_path}")
 
-            # Perform prediction
-            predictions = model.predict(df)
-            decoded_preds = encoder.inverse_transform(predictions)
+            return output_csv_path
 
-            # Add predictions to the DataFrame
-            df["Predicted_Grade"] = decoded_preds
+        except Exception as e:
+            raise CustomException(e, sys)
 
-            # Save the output
-            os.makedirs(os.path.dirname(output_csv_path), exist_ok=True)
-            df.to_csv(output_csv_path, index=False)
-            logging.info(f"Predictions saved at: {output_csv_path}")
+    def predict_stream(
+        self,
+        input_csv_path: str,
+        output_csv_path: str = "artifacts/predictions.csv",
+        chunksize: int = 100_000,
+        progress_callback: Optional[Callable[[int, float], None]] = None,
+    ) -> dict:
+        """
+        Predict a dataset of any size chunk by chunk, appending each chunk to the
+        output CSV.
 
-            return output_csv_path
+        Memory stays bounded by chunksize. progress_callback, if given, is called
+        after every chunk with (rows_done, elapsed_seconds). Returns a summary with
+        the row count, elapsed time and rows/sec.
+        """
+        logging.info(f"Streaming prediction started (chunksize={chunksize}).")
+        try:
+            os.makedirs(os.path.dirname(output_csv_path) or ".", exist_ok=True)
+            # Write to a temporary file so a failed run never leaves a truncated output
+            tmp_path = f"{output_csv_path}.part"
+
+            rows_done = 0
+            chunks = 0
+            start = time.perf_counter()
+            with open(tmp_path, "w", newline="") as out:
+                for chunk in iter_dataset_chunks(input_csv_path, chunksize):
+                    scored = self.add_predictions(chunk)
+                    with _WRITE_SECONDS.time():
+                        scored.to_csv(out, index=False, header=chunks == 0)
+                    rows_done += len(scored)
+                    chunks += 1
+                    if progress_callback is not None:
+                        progress_callback(rows_done, time.perf_counter() - start)
+            os.replace(tmp_path, output_csv_path)
+
+            elapsed = time.perf_counter() - start
+            summary = {
+                "rows": rows_done,
+                "chunks": chunks,
+                "seconds": elapsed,
+                "rows_per_second": rows_done / elapsed if elapsed > 0 else 0.0,
+                "output_csv_path": output_csv_path,
+            }
+            logging.info(
+                f"Streamed {rows_done} rows in {chunks} chunks, {elapsed:.2f}s "
+                f"({summary['rows_per_second']:.0f} rows/sec). Saved at: {output_csv_path}"
+            )
+            return summary
 
         except Exception as e:
             raise CustomException(e, sys)
@@ -1,35 +1,308 @@
 import os
 import sys
-from src.milk_quality.components.model_trainer import ModelTrainer
+import argparse
+from typing import List, Optional
+
+import pandas as pd
+
+from src.milk_quality.utils import load_environment
+
+# Apply .env before the component configs below read their MILK_* settings
+load_environment()
+
+from src.milk_quality.components.data_ingestion import DataIngestion
+from src.milk_quality.components.data_transformation import DataTransformation
+from src.milk_quality.components.model_trainer import ModelTrainer, fit_candidate, share_cores
+from src.milk_quality.components.model_compiler import ModelCompiler
+from src.milk_quality.dataset_io import read_dataset, write_dataset
+from src.milk_quality.orchestrator import PipelineDAG
+from src.milk_quality.model_store import export_model
+from src.milk_quality.utils import save_object, save_json
+from src.milk_quality.metrics import registry
+from src.milk_quality.stage_cache import stage_cache
 from src.milk_quality.exception import CustomException
 from src.milk_quality.logger import logging
 
+PIPELINE_REPORT_PATH = os.path.join("artifacts", "pipeline_report.json")
+
+
+def split_features(train_df, test_df):
+    return {
+        "X_train": train_df.drop("Grade", axis=1),
+        "y_train": train_df["Grade"].to_numpy(),
+        "X_test": test_df.drop("Grade", axis=1),
+        "y_test": test_df["Grade"].to_numpy(),
+    }
+
+
+def ingest(full_reload: bool = False) -> pd.DataFrame:
+    """
+    Fetch new documents from MongoDB, then return everything ingested so far
+    from the local store: training always fits on the full dataset.
+    """
+    ingestion = DataIngestion()
+    ingestion.initiate_data_ingestion(return_dataframe=False, full_reload=full_reload)
+    return ingestion.load_raw_store()
+
 
-def main():
+def compile_optional(compiler: ModelCompiler, *args) -> Optional[str]:
+    """
+    Compile the lookup-table model, or log why not and return None: the compiled
+    model is an optional serving accelerator, so failing to build it (e.g. a
+    feature grid above max_grid_cells) must not fail the training run.
+    """
     try:
-        logging.info("Model training script initiated.")
+        return compiler.compile_trained(*args)
+    except Exception as e:
+        logging.warning(f"Skipping model compilation: {e}")
+        return None
+
+
+def unless_cached(write):
+    """
+    Wrap a step that computes or persists part of a cached stage so that it is
+    skipped on a cache hit, when its output is already on disk. The wrapped
+    step takes the stage's PendingStage first, then write's own arguments.
+    """
+    def step(pending, *args):
+        return None if pending.hit else write(*args)
+
+    return step
+
+
+def select_candidates(trainer: ModelTrainer, pending, results):
+    if pending.hit:
+        return trainer.load_trained(pending.result)
+    selection = trainer.select_best(results)
+    trainer.prune_cache()
+    return selection
+
+
+def build_training_dag(
+    raw_data_path: Optional[str] = None,
+    search: Optional[bool] = None,
+    full_reload: bool = False,
+    max_workers: Optional[int] = None,
+) -> PipelineDAG:
+    """
+    Wire ingestion -> transformation -> training -> compilation as one DAG.
+
+    DataFrames and fitted models are handed between steps in memory. The
+    train/test sets, encoder and feature preprocessor are saved by four
+    concurrent steps. Candidates fit concurrently, one step each. The model,
+    its memory-mapped export, the metrics report and the compiled model are
+    then written by concurrent steps.
 
-        trainer = ModelTrainer()
-        model_path, model_name, f1 = trainer.train_and_evaluate(
-            train_csv_path="artifacts/train.csv",
-            test_csv_path="artifacts/test.csv",
-            encoder_path="artifacts/label_encoder.pkl",
+    Transformation and training are looked up in the stage cache before they
+    run (*_cache steps), under the same keys as the standalone components, and
+    recorded once all their outputs are written (record_* steps). On a hit,
+    their steps load the saved outputs instead of recomputing them. With
+    raw_data_path the pipeline starts from that dataset instead of ingesting
+    from MongoDB.
+    """
+    transformation = DataTransformation()
+    trainer = ModelTrainer()
+    compiler = ModelCompiler()
+    search = trainer.config.search if search is None else search
+    split_config = transformation.config
+    train_path = split_config.train_csv_path
+    test_path = split_config.test_csv_path
+
+    dag = PipelineDAG(max_workers=max_workers)
+
+    if raw_data_path:
+        dag.add("ingestion", lambda: read_dataset(raw_data_path))
+    else:
+        dag.add("ingestion", lambda: ingest(full_reload))
+
+    dag.add(
+        "transformation_cache",
+        lambda df: stage_cache.begin("data_transformation", **transformation.stage_spec(df)),
+        deps=("ingestion",),
+    )
+    dag.add(
+        "transformation",
+        lambda pending, df: transformation.load_split() if pending.hit else transformation.split(df),
+        deps=("transformation_cache", "ingestion"),
+    )
+    save_steps = {
+        "save_train_set": lambda split: write_dataset(split[0], train_path),
+        "save_test_set": lambda split: write_dataset(split[1], test_path),
+        "save_encoder": lambda split: save_object(split_config.preprocessor_obj_file_path, split[2]),
+        "save_feature_preprocessor": lambda split: save_object(
+            split_config.feature_preprocessor_path, split[3]
+        ),
+    }
+    for step, write in save_steps.items():
+        dag.add(step, unless_cached(write), deps=("transformation_cache", "transformation"))
+    dag.add(
+        "record_transformation",
+        lambda pending, *_: stage_cache.commit(pending, list(transformation.result_paths())),
+        deps=("transformation_cache", *save_steps),
+    )
+    dag.add("features", lambda split: split_features(split[0], split[1]), deps=("transformation",))
+
+    # Training is keyed on the saved train/test sets
+    dag.add(
+        "training_cache",
+        lambda *_: stage_cache.begin(
+            "model_training", **trainer.stage_spec(train_path, test_path, search)
+        ),
+        deps=("save_train_set", "save_test_set"),
+    )
+    if search:
+        # Imported here: the search pulls in scipy.stats
+        from src.milk_quality.components.model_search import ModelSearch
+
+        dag.add(
+            "model_search",
+            unless_cached(
+                lambda f: ModelSearch().search(f["X_train"], f["y_train"], f["X_test"], f["y_test"])
+            ),
+            deps=("training_cache", "features"),
         )
+        dag.add(
+            "model_selection",
+            lambda pending, result: trainer.load_trained(pending.result) if pending.hit else result,
+            deps=("training_cache", "model_search"),
+        )
+    else:
+        # One step per candidate so they fit concurrently, sharing the cores
+        fit_steps = []
+        models = trainer.candidate_models()
+        for name, model in share_cores(models, len(models)).items():
+            step = f"fit_{name}"
+            dag.add(
+                step,
+                unless_cached(
+                    lambda f, name=name, model=model: fit_candidate(
+                        name,
+                        model,
+                        f["X_train"],
+                        f["y_train"],
+                        f["X_test"],
+                        f["y_test"],
+                        trainer.train_eval_index(len(f["X_train"])),
+                        trainer.config.cache_dir,
+                    )
+                ),
+                deps=("training_cache", "features"),
+            )
+            fit_steps.append(step)
+        dag.add(
+            "model_selection",
+            lambda pending, *results: select_candidates(trainer, pending, results),
+            deps=("training_cache", *fit_steps),
+        )
+
+    dag.add(
+        "save_model",
+        unless_cached(lambda selection: save_object(trainer.config.model_path, selection[1])),
+        deps=("training_cache", "model_selection"),
+    )
+    dag.add(
+        "export_model",
+        unless_cached(
+            lambda selection, f: export_model(
+                selection[1], trainer.config.model_artifact_path, f["X_test"]
+            )
+        ),
+        deps=("training_cache", "model_selection", "features"),
+    )
+    dag.add(
+        "evaluation_report",
+        unless_cached(lambda selection: save_json(trainer.config.metrics_path, selection[2])),
+        deps=("training_cache", "model_selection"),
+    )
+    dag.add(
+        "record_training",
+        lambda pending, selection, *_: stage_cache.commit(
+            pending, [trainer.config.model_path, selection[0], selection[2]["best_test_f1"]]
+        ),
+        deps=("training_cache", "model_selection", "save_model", "export_model", "evaluation_report"),
+    )
+    # Keyed on the saved model, so it waits for save_model but not for the other writes
+    dag.add(
+        "model_compilation",
+        lambda selection, f, _: compile_optional(
+            compiler,
+            selection[1],
+            f["X_train"],
+            f["X_test"],
+            trainer.config.model_path,
+            train_path,
+            test_path,
+        ),
+        deps=("model_selection", "features", "save_model"),
+    )
+    return dag
+
 
-        logging.info("Model training complete.")
+def main(argv: Optional[List[str]] = None) -> dict:
+    parser = argparse.ArgumentParser(description="Run the end-to-end milk quality training pipeline.")
+    parser.add_argument(
+        "--raw-data-path", help="Start from this CSV/Parquet/Feather dataset instead of MongoDB"
+    )
+    parser.add_argument("--search", action="store_true", help="Run the hyperparameter search")
+    parser.add_argument("--full-reload", action="store_true", help="Re-ingest the whole collection")
+    parser.add_argument("--workers", type=int, help="Steps run concurrently")
+    parser.add_argument("--report-path", default=PIPELINE_REPORT_PATH)
+    args = parser.parse_args(argv)
+
+    try:
+        logging.info("Training pipeline initiated.")
+
+        dag = build_training_dag(
+            raw_data_path=args.raw_data_path,
+            search=True if args.search else None,
+            full_reload=args.full_reload,
+            max_workers=args.workers,
+        )
+        results, report = dag.run()
+
+        model_name, _, metrics = results["model_selection"]
+        report["best_model"] = model_name
+        report["best_test_f1"] = metrics["best_test_f1"]
+        report["compiled_model_path"] = results["model_compilation"]
+        # Which stages were skipped because nothing changed, and the time saved
+        cache_summary = stage_cache.log_summary()
+        report["stage_cache"] = cache_summary
+        report["metrics"] = registry.summary()
+        save_json(args.report_path, report)
+
+        logging.info("Training pipeline complete.")
         logging.info(f"Best model: {model_name}")
-        logging.info(f"F1 Score: {f1}")
-        logging.info(f"Model saved at: {model_path}")
+        logging.info(f"F1 Score: {metrics['best_test_f1']}")
 
-        print("Model training complete.")
+        print("Training pipeline complete.")
         print(f"Best model: {model_name}")
-        print(f"F1 Score: {f1}")
-        print(f"Model saved at: {model_path}")
+        print(f"F1 Score: {metrics['best_test_f1']}")
+        print(f"Model saved at: {ModelTrainer().config.model_path}")
+        if results["model_compilation"]:
+            print(f"Compiled model saved at: {results['model_compilation']}")
+        else:
+            print("Compiled model skipped (see the log).")
+        for name, timing in report["steps"].items():
+            print(
+                f"  {name:<26} +{timing['start_offset_seconds']:7.3f}s "
+                f"{timing['seconds']:8.3f}s"
+            )
+        print(
+            f"Wall time {report['wall_seconds']:.3f}s for {report['step_seconds']:.3f}s of "
+            f"step time (parallelism {report['parallelism']:.2f}x). Report: {args.report_path}"
+        )
+        print(
+            f"Stage cache: {cache_summary['hits']} hit(s), {cache_summary['misses']} miss(es), "
+            f"{cache_summary['saved_seconds']:.2f}s saved."
+        )
+        print(registry.format_summary())
+        return report
 
     except Exception as e:
-        logging.error("Model training failed.")
+        logging.error("Training pipeline failed.")
         raise CustomException(e, sys)
 
 
+# Run with: python -m src.milk_quality.pipelines.training [--raw-data-path data.csv]
 if __name__ == "__main__":
     main()
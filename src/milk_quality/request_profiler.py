@@ -0,0 +1,351 @@
+import os
+import sys
+import hmac
+import json
+import time
+import random
+import asyncio
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from src.milk_quality.logger import logging
+
+PROFILE_HEADER = "X-Milk-Profile"
+PROFILE_ID_HEADER = "X-Milk-Profile-Id"
+# Requests under this prefix manage profiles and are never profiled themselves
+ADMIN_PREFIX = "/admin/"
+
+# Innermost frames of threads parked on a lock, queue or selector; sampling
+# them would bury the request's own stacks under idle pool and event-loop threads
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+
+@dataclass
+class RequestProfilerConfig:
+    # Set MILK_PROFILING=1 to install the profiler; otherwise the apps skip it entirely
+    enabled: bool = os.getenv("MILK_PROFILING", "0") == "1"
+    # Fraction of requests profiled without being asked to
+    sample_rate: float = float(os.getenv("MILK_PROFILE_SAMPLE_RATE", "0"))
+    # The X-Milk-Profile header and the admin endpoints must carry this token;
+    # without one, only sample_rate selects requests and the endpoints refuse
+    token: str = os.getenv("MILK_PROFILE_TOKEN", "")
+    interval: float = float(os.getenv("MILK_PROFILE_INTERVAL", "0.002"))
+    output_dir: str = os.getenv("MILK_PROFILE_DIR", os.path.join("artifacts", "profiles"))
+    # Oldest profiles are deleted beyond this many
+    max_profiles: int = int(os.getenv("MILK_PROFILE_MAX_FILES", "100"))
+
+
+class StackSampler:
+    """
+    Wall-clock sampling profiler: a background thread records the Python stack
+    of every busy thread each interval, as flamegraph folded stacks.
+
+    Sampling all threads catches work the request hands to the inference pool
+    or the micro-batcher, which cProfile (per thread) would miss. Stacks of
+    concurrent requests are sampled too; each stack starts with its thread name.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._labels: Dict[object, str] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            path = code.co_filename
+            for prefix in sorted(sys.path, key=len, reverse=True):
+                if prefix and path.startswith(prefix + os.sep):
+                    path = path[len(prefix) + 1:]
+                    break
+            # Semicolons separate frames in the folded format
+            label = f"{code.co_name} ({path}:{code.co_firstlineno})".replace(";", ":")
+            self._labels[code] = label
+        return label
+
+    def sample(self) -> None:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        own = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            code = frame.f_code
+            if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._label(frame.f_code))
+                frame = frame.f_back
+            stack.append(names.get(ident, str(ident)).replace(";", ":"))
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def start(self) -> "StackSampler":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class RequestProfiler:
+    """
+    Decide which requests to profile and write their profiles to disk.
+
+    A request is profiled when it sends the configured token in the
+    X-Milk-Profile header, when the admin endpoint has armed the next N
+    requests, or at random at sample_rate. One request is profiled at a time;
+    others that ask while a profile runs are served without one.
+
+    Each profile is <id>.folded, collapsed stacks that flamegraph.pl, inferno
+    and speedscope read as-is, next to <id>.json with the request details.
+    """
+
+    def __init__(self, config: Optional[RequestProfilerConfig] = None):
+        self.config = config or RequestProfilerConfig()
+        self._armed = 0
+        self._lock = threading.Lock()
+        self._active = threading.Lock()
+        if self.config.enabled and not self.config.token:
+            logging.warning(
+                "MILK_PROFILE_TOKEN is not set: on-demand profiling and the /admin "
+                "profiling endpoints are refused; only MILK_PROFILE_SAMPLE_RATE applies."
+            )
+
+    def authorized(self, value: Optional[str]) -> bool:
+        # No token configured means nobody is authorized, never everybody
+        if not self.config.token or not value:
+            return False
+        return hmac.compare_digest(value.encode(), self.config.token.encode())
+
+    def arm(self, requests: int) -> int:
+        """
+        Profile the next `requests` requests; returns how many are armed.
+        """
+        with self._lock:
+            self._armed = max(requests, 0)
+            return self._armed
+
+    def begin(self, header_value: Optional[str]) -> Optional[StackSampler]:
+        """
+        Start profiling a request if it is selected, or return None.
+
+        An armed request is used up only once its profile has actually started,
+        not by a request that found another profile running.
+        """
+        armed = False
+        if not self.authorized(header_value):
+            with self._lock:
+                armed = self._armed > 0
+            if not armed and random.random() >= self.config.sample_rate:
+                return None
+        sampler = self.start()
+        if sampler is not None and armed:
+            with self._lock:
+                self._armed = max(self._armed - 1, 0)
+        return sampler
+
+    def start(self) -> Optional[StackSampler]:
+        """
+        Start sampling, or return None when another profile is already running.
+        """
+        if not self._active.acquire(blocking=False):
+            return None
+        try:
+            return StackSampler(self.config.interval).start()
+        except Exception:
+            self._active.release()
+            raise
+
+    @staticmethod
+    def new_id(method: str, path: str) -> str:
+        slug = "".join(c if c.isalnum() else "_" for c in path.strip("/")) or "root"
+        return f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%f')}_{method.lower()}_{slug[:60]}"
+
+    def finish(
+        self, sampler: StackSampler, profile_id: str, method: str, path: str, status: int, seconds: float
+    ) -> bool:
+        """
+        Stop sampling and write the profile under profile_id.
+
+        A profile that cannot be written is logged and dropped, never failing the request.
+        """
+        try:
+            sampler.stop()
+        finally:
+            self._active.release()
+
+        meta = {
+            "id": profile_id,
+            "method": method,
+            "path": path,
+            "status": status,
+            "seconds": seconds,
+            "samples": sampler.samples,
+            "interval": sampler.interval,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        }
+        try:
+            os.makedirs(self.config.output_dir, exist_ok=True)
+            base = os.path.join(self.config.output_dir, profile_id)
+            with open(f"{base}.folded", "w") as f:
+                f.write(sampler.folded())
+            with open(f"{base}.json", "w") as f:
+                json.dump(meta, f, indent=4)
+            self._prune()
+        except OSError as e:
+            logging.warning(f"Could not write request profile {profile_id}: {e}")
+            return False
+        logging.info(f"Profiled {method} {path} ({seconds * 1000:.1f}ms, {sampler.samples} samples): {profile_id}")
+        return True
+
+    def _prune(self) -> None:
+        profiles = sorted(name for name in os.listdir(self.config.output_dir) if name.endswith(".json"))
+        for name in profiles[: max(len(profiles) - self.config.max_profiles, 0)]:
+            base = os.path.join(self.config.output_dir, name[: -len(".json")])
+            for suffix in (".json", ".folded"):
+                if os.path.exists(base + suffix):
+                    os.remove(base + suffix)
+
+    def folded_path(self, profile_id: str) -> Optional[str]:
+        """
+        Path of a stored profile's folded stacks, or None for an unknown ID.
+        """
+        if not profile_id or not all(c.isalnum() or c == "_" for c in profile_id):
+            return None
+        path = os.path.join(self.config.output_dir, f"{profile_id}.folded")
+        return path if os.path.exists(path) else None
+
+    def list_profiles(self, limit: int = 20) -> List[dict]:
+        """
+        Details of the most recent profiles, newest first.
+        """
+        if not os.path.isdir(self.config.output_dir):
+            return []
+        names = sorted((n for n in os.listdir(self.config.output_dir) if n.endswith(".json")), reverse=True)
+        profiles = []
+        for name in names[:limit]:
+            try:
+                with open(os.path.join(self.config.output_dir, name)) as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return profiles
+
+
+class ASGIProfilerMiddleware:
+    """
+    Profile the HTTP requests the RequestProfiler selects, from the first byte
+    received to the last byte sent, and return the profile ID in a response header.
+    """
+
+    def __init__(self, app, profiler: RequestProfiler):
+        self.app = app
+        self.profiler = profiler
+        self.header = PROFILE_HEADER.lower().encode()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith(ADMIN_PREFIX):
+            await self.app(scope, receive, send)
+            return
+        value = next((v.decode("latin-1") for k, v in scope["headers"] if k == self.header), None)
+        sampler = self.profiler.begin(value)
+        if sampler is None:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+        profile_id = self.profiler.new_id(scope["method"], scope["path"])
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((PROFILE_ID_HEADER.lower().encode(), profile_id.encode()))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            seconds = time.perf_counter() - start
+            # Stopping the sampler joins its thread and writing the profile hits
+            # the disk; neither may stall the event loop
+            await asyncio.to_thread(
+                self.profiler.finish, sampler, profile_id, scope["method"], scope["path"], status, seconds
+            )
+
+
+class _ProfiledBody:
+    # WSGI servers call close() once the body is sent (or abandoned), which ends the profile
+    def __init__(self, body, done):
+        self.body = body
+        self.done = done
+
+    def __iter__(self):
+        return iter(self.body)
+
+    def close(self):
+        try:
+            if hasattr(self.body, "close"):
+                self.body.close()
+        finally:
+            self.done()
+
+
+class WSGIProfilerMiddleware:
+    """
+    The WSGI counterpart of ASGIProfilerMiddleware, for the Flask app.
+    """
+
+    def __init__(self, app, profiler: RequestProfiler):
+        self.app = app
+        self.profiler = profiler
+        self.environ_key = "HTTP_" + PROFILE_HEADER.upper().replace("-", "_")
+
+    def __call__(self, environ, start_response):
+        path = environ.get("PATH_INFO", "")
+        sampler = None if path.startswith(ADMIN_PREFIX) else self.profiler.begin(environ.get(self.environ_key))
+        if sampler is None:
+            return self.app(environ, start_response)
+
+        method = environ.get("REQUEST_METHOD", "GET")
+        status = [500]
+        start = time.perf_counter()
+        profile_id = self.profiler.new_id(method, path)
+
+        def start_with_id(status_line, headers, exc_info=None):
+            status[0] = int(status_line.split(" ", 1)[0])
+            return start_response(status_line, list(headers) + [(PROFILE_ID_HEADER, profile_id)], exc_info)
+
+        def done():
+            self.profiler.finish(sampler, profile_id, method, path, status[0], time.perf_counter() - start)
+
+        try:
+            body = self.app(environ, start_with_id)
+        except BaseException:
+            done()
+            raise
+        return _ProfiledBody(body, done)
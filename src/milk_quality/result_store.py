@@ -0,0 +1,278 @@
+import os
+import re
+import sys
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.milk_quality.dataset_io import write_dataset
+from src.milk_quality.logger import logging
+from src.milk_quality.exception import CustomException
+
+RESULT_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+SPILL_SWEEP_INTERVAL_SECONDS = 60
+GRADE_COLUMN = "Predicted_Grade"
+
+
+@dataclass
+class ResultStoreConfig:
+    ttl_seconds: float = float(os.getenv("MILK_RESULT_TTL_SECONDS", "3600"))
+    max_entries: int = int(os.getenv("MILK_RESULT_MAX_ENTRIES", "100"))
+    # Set MILK_RESULT_SPILL_DIR to an empty string to keep results in memory only.
+    # Spilled results are what lets a request land on any uvicorn worker.
+    spill_dir: Optional[str] = field(
+        default_factory=lambda: os.getenv(
+            "MILK_RESULT_SPILL_DIR", os.path.join("artifacts", "results")
+        )
+        or None
+    )
+
+
+class ResultView:
+    """
+    Read-only, paginated access to one stored result, held as an Arrow table.
+
+    Pages and chunks are zero-copy slices of the table (of the memory-mapped
+    spill file when there is one), so only the rows being rendered are
+    converted to pandas. Filtering by Predicted_Grade goes through an index of
+    row positions per grade, built on first use with one stable argsort.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self._grade_index: Optional[Dict[str, np.ndarray]] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "ResultView":
+        import pyarrow as pa
+
+        return cls(pa.Table.from_pandas(df, preserve_index=False))
+
+    @classmethod
+    def open(cls, path: str) -> "ResultView":
+        from pyarrow import feather
+
+        return cls(feather.read_table(path, memory_map=True))
+
+    @property
+    def columns(self) -> List[str]:
+        return self.table.column_names
+
+    @property
+    def num_rows(self) -> int:
+        return self.table.num_rows
+
+    def grade_index(self) -> Dict[str, np.ndarray]:
+        """
+        Row positions for each predicted grade, in row order.
+        """
+        if self._grade_index is None:
+            with self._lock:
+                if self._grade_index is None:
+                    self._grade_index = self._build_grade_index()
+        return self._grade_index
+
+    def _build_grade_index(self) -> Dict[str, np.ndarray]:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        if GRADE_COLUMN not in self.columns:
+            return {}
+        column = self.table.column(GRADE_COLUMN)
+        if pa.types.is_dictionary(column.type):
+            column = column.cast(column.type.value_type)
+        encoded = pc.dictionary_encode(column.combine_chunks())
+        labels = encoded.dictionary.to_pylist()
+        # Missing grades get a code past the last label and are left out
+        codes = pc.fill_null(encoded.indices, len(labels)).to_numpy(zero_copy_only=False)
+        order = np.argsort(codes, kind="stable")
+        bounds = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(labels) + 1))])
+        return {
+            str(label): order[bounds[code]:bounds[code + 1]]
+            for code, label in sorted(enumerate(labels), key=lambda item: str(item[1]))
+        }
+
+    def grade_counts(self) -> Dict[str, int]:
+        return {grade: len(positions) for grade, positions in self.grade_index().items()}
+
+    def count(self, grade: Optional[str] = None) -> int:
+        if grade is None:
+            return self.num_rows
+        return len(self.grade_index().get(grade, ()))
+
+    def page(self, offset: int, limit: int, grade: Optional[str] = None) -> pd.DataFrame:
+        """
+        Rows [offset, offset + limit) of the result, or of the rows predicted as grade.
+        """
+        offset = max(offset, 0)
+        if grade is None:
+            rows = self.table.slice(offset, max(limit, 0))
+        else:
+            positions = self.grade_index().get(grade, np.empty(0, dtype=np.int64))
+            rows = self.table.take(positions[offset:offset + max(limit, 0)])
+        return rows.to_pandas()
+
+    def iter_chunks(
+        self,
+        chunk_rows: int = 10_000,
+        grade: Optional[str] = None,
+        offset: int = 0,
+        limit: Optional[int] = None,
+    ) -> Iterator[pd.DataFrame]:
+        """
+        Yield the (optionally filtered) rows as DataFrames of at most chunk_rows rows.
+        """
+        end = self.count(grade)
+        if limit is not None:
+            end = min(end, offset + limit)
+        for start in range(max(offset, 0), end, chunk_rows):
+            yield self.page(start, min(chunk_rows, end - start), grade)
+
+    def to_frame(self) -> pd.DataFrame:
+        return self.table.to_pandas()
+
+
+class ResultStore:
+    """
+    Prediction results keyed by a per-request ID.
+
+    Results are held in memory with a TTL and LRU eviction once max_entries is
+    exceeded. When a spill directory is configured every result is also written
+    there as uncompressed Feather, so other worker processes (or this one, after
+    eviction) can serve it; the in-memory entry is then a view of the
+    memory-mapped file rather than a second copy of the rows.
+    """
+
+    def __init__(self, config: Optional[ResultStoreConfig] = None):
+        self.config = config or ResultStoreConfig()
+        self._entries: "OrderedDict[str, Tuple[float, ResultView]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+        if self.config.spill_dir:
+            os.makedirs(self.config.spill_dir, exist_ok=True)
+
+    @staticmethod
+    def is_valid_id(result_id: str) -> bool:
+        return bool(RESULT_ID_PATTERN.fullmatch(result_id or ""))
+
+    def spill_path(self, result_id: str) -> Optional[str]:
+        if not self.config.spill_dir or not self.is_valid_id(result_id):
+            return None
+        return os.path.join(self.config.spill_dir, f"{result_id}.feather")
+
+    def put(self, df: pd.DataFrame) -> str:
+        """
+        Store a result DataFrame and return its new ID.
+        """
+        try:
+            result_id = uuid.uuid4().hex
+            now = time.time()
+
+            path = self.spill_path(result_id)
+            if path:
+                # Written to a temporary name and renamed, so readers never see a partial file
+                write_dataset(df, path, compact=False)
+                view = ResultView.open(path)
+            else:
+                view = ResultView.from_frame(df)
+
+            with self._lock:
+                self._entries[result_id] = (now, view)
+                self._evict(now)
+            if path and now - self._last_sweep > SPILL_SWEEP_INTERVAL_SECONDS:
+                self._last_sweep = now
+                self._sweep_spill_dir(now)
+
+            logging.info(f"Stored prediction result {result_id} ({len(df)} rows)")
+            return result_id
+
+        except Exception as e:
+            logging.error("Failed to store prediction result.", exc_info=True)
+            raise CustomException(e, sys)
+
+    def get_view(self, result_id: str) -> Optional[ResultView]:
+        """
+        Return a paginated view of the stored result, or None if it is unknown or expired.
+        """
+        if not self.is_valid_id(result_id):
+            return None
+
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(result_id)
+            if entry is not None:
+                created_at, view = entry
+                if now - created_at <= self.config.ttl_seconds:
+                    self._entries.move_to_end(result_id)
+                    return view
+                del self._entries[result_id]
+
+        path = self.find_spilled(result_id)
+        if path is None:
+            return None
+
+        view = ResultView.open(path)
+        with self._lock:
+            self._entries[result_id] = (os.path.getmtime(path), view)
+            self._evict(now)
+        return view
+
+    def get(self, result_id: str) -> Optional[pd.DataFrame]:
+        """
+        Return the whole stored result as a DataFrame, or None if it is unknown or expired.
+        """
+        view = self.get_view(result_id)
+        return None if view is None else view.to_frame()
+
+    def find_spilled(self, result_id: str) -> Optional[str]:
+        """
+        Return the spilled Feather path for result_id if it exists and has not expired.
+        """
+        path = self.spill_path(result_id)
+        if path is None or not os.path.exists(path):
+            return None
+        if time.time() - os.path.getmtime(path) > self.config.ttl_seconds:
+            self._remove_file(path)
+            return None
+        return path
+
+    def _evict(self, now: float) -> None:
+        # Caller holds the lock.
+        expired = [
+            result_id
+            for result_id, (created_at, _) in self._entries.items()
+            if now - created_at > self.config.ttl_seconds
+        ]
+        for result_id in expired:
+            del self._entries[result_id]
+            path = self.spill_path(result_id)
+            if path:
+                self._remove_file(path)
+
+        # Over capacity: drop least recently used from memory; spilled copies stay.
+        while len(self._entries) > self.config.max_entries:
+            self._entries.popitem(last=False)
+
+    def _sweep_spill_dir(self, now: float) -> None:
+        # Spilled results written by other workers are only expired here.
+        for name in os.listdir(self.config.spill_dir):
+            path = os.path.join(self.config.spill_dir, name)
+            try:
+                if now - os.path.getmtime(path) > self.config.ttl_seconds:
+                    self._remove_file(path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _remove_file(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,138 @@
+import html
+import math
+import zlib
+from typing import Iterable, Iterator, List, Optional
+
+import pandas as pd
+
+from src.milk_quality.result_store import ResultView
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_CHUNK_ROWS = 10_000
+TABLE_CLASSES = "table table-bordered"
+
+
+def paginate(
+    view: ResultView,
+    page: int = 1,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    grade: Optional[str] = None,
+) -> dict:
+    """
+    Template context for one page of a stored result.
+
+    Only the rows on the page are converted to pandas and rendered, whatever
+    the size of the result. page and page_size are clamped to valid values and
+    an unknown grade yields an empty page.
+    """
+    grade = grade or None
+    page_size = min(max(page_size, 1), MAX_PAGE_SIZE)
+    total = view.count(grade)
+    pages = max(math.ceil(total / page_size), 1)
+    page = min(max(page, 1), pages)
+    rows = view.page((page - 1) * page_size, page_size, grade)
+    return {
+        "table": rows.to_html(classes=TABLE_CLASSES, index=False),
+        "page": page,
+        "pages": pages,
+        "page_size": page_size,
+        "grade": grade,
+        "grades": view.grade_counts(),
+        "total": total,
+        "num_rows": view.num_rows,
+    }
+
+
+def iter_csv(chunks: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    """
+    Encode DataFrame chunks as one CSV, with the header before the first chunk.
+    """
+    header = True
+    for chunk in chunks:
+        yield chunk.to_csv(index=False, header=header).encode()
+        header = False
+
+
+def iter_ndjson(chunks: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    """
+    Encode DataFrame chunks as newline-delimited JSON, one record per line.
+    """
+    for chunk in chunks:
+        if len(chunk):
+            body = chunk.to_json(orient="records", lines=True)
+            yield (body if body.endswith("\n") else body + "\n").encode()
+
+
+def iter_html_table(chunks: Iterable[pd.DataFrame], columns: List[str]) -> Iterator[bytes]:
+    """
+    Encode DataFrame chunks as one HTML table, its rows sent chunk by chunk.
+    """
+    head = "".join(f"<th>{html.escape(str(column))}</th>" for column in columns)
+    yield (
+        f'<table border="1" class="dataframe {TABLE_CLASSES}">\n'
+        f"<thead><tr>{head}</tr></thead>\n<tbody>\n"
+    ).encode()
+    for chunk in chunks:
+        cells = chunk.astype(str).to_numpy()
+        yield "".join(
+            "<tr>" + "".join(f"<td>{html.escape(value)}</td>" for value in row) + "</tr>\n"
+            for row in cells
+        ).encode()
+    yield b"</tbody>\n</table>\n"
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """
+    Whether an Accept-Encoding header allows gzip; q=0 refuses it and an
+    explicit gzip entry takes precedence over "*".
+    """
+    qualities = {}
+    for entry in (accept_encoding or "").split(","):
+        coding, _, params = entry.partition(";")
+        params = params.strip().lower()
+        try:
+            quality = float(params[2:]) if params.startswith("q=") else 1.0
+        except ValueError:
+            quality = 0.0
+        qualities[coding.strip().lower()] = quality
+    return qualities.get("gzip", qualities.get("*", 0.0)) > 0
+
+
+def gzip_chunks(chunks: Iterable[bytes], level: int = 6) -> Iterator[bytes]:
+    """
+    Gzip a byte stream incrementally, so the response never holds the whole body.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+ROW_STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "html": "text/html; charset=utf-8",
+}
+
+
+def stream_rows(
+    view: ResultView,
+    fmt: str = "ndjson",
+    grade: Optional[str] = None,
+    offset: int = 0,
+    limit: Optional[int] = None,
+):
+    """
+    Return (byte iterator, media type) streaming the result's rows, optionally
+    filtered by grade and windowed by offset/limit, as NDJSON or an HTML table.
+
+    Raises ValueError for an unknown format.
+    """
+    if fmt not in ROW_STREAM_MEDIA_TYPES:
+        raise ValueError(f"Unsupported format: {fmt}; use one of {sorted(ROW_STREAM_MEDIA_TYPES)}")
+    chunks = view.iter_chunks(STREAM_CHUNK_ROWS, grade or None, offset, limit)
+    if fmt == "html":
+        return iter_html_table(chunks, view.columns), ROW_STREAM_MEDIA_TYPES[fmt]
+    return iter_ndjson(chunks), ROW_STREAM_MEDIA_TYPES[fmt]
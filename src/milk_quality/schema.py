@@ -0,0 +1,195 @@
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.milk_quality.logger import logging
+
+
+@dataclass(frozen=True)
+class ColumnSpec:
+    name: str
+    # Smallest dtype that holds every valid value
+    dtype: str
+    min_value: float
+    max_value: float
+    integral: bool = True
+
+
+# The single declared schema for milk samples. Bounds are physical limits rather
+# than the training range so unusual but real samples are still scored.
+FEATURE_SPECS = (
+    ColumnSpec("pH", "float32", 0.0, 14.0, integral=False),
+    ColumnSpec("Temprature", "int16", 0, 150),
+    ColumnSpec("Taste", "int8", 0, 1),
+    ColumnSpec("Odor", "int8", 0, 1),
+    ColumnSpec("Fat", "int8", 0, 1),
+    ColumnSpec("Turbidity", "int8", 0, 1),
+    ColumnSpec("Colour", "uint8", 0, 255),
+)
+FEATURE_COLUMNS = [spec.name for spec in FEATURE_SPECS]
+
+TARGET_COLUMN = "Grade"
+GRADE_LABELS = ("high", "low", "medium")
+# Encoded grades are LabelEncoder codes for GRADE_LABELS
+TARGET_ENCODED_SPEC = ColumnSpec(TARGET_COLUMN, "int8", 0, len(GRADE_LABELS) - 1)
+
+
+class SchemaError(ValueError):
+    """Raised when rows violate the milk schema and on_invalid="raise"."""
+
+
+def _numeric_values(raw: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return (values, unparseable mask). Numeric columns pass through untouched;
+    anything else is coerced, and values that only became NaN through coercion
+    are unparseable.
+    """
+    values = raw.to_numpy()
+    if values.dtype.kind in "biuf":
+        return values, np.zeros(len(values), dtype=bool)
+    coerced = pd.to_numeric(raw, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    return coerced, np.isnan(coerced) & ~raw.isna().to_numpy()
+
+
+def _invalid_values(values: np.ndarray, spec: ColumnSpec) -> np.ndarray:
+    # Cheap min/max first; the element-wise masks are only built when they fail
+    if values.size == 0:
+        return np.zeros(0, dtype=bool)
+    is_float = values.dtype.kind == "f"
+    if is_float:
+        low, high = np.nanmin(values, initial=np.inf), np.nanmax(values, initial=-np.inf)
+    else:
+        low, high = values.min(), values.max()
+    in_range = low >= spec.min_value and high <= spec.max_value
+    integral = not spec.integral or not is_float or bool(np.all(np.mod(values[~np.isnan(values)], 1) == 0))
+    if in_range and integral:
+        return np.zeros(len(values), dtype=bool)
+    with np.errstate(invalid="ignore"):
+        bad = (values < spec.min_value) | (values > spec.max_value)
+        if spec.integral and is_float:
+            # np.mod(NaN, 1) is NaN, which is != 0; mask it out explicitly
+            bad |= (np.mod(values, 1) != 0) & ~np.isnan(values)
+    # NaN compares False in the range checks and is masked in the integral one,
+    # so missing values are never flagged here
+    return bad
+
+
+def _compact_values(values: np.ndarray, spec: ColumnSpec) -> np.ndarray:
+    """
+    Cast to spec.dtype when every value fits; NaN columns become float32.
+
+    Casting out-of-range or fractional values to a small integer dtype would
+    silently wrap or truncate them, so such columns keep their dtype.
+    """
+    if values.dtype.kind == "f" and np.isnan(values).any():
+        return values.astype(np.float32, copy=False)
+    if _invalid_values(values, spec).any():
+        return values
+    return values.astype(spec.dtype, copy=False)
+
+
+def _compact_target(target: pd.Series):
+    values = target.to_numpy()
+    if values.dtype.kind in "biuf":
+        return _compact_values(values, TARGET_ENCODED_SPEC)
+    return pd.Categorical(target)
+
+
+def downcast(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cast schema columns to their compact dtypes where every value fits.
+
+    Feature columns that hold NaN become float32 (integers cannot hold NaN); the
+    target becomes int8 when label-encoded or category when it holds grade labels.
+    """
+    columns = {}
+    for spec in FEATURE_SPECS:
+        if spec.name in df.columns and df[spec.name].dtype.kind in "biuf":
+            columns[spec.name] = _compact_values(df[spec.name].to_numpy(), spec)
+    if TARGET_COLUMN in df.columns and not df[TARGET_COLUMN].isna().any():
+        columns[TARGET_COLUMN] = _compact_target(df[TARGET_COLUMN])
+    return _rebuild(df, columns)
+
+
+def _rebuild(df: pd.DataFrame, columns: dict, keep: Optional[np.ndarray] = None) -> pd.DataFrame:
+    # One DataFrame construction instead of an astype or assign per column. Schema
+    # columns come already filtered by keep; the other columns are filtered here.
+    data = {}
+    for name in df.columns:
+        if name in columns:
+            data[name] = columns[name]
+        else:
+            data[name] = df[name].array if keep is None else df[name].array[keep]
+    index = df.index if keep is None else df.index[keep]
+    return pd.DataFrame(data, index=index, columns=df.columns, copy=False)
+
+
+def enforce_schema(
+    df: pd.DataFrame,
+    on_invalid: str = "drop",
+    require_target: bool = False,
+    context: Optional[str] = None,
+) -> pd.DataFrame:
+    """
+    Validate, drop or reject invalid rows, and downcast to the compact schema.
+
+    Values that are non-numeric, out of range, fractional in an integral column
+    or unknown grades are invalid. Missing values (NaN) are not; the fitted
+    FeaturePreprocessor fills them. Checks are vectorized per column, with a
+    min/max fast path for clean columns.
+
+    on_invalid="drop" removes invalid rows with a warning (pipeline stages);
+    on_invalid="raise" raises SchemaError naming the first bad rows (prediction
+    inputs, where silently dropping rows would misalign the output).
+    """
+    missing = [col for col in FEATURE_COLUMNS if col not in df.columns]
+    if require_target and TARGET_COLUMN not in df.columns:
+        missing.append(TARGET_COLUMN)
+    if missing:
+        raise SchemaError(f"Missing columns: {missing}")
+
+    columns = {}
+    invalid = np.zeros(len(df), dtype=bool)
+
+    for spec in FEATURE_SPECS:
+        values, unparseable = _numeric_values(df[spec.name])
+        invalid |= unparseable | _invalid_values(values, spec)
+        columns[spec.name] = values
+
+    if TARGET_COLUMN in df.columns:
+        target = df[TARGET_COLUMN]
+        if target.dtype.kind in "biuf":
+            values = target.to_numpy()
+            invalid |= ~np.isin(values, np.arange(len(GRADE_LABELS)))
+            columns[TARGET_COLUMN] = values
+        else:
+            labels = target.astype("string").str.strip().str.lower()
+            invalid |= ~labels.isin(GRADE_LABELS).fillna(False).to_numpy()
+            columns[TARGET_COLUMN] = labels.to_numpy(dtype=object, na_value=None)
+
+    keep = None
+    n_invalid = int(invalid.sum())
+    if n_invalid:
+        where = f" in {context}" if context else ""
+        if on_invalid == "raise":
+            first_rows = np.flatnonzero(invalid)[:5].tolist()
+            raise SchemaError(
+                f"{n_invalid} row(s) violate the milk schema{where} (first rows: {first_rows})"
+            )
+        logging.warning(f"Dropping {n_invalid} row(s) that violate the milk schema{where}.")
+        keep = ~invalid
+        columns = {name: values[keep] for name, values in columns.items()}
+
+    # Every remaining value is valid, so each column casts straight to its dtype
+    for spec in FEATURE_SPECS:
+        columns[spec.name] = _compact_values(columns[spec.name], spec)
+    if TARGET_COLUMN in columns:
+        target = columns[TARGET_COLUMN]
+        if target.dtype.kind in "biuf":
+            columns[TARGET_COLUMN] = target.astype(TARGET_ENCODED_SPEC.dtype)
+        else:
+            columns[TARGET_COLUMN] = pd.Categorical(target, categories=GRADE_LABELS)
+
+    return _rebuild(df, columns, keep)
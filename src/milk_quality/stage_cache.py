@@ -0,0 +1,289 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.milk_quality.metrics import registry
+from src.milk_quality.logger import logging
+from src.milk_quality.exception import CustomException
+
+MANIFEST_VERSION = 1
+
+STAGE_SECONDS = registry.histogram(
+    "milk_stage_seconds",
+    "Time per pipeline stage run; status is miss, hit (cached, near zero) or disabled.",
+    ("stage", "status"),
+)
+
+
+class StageCacheConfig:
+    manifest_path = os.path.join("artifacts", "stage_manifest.json")
+    # Set MILK_STAGE_CACHE=0 to always recompute every stage
+    enabled = os.getenv("MILK_STAGE_CACHE", "1") == "1"
+
+
+def hash_dataframe(df: pd.DataFrame) -> str:
+    digest = hashlib.sha256()
+    digest.update(",".join(map(str, df.columns)).encode())
+    digest.update(",".join(map(str, df.dtypes)).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def hash_code(paths: Iterable[str]) -> str:
+    """
+    Hash the source files a stage runs, plus the pandas and numpy versions.
+    """
+    digest = hashlib.sha256()
+    for path in sorted(set(os.path.abspath(p) for p in paths)):
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    digest.update(pd.__version__.encode())
+    digest.update(np.__version__.encode())
+    return digest.hexdigest()
+
+
+@dataclass
+class PendingStage:
+    """
+    A stage looked up by StageCache.begin; hit says whether its outputs are reusable.
+    """
+
+    stage: str
+    hit: bool
+    outputs: List[str]
+    result: Any = None
+    # Cache key parts, recorded by commit; key is None when caching is disabled
+    key: Optional[str] = None
+    input_hashes: Optional[Dict[str, str]] = None
+    params: Optional[dict] = None
+    code_hash: Optional[str] = None
+    started: float = field(default_factory=time.perf_counter)
+
+
+class StageCache:
+    """
+    Content-addressed cache of pipeline stage outputs.
+
+    Each stage is keyed on the SHA-256 of its input files or DataFrames, its
+    parameters and the source of the code it runs. When the key matches the
+    manifest and every recorded output is still on disk, unchanged, the stage is
+    skipped and its recorded result returned. File hashes are memoised on
+    (mtime, size) so unchanged artifacts are not re-read on every run.
+    """
+
+    def __init__(self, config: Optional[StageCacheConfig] = None):
+        self.config = config or StageCacheConfig()
+        self._lock = threading.RLock()
+        self._manifest: Optional[dict] = None
+        self.records: List[dict] = []
+
+    def _load_manifest(self) -> dict:
+        if self._manifest is None:
+            manifest = None
+            if os.path.exists(self.config.manifest_path):
+                try:
+                    with open(self.config.manifest_path) as f:
+                        manifest = json.load(f)
+                except ValueError:
+                    logging.warning("Stage manifest is unreadable; starting a new one.")
+            if not manifest or manifest.get("version") != MANIFEST_VERSION:
+                manifest = {"version": MANIFEST_VERSION, "stages": {}, "file_hashes": {}}
+            self._manifest = manifest
+        return self._manifest
+
+    def _save_manifest(self) -> None:
+        path = self.config.manifest_path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self._manifest, f, indent=4)
+        os.replace(tmp_path, path)
+
+    def hash_file(self, path: str) -> str:
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        with self._lock:
+            memo = self._load_manifest()["file_hashes"].get(key)
+        if memo and memo["mtime_ns"] == stat.st_mtime_ns and memo["size"] == stat.st_size:
+            return memo["sha256"]
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        sha256 = digest.hexdigest()
+        with self._lock:
+            self._load_manifest()["file_hashes"][key] = {
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "sha256": sha256,
+            }
+        return sha256
+
+    def _hash_input(self, value) -> str:
+        if isinstance(value, pd.DataFrame):
+            return hash_dataframe(value)
+        return self.hash_file(value)
+
+    def _outputs_intact(self, recorded: Dict[str, str]) -> bool:
+        for path, sha256 in recorded.items():
+            if not os.path.exists(path) or self.hash_file(path) != sha256:
+                return False
+        return True
+
+    def begin(
+        self,
+        stage: str,
+        inputs: Dict[str, Any],
+        params: dict,
+        code: Iterable[str],
+        outputs: Iterable[str],
+    ) -> PendingStage:
+        """
+        Look a stage up without running it, for callers whose outputs are
+        written by several steps.
+
+        On a hit, pending.result holds the recorded result. Otherwise write the
+        outputs, then call commit(pending, result) to record them.
+        """
+        outputs = list(outputs)
+        if not self.config.enabled:
+            return PendingStage(stage, hit=False, outputs=outputs)
+
+        try:
+            input_hashes = {name: self._hash_input(value) for name, value in inputs.items()}
+            code_hash = hash_code(code)
+            key = hashlib.sha256(
+                json.dumps(
+                    {"inputs": input_hashes, "params": params, "code": code_hash},
+                    sort_keys=True,
+                    default=str,
+                ).encode()
+            ).hexdigest()
+
+            with self._lock:
+                entry = self._load_manifest()["stages"].get(stage)
+            if entry and entry["key"] == key and self._outputs_intact(entry["outputs"]):
+                logging.info(
+                    f"Stage {stage} unchanged (key {key[:12]}); reusing cached outputs "
+                    f"and saving {entry['seconds']:.2f}s."
+                )
+                self._record(stage, "hit", 0.0, entry["seconds"])
+                with self._lock:
+                    self._save_manifest()
+                return PendingStage(stage, hit=True, outputs=outputs, result=entry["result"])
+
+            reason = "no previous run" if entry is None else "inputs, params, code or outputs changed"
+            logging.info(f"Running stage {stage} ({reason}).")
+        except Exception as e:
+            raise CustomException(e, sys)
+
+        return PendingStage(
+            stage,
+            hit=False,
+            outputs=outputs,
+            key=key,
+            input_hashes=input_hashes,
+            params=params,
+            code_hash=code_hash,
+        )
+
+    def commit(self, pending: PendingStage, result: Any) -> None:
+        """
+        Record a stage begun with begin() once its outputs are on disk; a no-op
+        for a hit. The stage's time is measured from begin().
+        """
+        if pending.hit:
+            return
+        seconds = time.perf_counter() - pending.started
+        if pending.key is None:
+            self._record(pending.stage, "disabled", seconds, 0.0)
+            return
+
+        try:
+            with self._lock:
+                self._load_manifest()["stages"][pending.stage] = {
+                    "key": pending.key,
+                    "inputs": pending.input_hashes,
+                    "params": pending.params,
+                    "code": pending.code_hash,
+                    "outputs": {path: self.hash_file(path) for path in pending.outputs},
+                    "result": result,
+                    "seconds": seconds,
+                    "updated_at": datetime.now(timezone.utc).isoformat(),
+                }
+                self._save_manifest()
+        except Exception as e:
+            raise CustomException(e, sys)
+        self._record(pending.stage, "miss", seconds, 0.0)
+
+    def run(
+        self,
+        stage: str,
+        fn: Callable[[], Any],
+        inputs: Dict[str, Any],
+        params: dict,
+        code: Iterable[str],
+        outputs: Iterable[str],
+    ) -> Any:
+        """
+        Return fn()'s result, or the cached result when the stage is unchanged.
+
+        inputs maps names to file paths or DataFrames; params must be JSON
+        serialisable; code lists the source files the stage depends on; outputs
+        are the files fn writes. fn's result must be JSON serialisable too (tuples
+        come back as lists).
+        """
+        pending = self.begin(stage, inputs, params, code, outputs)
+        if pending.hit:
+            return pending.result
+        result = fn()
+        self.commit(pending, result)
+        return result
+
+    def _record(self, stage: str, status: str, seconds: float, saved_seconds: float) -> None:
+        STAGE_SECONDS.labels(stage, status).observe(seconds)
+        with self._lock:
+            self.records.append(
+                {"stage": stage, "status": status, "seconds": seconds, "saved_seconds": saved_seconds}
+            )
+
+    def summary(self) -> dict:
+        """
+        Cache hits, misses and time saved for the stages run in this process.
+        """
+        with self._lock:
+            records = list(self.records)
+        return {
+            "stages": records,
+            "hits": sum(r["status"] == "hit" for r in records),
+            "misses": sum(r["status"] == "miss" for r in records),
+            "seconds": sum(r["seconds"] for r in records),
+            "saved_seconds": sum(r["saved_seconds"] for r in records),
+        }
+
+    def log_summary(self) -> dict:
+        summary = self.summary()
+        for record in summary["stages"]:
+            logging.info(
+                f"Stage {record['stage']}: {record['status']} "
+                f"({record['seconds']:.2f}s run, {record['saved_seconds']:.2f}s saved)"
+            )
+        logging.info(
+            f"Stage cache: {summary['hits']} hit(s), {summary['misses']} miss(es), "
+            f"{summary['saved_seconds']:.2f}s saved."
+        )
+        return summary
+
+
+# Process-wide cache shared by every pipeline stage
+stage_cache = StageCache()
@@ -2,17 +2,60 @@ import os
 import sys
 import dill
 import json
+import time
+import threading
 import pandas as pd
-import pymongo
-from pymongo import MongoClient
-from dotenv import load_dotenv
-from sklearn.metrics import r2_score, mean_absolute_error, mean_squared_error
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Iterator, Optional, Tuple
 
+from src.milk_quality.metrics import registry
 from src.milk_quality.logger import logging
 from src.milk_quality.exception import CustomException
 
-# Load environment variables from .env
-load_dotenv()
+# pymongo, dotenv and sklearn.metrics are imported where they are used, so the
+# serving path (which never touches MongoDB) does not pay for them at startup
+if TYPE_CHECKING:
+    from pymongo import MongoClient
+
+_environment_loaded = False
+
+ARTIFACT_LOAD_SECONDS = registry.histogram(
+    "milk_artifact_load_seconds", "Time to deserialize an artifact from disk.", ("format",)
+)
+MONGO_OPERATION_SECONDS = registry.histogram(
+    "milk_mongo_operation_seconds",
+    "Time per MongoDB batch read (cursor fetch and DataFrame build) or insert attempt.",
+    ("operation",),
+)
+MONGO_DOCUMENTS = registry.counter(
+    "milk_mongo_documents_total", "Documents read from or written to MongoDB.", ("operation",)
+)
+MONGO_INSERT_RETRIES = registry.counter(
+    "milk_mongo_insert_retries_total", "Batch inserts retried after a transient error."
+)
+
+# Server write errors worth retrying: failovers, shutdowns, network trouble and
+# timeouts. Anything else (document validation, document too large, ...) fails
+# the same way every time.
+TRANSIENT_WRITE_ERROR_CODES = frozenset(
+    {6, 7, 50, 89, 91, 112, 189, 262, 9001, 10107, 11600, 11602, 13435, 13436}
+)
+DUPLICATE_KEY_ERROR_CODE = 11000
+
+
+def load_environment() -> None:
+    """
+    Load environment variables from .env, once per process.
+
+    Entry points call this before importing modules whose config classes read
+    MILK_* settings; the MongoDB helpers call it before reading MONGO_*.
+    """
+    global _environment_loaded
+    if not _environment_loaded:
+        from dotenv import load_dotenv
+
+        load_dotenv()
+        _environment_loaded = True
 
 
 def save_object(file_path: str, obj) -> None:
@@ -34,8 +77,9 @@ def load_object(file_path: str):
     Load any Python object saved with dill.
     """
     try:
-        with open(file_path, "rb") as file_obj:
-            return dill.load(file_obj)
+        with ARTIFACT_LOAD_SECONDS.labels("dill").time():
+            with open(file_path, "rb") as file_obj:
+                return dill.load(file_obj)
     except Exception as e:
         logging.error("Failed to load object.", exc_info=True)
         raise CustomException(e, sys)
@@ -71,6 +115,8 @@ def evaluate_model(X_train, y_train, X_test, y_test, model: object) -> dict:
     """
     Train model and return evaluation metrics.
     """
+    from sklearn.metrics import r2_score, mean_absolute_error, mean_squared_error
+
     try:
         model.fit(X_train, y_train)
         y_pred_train = model.predict(X_train)
@@ -104,27 +150,136 @@ def save_json(path: str, data: dict) -> None:
         raise CustomException(e, sys)
 
 
-def get_collection_as_dataframe() -> pd.DataFrame:
+def load_json(path: str) -> dict:
     """
-    Load data from MongoDB collection using .env config.
+    Load a JSON file into a dictionary.
     """
     try:
-        mongo_uri = os.getenv("MONGO_URI")
-        database_name = os.getenv("MONGO_DB")
-        collection_name = os.getenv("MONGO_COLLECTION")
+        with open(path) as f:
+            return json.load(f)
+    except Exception as e:
+        logging.error("Failed to load JSON file.", exc_info=True)
+        raise CustomException(e, sys)
 
-        logging.info("Starting to load data from MongoDB.")
-        logging.info(f"Connecting to MongoDB at URI: {mongo_uri}")
-        client = MongoClient(mongo_uri)
-        collection = client[database_name][collection_name]
 
-        logging.info(f"Fetching documents from {database_name}.{collection_name}")
-        data = list(collection.find())
-        df = pd.DataFrame(data)
+# Process-wide MongoClient; it maintains its own connection pool
+_mongo_client: Optional["MongoClient"] = None
+_mongo_client_lock = threading.Lock()
 
-        if "_id" in df.columns:
-            df.drop(columns=["_id"], inplace=True)
-            logging.info("Dropped '_id' column from DataFrame.")
+
+def get_mongo_client() -> "MongoClient":
+    """
+    Return the shared, pooled MongoClient, creating it on first use.
+
+    Pool size and timeouts come from MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE,
+    MONGO_SERVER_SELECTION_TIMEOUT_MS, MONGO_CONNECT_TIMEOUT_MS and
+    MONGO_SOCKET_TIMEOUT_MS.
+    """
+    global _mongo_client
+    if _mongo_client is None:
+        with _mongo_client_lock:
+            if _mongo_client is None:
+                from pymongo import MongoClient
+
+                load_environment()
+                mongo_uri = os.getenv("MONGO_URI")
+                logging.info(f"Connecting to MongoDB at URI: {mongo_uri}")
+                _mongo_client = MongoClient(
+                    mongo_uri,
+                    maxPoolSize=int(os.getenv("MONGO_MAX_POOL_SIZE", "50")),
+                    minPoolSize=int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+                    serverSelectionTimeoutMS=int(
+                        os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "30000")
+                    ),
+                    connectTimeoutMS=int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "20000")),
+                    socketTimeoutMS=int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", "0")) or None,
+                )
+    return _mongo_client
+
+
+def close_mongo_client() -> None:
+    """
+    Close the shared MongoClient (e.g. at process shutdown).
+    """
+    global _mongo_client
+    with _mongo_client_lock:
+        if _mongo_client is not None:
+            _mongo_client.close()
+            _mongo_client = None
+
+
+def get_mongo_collection():
+    """
+    Return the MongoDB collection configured in .env.
+    """
+    load_environment()
+    database_name = os.getenv("MONGO_DB")
+    collection_name = os.getenv("MONGO_COLLECTION")
+    return get_mongo_client()[database_name][collection_name]
+
+
+def iter_collection_batches(
+    collection=None,
+    batch_size: int = 10_000,
+    query: Optional[dict] = None,
+    projection: Optional[dict] = None,
+    sort: Optional[list] = None,
+    exclude_id: bool = True,
+) -> Iterator[pd.DataFrame]:
+    """
+    Stream a MongoDB collection as DataFrame chunks of up to batch_size rows.
+
+    The cursor fetches batch_size documents per round trip and '_id' is excluded
+    on the server (unless exclude_id is False), so only one chunk of documents
+    is held as Python dicts at a time.
+    """
+    try:
+        if collection is None:
+            collection = get_mongo_collection()
+        if projection is None and exclude_id:
+            projection = {"_id": 0}
+
+        logging.info(
+            f"Streaming documents from {collection.full_name} (batch_size={batch_size})"
+        )
+        cursor = collection.find(query or {}, projection, batch_size=batch_size)
+        if sort:
+            cursor = cursor.sort(sort)
+
+        read_seconds = MONGO_OPERATION_SECONDS.labels("read_batch")
+        documents_read = MONGO_DOCUMENTS.labels("read")
+
+        batch = []
+        # Timed from the first fetch to the built DataFrame, not while the caller works
+        batch_start = time.perf_counter()
+        for document in cursor:
+            batch.append(document)
+            if len(batch) >= batch_size:
+                df = pd.DataFrame.from_records(batch)
+                read_seconds.observe(time.perf_counter() - batch_start)
+                documents_read.inc(len(batch))
+                yield df
+                batch = []
+                batch_start = time.perf_counter()
+        if batch:
+            df = pd.DataFrame.from_records(batch)
+            read_seconds.observe(time.perf_counter() - batch_start)
+            documents_read.inc(len(batch))
+            yield df
+
+    except Exception as e:
+        logging.error("Failed to stream data from MongoDB.", exc_info=True)
+        raise CustomException(e, sys)
+
+
+def get_collection_as_dataframe(collection=None, batch_size: int = 10_000) -> pd.DataFrame:
+    """
+    Load data from MongoDB collection using .env config.
+    """
+    try:
+        logging.info("Starting to load data from MongoDB.")
+        chunks = list(iter_collection_batches(collection, batch_size=batch_size))
+        df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
 
         logging.info(f"Successfully loaded data. DataFrame shape: {df.shape}")
         return df
@@ -134,29 +289,136 @@ def get_collection_as_dataframe() -> pd.DataFrame:
         raise CustomException(e, sys)
 
 
-def upload_dataframe_to_mongodb(df: pd.DataFrame) -> None:
+def _insert_batch_with_retry(collection, records: list, max_retries: int) -> Tuple[int, int, int]:
+    """
+    Unordered insert of one batch; returns (documents written, already present, retries used).
+
+    Only connection errors, write concern errors and transient server write
+    errors are retried; any other write error is raised. insert_many stamps an
+    _id on each record, so a retry re-sends the same _ids: a duplicate-key error
+    (code 11000) on a retry means the document landed on an earlier attempt and
+    is counted as already present. On the first attempt it is a real duplicate
+    in the data and is raised.
+    """
+    from pymongo.errors import AutoReconnect, BulkWriteError
+
+    insert_seconds = MONGO_OPERATION_SECONDS.labels("insert_batch")
+    documents_written = MONGO_DOCUMENTS.labels("write")
+
+    written = already_present = 0
+    for attempt in range(max_retries + 1):
+        try:
+            with insert_seconds.time():
+                result = collection.insert_many(records, ordered=False)
+            documents_written.inc(len(result.inserted_ids))
+            return written + len(result.inserted_ids), already_present, attempt
+        except BulkWriteError as e:
+            details = e.details
+            errors = details.get("writeErrors", [])
+            n_inserted = details.get("nInserted", 0)
+            documents_written.inc(n_inserted)
+            duplicates = [err for err in errors if err.get("code") == DUPLICATE_KEY_ERROR_CODE]
+            transient = [err for err in errors if err.get("code") in TRANSIENT_WRITE_ERROR_CODES]
+            if len(duplicates) + len(transient) < len(errors) or (duplicates and attempt == 0):
+                raise
+            already_present += len(duplicates)
+            if details.get("writeConcernErrors"):
+                # Inserted but not acknowledged: send the whole batch again, and
+                # what did land comes back as already present
+                retry = range(len(records))
+            else:
+                written += n_inserted
+                retry = sorted(err["index"] for err in transient)
+                if not retry:
+                    return written, already_present, attempt
+            records = [records[i] for i in retry if i not in {err["index"] for err in duplicates}]
+            error = e
+        except AutoReconnect as e:
+            # Includes NetworkTimeout
+            error = e
+
+        if attempt < max_retries:
+            MONGO_INSERT_RETRIES.inc()
+            delay = 0.5 * 2 ** attempt
+            logging.warning(f"Batch insert failed ({error}); retrying in {delay:.1f}s.")
+            time.sleep(delay)
+    raise error
+
+
+def upload_dataframe_to_mongodb(
+    df: pd.DataFrame,
+    collection=None,
+    batch_size: int = 5_000,
+    max_workers: int = 1,
+    max_retries: int = 3,
+) -> dict:
     """
     Upload a pandas DataFrame to MongoDB collection using .env config.
+
+    Rows are converted to dicts one batch at a time and written with unordered
+    insert_many calls, optionally from several writer threads sharing the pooled
+    client. At most 2 * max_workers batches are in memory at once. Returns a
+    throughput report.
     """
     try:
-        mongo_uri = os.getenv("MONGO_URI")
-        database_name = os.getenv("MONGO_DB")
-        collection_name = os.getenv("MONGO_COLLECTION")
-
-        logging.info("Starting to upload data to MongoDB.")
-        logging.info(f"Connecting to MongoDB at URI: {mongo_uri}")
-        client = MongoClient(mongo_uri)
-        collection = client[database_name][collection_name]
-
-        data = df.to_dict(orient="records")
-
-        if data:
-            collection.insert_many(data)
-            logging.info(
-                f"Successfully inserted {len(data)} records into {database_name}.{collection_name}"
-            )
-        else:
+        if collection is None:
+            collection = get_mongo_collection()
+
+        logging.info(f"Starting to upload data to MongoDB collection {collection.full_name}.")
+        if df.empty:
             logging.warning("Provided DataFrame is empty. No data inserted.")
+            return {
+                "documents": 0,
+                "already_present": 0,
+                "batches": 0,
+                "retries": 0,
+                "seconds": 0.0,
+                "docs_per_second": 0.0,
+            }
+
+        start = time.perf_counter()
+        documents = already_present = retries = batches = 0
+
+        def batch_records():
+            for offset in range(0, len(df), batch_size):
+                yield df.iloc[offset:offset + batch_size].to_dict(orient="records")
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = set()
+            for records in batch_records():
+                if len(pending) >= 2 * max_workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        written, present, used = future.result()
+                        documents += written
+                        already_present += present
+                        retries += used
+                pending.add(
+                    executor.submit(_insert_batch_with_retry, collection, records, max_retries)
+                )
+                batches += 1
+            for future in wait(pending).done:
+                written, present, used = future.result()
+                documents += written
+                already_present += present
+                retries += used
+
+        elapsed = time.perf_counter() - start
+        report = {
+            "documents": documents,
+            # Landed on an attempt that reported an error; found again on a retry
+            "already_present": already_present,
+            "batches": batches,
+            "retries": retries,
+            "seconds": elapsed,
+            "docs_per_second": documents / elapsed if elapsed > 0 else 0.0,
+        }
+        logging.info(
+            f"Successfully inserted {documents} records into {collection.full_name} "
+            f"in {batches} batches, {elapsed:.2f}s ({report['docs_per_second']:.0f} docs/sec, "
+            f"{retries} retries, {already_present} already present)"
+        )
+        return report
 
     except Exception as e:
         logging.error("Failed to upload data to MongoDB.", exc_info=True)
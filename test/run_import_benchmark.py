@@ -0,0 +1,114 @@
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Serving entry points and the modules they must not import before the first request
+ENTRY_POINTS = ["main", "app", "src.milk_quality.pipelines.prediction"]
+FORBIDDEN_MODULES = ["pymongo", "sklearn", "scipy", "joblib"]
+
+# Imports the entry point under -X importtime and prints which forbidden modules it pulled in
+PROBE = """
+import sys, json
+__import__(sys.argv[1])
+print(json.dumps(sorted(m for m in sys.argv[2:] if m in sys.modules)))
+"""
+
+
+def parse_importtime(stderr: str) -> dict:
+    """
+    Cumulative microseconds per module from `python -X importtime` output.
+    """
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        cumulative[name.strip()] = int(cumulative_us)
+    return cumulative
+
+
+def measure(module: str, repeats: int) -> dict:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT, os.environ.get("PYTHONPATH", "")]))
+    runs = []
+    for _ in range(repeats):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", PROBE, module, *FORBIDDEN_MODULES],
+            cwd=ROOT,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"Importing {module} failed:\n{proc.stderr[-2000:]}")
+        runs.append((parse_importtime(proc.stderr), json.loads(proc.stdout.strip().splitlines()[-1])))
+
+    totals = [timings[module] / 1000 for timings, _ in runs]
+    timings, forbidden = runs[-1]
+    # Direct and indirect imports that cost the most, excluding the entry point itself
+    slowest = sorted(
+        ((name, us / 1000) for name, us in timings.items() if name != module and "." not in name),
+        key=lambda item: item[1],
+        reverse=True,
+    )[:10]
+    return {
+        "median_ms": statistics.median(totals),
+        "min_ms": min(totals),
+        "max_ms": max(totals),
+        "modules_imported": len(timings),
+        "forbidden_imported": forbidden,
+        "slowest_top_level_ms": dict(slowest),
+    }
+
+
+def log_file_count() -> int:
+    log_dir = os.path.join(ROOT, "logs")
+    return len(os.listdir(log_dir)) if os.path.isdir(log_dir) else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Guard the import time of the serving entry points.")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--baseline", help="Earlier report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown over the baseline")
+    parser.add_argument("--output", default=os.path.join(ROOT, "artifacts", "import_benchmark.json"))
+    args = parser.parse_args()
+
+    logs_before = log_file_count()
+    report = {module: measure(module, args.repeats) for module in ENTRY_POINTS}
+    logs_created = log_file_count() - logs_before
+
+    failures = []
+    if logs_created:
+        failures.append(f"importing created {logs_created} log files")
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    print(f"{'entry point':<40} {'median ms':>10} {'min ms':>8} {'modules':>8}  forbidden")
+    for module, row in report.items():
+        print(
+            f"{module:<40} {row['median_ms']:>10.1f} {row['min_ms']:>8.1f} "
+            f"{row['modules_imported']:>8}  {', '.join(row['forbidden_imported']) or '-'}"
+        )
+        print("    slowest: " + ", ".join(f"{name} {ms:.0f}ms" for name, ms in row["slowest_top_level_ms"].items()))
+        if row["forbidden_imported"]:
+            failures.append(f"{module} imports {', '.join(row['forbidden_imported'])}")
+        if baseline and module in baseline:
+            budget = baseline[module]["median_ms"] * (1 + args.tolerance)
+            if row["median_ms"] > budget:
+                failures.append(f"{module} takes {row['median_ms']:.1f}ms, budget {budget:.1f}ms")
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=4)
+    print(f"Report saved at: {args.output}")
+
+    if failures:
+        print("Import regressions:\n  " + "\n  ".join(failures))
+        sys.exit(1)
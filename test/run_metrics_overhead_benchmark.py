@@ -0,0 +1,132 @@
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEED_PATH = os.path.join(ROOT, "artifacts", "milknew_test.csv")
+
+
+def ns_per_op(fn, iterations: int) -> float:
+    start = time.perf_counter_ns()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter_ns() - start) / iterations
+
+
+def primitive_costs(iterations: int) -> dict:
+    """
+    Nanoseconds per counter increment, histogram observation and timed block,
+    with metrics enabled and disabled.
+    """
+    from src.milk_quality.metrics import MetricsRegistry, set_enabled
+
+    metrics = MetricsRegistry()
+    counter = metrics.counter("bench_total", "Benchmark counter.", ("kind",)).labels("a")
+    histogram = metrics.histogram("bench_seconds", "Benchmark histogram.", ("kind",)).labels("a")
+
+    def timed():
+        with histogram.time():
+            pass
+
+    ops = {
+        "counter_inc": counter.inc,
+        "histogram_observe": lambda: histogram.observe(0.003),
+        "histogram_time": timed,
+    }
+    costs = {}
+    for enabled in (True, False):
+        set_enabled(enabled)
+        for name, op in ops.items():
+            costs[f"{name}/{'enabled' if enabled else 'disabled'}"] = ns_per_op(op, iterations)
+    set_enabled(True)
+    return costs
+
+
+def predict_costs(rows, repeats: int) -> dict:
+    """
+    Median seconds of an in-process single-row prediction with metrics enabled
+    and disabled, interleaved so drift affects both alike.
+    """
+    from src.milk_quality.metrics import registry, set_enabled
+    from src.milk_quality.pipelines.prediction import PredictionPipeline
+
+    pipeline = PredictionPipeline(
+        model_path="artifacts/model.pkl", encoder_path="artifacts/label_encoder.pkl"
+    )
+    pipeline.warm_up()
+    samples = {True: [], False: []}
+    for i in range(repeats):
+        row = rows.iloc[[i % len(rows)]]
+        for enabled in (True, False):
+            set_enabled(enabled)
+            start = time.perf_counter()
+            pipeline.predict_dataframe(row)
+            samples[enabled].append(time.perf_counter() - start)
+    set_enabled(True)
+
+    # Recording calls one prediction makes, counted from the registry itself
+    registry.snapshot(reset=True)
+    pipeline.predict_dataframe(rows.iloc[[0]])
+    recordings = 0
+    for data in registry.snapshot().values():
+        for value in data["series"].values():
+            # Histograms count their observations; a counter series counts once if touched
+            recordings += value[2] if data["kind"] == "histogram" else int(bool(value))
+    return {
+        "enabled_seconds": statistics.median(samples[True]),
+        "disabled_seconds": statistics.median(samples[False]),
+        "recordings_per_call": recordings,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cost of the metrics instrumentation on the predict path.")
+    parser.add_argument("--iterations", type=int, default=200_000, help="Calls per primitive")
+    parser.add_argument("--repeats", type=int, default=300, help="Predictions per setting")
+    parser.add_argument("--budget", type=float, default=0.02, help="Allowed overhead per prediction")
+    parser.add_argument("--output", default=os.path.join(ROOT, "artifacts", "metrics_overhead_benchmark.json"))
+    args = parser.parse_args()
+
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    import pandas as pd
+    from src.milk_quality.schema import FEATURE_COLUMNS, enforce_schema
+
+    costs = primitive_costs(args.iterations)
+    for name, ns in costs.items():
+        print(f"{name:<28} {ns:8.0f} ns/op")
+
+    rows = enforce_schema(pd.read_csv(SEED_PATH)[FEATURE_COLUMNS], on_invalid="drop").reset_index(drop=True)
+    predict = predict_costs(rows, args.repeats)
+    # Wall-clock A/B differences of a few microseconds are noise at this scale, so
+    # the budget is checked on recordings per call times their measured cost
+    per_recording = max(costs["histogram_time/enabled"], costs["counter_inc/enabled"]) / 1e9
+    estimated = predict["recordings_per_call"] * per_recording / predict["disabled_seconds"]
+    measured = predict["enabled_seconds"] / predict["disabled_seconds"] - 1
+    print(
+        f"single-row predict: {predict['enabled_seconds'] * 1000:.3f}ms enabled, "
+        f"{predict['disabled_seconds'] * 1000:.3f}ms disabled, "
+        f"{predict['recordings_per_call']} recordings per call"
+    )
+    print(f"estimated overhead {estimated:.3%}, measured {measured:+.3%} (budget {args.budget:.1%})")
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "primitives_ns": costs,
+        "predict": predict,
+        "estimated_overhead": estimated,
+        "measured_overhead": measured,
+        "budget": args.budget,
+    }
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=4)
+    print(f"Report saved at: {args.output}")
+
+    if estimated > args.budget:
+        print(f"Metrics overhead {estimated:.3%} exceeds the {args.budget:.1%} budget")
+        sys.exit(1)
@@ -0,0 +1,116 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+from src.milk_quality.components.data_transformation import DataTransformationConfig
+from src.milk_quality.components.model_trainer import ModelTrainerConfig
+from src.milk_quality.dataset_io import read_dataset
+from src.milk_quality.model_store import export_model
+from src.milk_quality.utils import load_object, save_json
+
+# Runs in a fresh interpreter per worker: import, load, score one row, report, then
+# stay alive until the parent has sampled every worker's memory.
+WORKER = r"""
+import sys, time, json
+start = time.perf_counter()
+import pandas as pd
+from src.milk_quality.model_store import load_artifact
+imported = time.perf_counter()
+model = load_artifact(sys.argv[1])
+loaded = time.perf_counter()
+model.predict(pd.read_csv(sys.argv[2]).drop(columns="Grade", errors="ignore").iloc[:1])
+predicted = time.perf_counter()
+print(json.dumps({
+    "import_seconds": imported - start,
+    "load_seconds": loaded - imported,
+    "first_predict_seconds": predicted - loaded,
+    "cold_start_seconds": predicted - start,
+}), flush=True)
+sys.stdin.read()
+"""
+
+
+def memory_kb(pid: int) -> dict:
+    """
+    RSS split into private (anonymous) and file-backed pages, plus PSS, which
+    charges shared pages to each process in proportion.
+    """
+    fields = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "RssAnon", "RssFile"):
+                fields[key] = int(value.split()[0])
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key == "Pss":
+                fields["Pss"] = int(value.split()[0])
+    return fields
+
+
+def run_workers(model_path: str, sample_path: str, workers: int) -> dict:
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+    procs = [
+        subprocess.Popen(
+            [sys.executable, "-c", WORKER, model_path, sample_path],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            env=env,
+        )
+        for _ in range(workers)
+    ]
+    timings = [json.loads(proc.stdout.readline()) for proc in procs]
+    # Every worker is now loaded and alive, so shared pages show up in PSS
+    memory = [memory_kb(proc.pid) for proc in procs]
+    for proc in procs:
+        proc.stdin.close()
+        proc.wait()
+
+    def mean(rows, key):
+        return sum(row[key] for row in rows) / len(rows)
+
+    return {
+        "model_path": model_path,
+        "size_mb": os.path.getsize(model_path) / 1e6,
+        "workers": workers,
+        "import_seconds": mean(timings, "import_seconds"),
+        "load_seconds": mean(timings, "load_seconds"),
+        "first_predict_seconds": mean(timings, "first_predict_seconds"),
+        "cold_start_seconds": mean(timings, "cold_start_seconds"),
+        "rss_mb": mean(memory, "VmRSS") / 1024,
+        "rss_anon_mb": mean(memory, "RssAnon") / 1024,
+        "rss_file_mb": mean(memory, "RssFile") / 1024,
+        "pss_mb": mean(memory, "Pss") / 1024,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare dill and memory-mapped model artifacts.")
+    parser.add_argument("--pickle-path", default=ModelTrainerConfig.model_path)
+    parser.add_argument("--artifact-path", default=ModelTrainerConfig.model_artifact_path)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--output", default=os.path.join("artifacts", "model_format_benchmark.json"))
+    args = parser.parse_args()
+
+    sample_path = DataTransformationConfig.test_csv_path
+    if not os.path.exists(args.artifact_path):
+        test_df = read_dataset(sample_path)
+        export_model(load_object(args.pickle_path), args.artifact_path, test_df.drop(columns="Grade"))
+
+    report = {
+        "dill": run_workers(args.pickle_path, sample_path, args.workers),
+        "joblib_mmap": run_workers(args.artifact_path, sample_path, args.workers),
+    }
+    save_json(args.output, report)
+
+    print(f"{'format':<12} {'size MB':>8} {'load s':>8} {'cold start s':>13} {'RSS MB':>8} {'private MB':>11} {'PSS MB':>8}")
+    for name, row in report.items():
+        print(
+            f"{name:<12} {row['size_mb']:>8.2f} {row['load_seconds']:>8.3f} "
+            f"{row['cold_start_seconds']:>13.3f} {row['rss_mb']:>8.1f} "
+            f"{row['rss_anon_mb']:>11.1f} {row['pss_mb']:>8.1f}"
+        )
+    print(f"Report saved at: {args.output}")
@@ -0,0 +1,66 @@
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.milk_quality.components.data_transformation import DataTransformationConfig
+from src.milk_quality.components.preprocessor import FeaturePreprocessor
+from src.milk_quality.dataset_io import read_dataset
+from src.milk_quality.pipelines.prediction import PredictionPipeline
+from src.milk_quality.schema import FEATURE_COLUMNS
+from src.milk_quality.utils import save_object
+
+BATCH_SIZES = [1, 64, 1_000, 100_000]
+REPEATS = 20
+
+
+def best_seconds(fn, repeats=REPEATS):
+    fn()  # warm-up
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def make_batch(features: pd.DataFrame, rows: int, missing_rate: float) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    batch = features.sample(rows, replace=True, random_state=0).reset_index(drop=True)
+    if missing_rate:
+        batch = batch.astype("float64")
+        batch = batch.mask(rng.random(batch.shape) < missing_rate)
+    return batch
+
+
+if __name__ == "__main__":
+    os.chdir(ROOT)
+    features = read_dataset(DataTransformationConfig.train_csv_path)[FEATURE_COLUMNS]
+    preprocessor = FeaturePreprocessor().fit(features)
+    # prepare_features loads the preprocessor from disk, so time the one fitted here
+    preprocessor_path = os.path.join(tempfile.mkdtemp(prefix="milk_preprocessor_"), "feature_preprocessor.pkl")
+    save_object(preprocessor_path, preprocessor)
+    pipeline = PredictionPipeline(
+        model_path="artifacts/model.pkl",
+        encoder_path="artifacts/label_encoder.pkl",
+        preprocessor_path=preprocessor_path,
+    )
+    model, _ = pipeline.load_artifacts()
+
+    print(f"{'rows':>8} {'missing':>8} {'transform us/row':>17} {'prepare us/row':>15} {'predict us/row':>15}")
+    for rows in BATCH_SIZES:
+        for missing_rate in (0.0, 0.05):
+            batch = make_batch(features, rows, missing_rate)
+            transform = best_seconds(lambda: preprocessor.transform(batch))
+            prepare = best_seconds(lambda: pipeline.prepare_features(batch))
+            prepared = pipeline.prepare_features(batch)
+            predict = best_seconds(lambda: model.predict(prepared), repeats=5)
+            print(
+                f"{rows:>8} {missing_rate:>8.0%} {transform / rows * 1e6:>17.3f} "
+                f"{prepare / rows * 1e6:>15.3f} {predict / rows * 1e6:>15.3f}"
+            )
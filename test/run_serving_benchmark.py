@@ -0,0 +1,280 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEED_PATHS = [
+    os.path.join(ROOT, "artifacts", "milknew_test.csv"),
+    os.path.join(ROOT, "artifacts", "smart_synthetic_milk_data.csv"),
+]
+WORKLOADS = ["single_row", "small_batch", "large_csv"]
+APPS = ["fastapi", "flask"]
+
+
+class RssSampler:
+    """
+    Peak resident set size of this process while a scenario runs, sampled from
+    /proc/self/status (ru_maxrss, the lifetime peak, where /proc is missing).
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.peak_kb = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def current_kb() -> int:
+        try:
+            with open("/proc/self/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1])
+        except OSError:
+            pass
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_kb = max(self.peak_kb, self.current_kb())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak_kb = self.current_kb()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_kb = max(self.peak_kb, self.current_kb())
+
+
+def load_seed_rows() -> pd.DataFrame:
+    from src.milk_quality.schema import FEATURE_COLUMNS, enforce_schema
+
+    seeds = pd.concat([pd.read_csv(path) for path in SEED_PATHS], ignore_index=True)
+    # Only rows the serving path accepts, so every request measures a prediction
+    return enforce_schema(seeds[FEATURE_COLUMNS], on_invalid="drop").reset_index(drop=True)
+
+
+def build_payloads(seeds: pd.DataFrame, small_batch_rows: int, large_rows: int) -> dict:
+    records = json.loads(seeds.to_json(orient="records"))
+    repeats = -(-large_rows // len(seeds))
+    large = pd.concat([seeds] * repeats, ignore_index=True).iloc[:large_rows]
+    return {
+        "single_row": {"records": [[record] for record in records], "rows": 1},
+        "small_batch": {
+            "records": [
+                [records[(start + i) % len(records)] for i in range(small_batch_rows)]
+                for start in range(0, len(records), small_batch_rows)
+            ],
+            "rows": small_batch_rows,
+        },
+        "large_csv": {"csv": large.to_csv(index=False).encode(), "rows": len(large)},
+    }
+
+
+class FastAPIDriver:
+    def __init__(self):
+        from fastapi.testclient import TestClient
+        import main
+
+        # Entering the client runs the startup hooks, which warm the model up
+        self.client = TestClient(main.app).__enter__()
+
+    def predict_json(self, records: list) -> int:
+        return self.client.post("/api/predict", json=records).status_code
+
+    def predict_csv(self, data: bytes) -> int:
+        files = {"file": ("batch.csv", data, "text/csv")}
+        return self.client.post("/predict", files=files, follow_redirects=False).status_code
+
+    def close(self):
+        self.client.__exit__(None, None, None)
+
+
+class FlaskDriver:
+    def __init__(self):
+        import app
+
+        app.pipeline.warm_up()
+        self.app = app.app
+        # Flask test clients keep per-client state, so each thread gets its own
+        self._local = threading.local()
+
+    @property
+    def client(self):
+        if not hasattr(self._local, "client"):
+            self._local.client = self.app.test_client()
+        return self._local.client
+
+    def predict_json(self, records: list) -> int:
+        return self.client.post("/api/predict", json=records).status_code
+
+    def predict_csv(self, data: bytes) -> int:
+        import io
+
+        upload = {"file": (io.BytesIO(data), "batch.csv", "text/csv")}
+        return self.client.post("/predict", data=upload, content_type="multipart/form-data").status_code
+
+    def close(self):
+        pass
+
+
+def run_scenario(driver, workload: str, payload: dict, concurrency: int, requests: int, warmup: int) -> dict:
+    if workload == "large_csv":
+        calls = [lambda: driver.predict_csv(payload["csv"])] * requests
+        expected = {302, 303}
+    else:
+        bodies = payload["records"]
+        calls = [lambda body=bodies[i % len(bodies)]: driver.predict_json(body) for i in range(requests)]
+        expected = {200}
+
+    for call in calls[:warmup]:
+        call()
+
+    def timed(call):
+        start = time.perf_counter()
+        status = call()
+        return time.perf_counter() - start, status
+
+    with RssSampler() as rss:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            outcomes = list(executor.map(timed, calls))
+        wall = time.perf_counter() - started
+
+    latencies = np.array([seconds for seconds, _ in outcomes]) * 1000
+    errors = sum(status not in expected for _, status in outcomes)
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "rows_per_request": payload["rows"],
+        "errors": errors,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "mean_ms": float(latencies.mean()),
+        "throughput_rps": requests / wall,
+        "throughput_rows_per_second": requests * payload["rows"] / wall,
+        "peak_rss_mb": rss.peak_kb / 1024,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        return ""
+
+
+def compare(results: dict, baseline: dict, budget: dict) -> list:
+    """
+    Regressions of results against a baseline report, per the budget.
+    """
+    failures = []
+    for key, row in results.items():
+        before = baseline.get("results", {}).get(key)
+        if before is None:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            limit = before[metric] * (1 + budget["latency"])
+            if row[metric] > limit:
+                failures.append(f"{key}: {metric} {row[metric]:.1f} > {limit:.1f}")
+        floor = before["throughput_rps"] * (1 - budget["throughput"])
+        if row["throughput_rps"] < floor:
+            failures.append(f"{key}: throughput {row['throughput_rps']:.1f} rps < {floor:.1f}")
+        ceiling = before["peak_rss_mb"] * (1 + budget["rss"])
+        if row["peak_rss_mb"] > ceiling:
+            failures.append(f"{key}: peak RSS {row['peak_rss_mb']:.1f} MB > {ceiling:.1f}")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency, throughput and memory of the serving path.")
+    parser.add_argument("--apps", nargs="+", choices=APPS, default=APPS)
+    parser.add_argument("--workloads", nargs="+", choices=WORKLOADS, default=WORKLOADS)
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per JSON scenario")
+    parser.add_argument("--large-requests", type=int, default=5, help="Requests per large CSV scenario")
+    parser.add_argument("--small-batch-rows", type=int, default=32)
+    parser.add_argument("--large-rows", type=int, default=100_000)
+    parser.add_argument("--warmup", type=int, default=5, help="Untimed requests before each scenario")
+    parser.add_argument("--baseline", help="Earlier report to compare against")
+    parser.add_argument("--latency-budget", type=float, default=0.25, help="Allowed p50/p95/p99 increase")
+    parser.add_argument("--throughput-budget", type=float, default=0.2, help="Allowed throughput drop")
+    parser.add_argument("--rss-budget", type=float, default=0.2, help="Allowed peak RSS increase")
+    parser.add_argument("--output", default=os.path.join(ROOT, "artifacts", "serving_benchmark.json"))
+    args = parser.parse_args()
+
+    # Uploaded results go to a scratch directory instead of artifacts/results
+    os.environ.setdefault("MILK_RESULT_SPILL_DIR", tempfile.mkdtemp(prefix="milk_bench_results_"))
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+
+    payloads = build_payloads(load_seed_rows(), args.small_batch_rows, args.large_rows)
+    drivers = {"fastapi": FastAPIDriver, "flask": FlaskDriver}
+
+    results = {}
+    for app_name in args.apps:
+        driver = drivers[app_name]()
+        try:
+            for workload in args.workloads:
+                requests = args.large_requests if workload == "large_csv" else args.requests
+                warmup = min(args.warmup, 1) if workload == "large_csv" else args.warmup
+                for concurrency in args.concurrency:
+                    key = f"{app_name}/{workload}/c{concurrency}"
+                    results[key] = run_scenario(
+                        driver, workload, payloads[workload], concurrency, requests, warmup
+                    )
+                    row = results[key]
+                    print(
+                        f"{key:<28} p50 {row['p50_ms']:8.2f}ms  p95 {row['p95_ms']:8.2f}ms  "
+                        f"p99 {row['p99_ms']:8.2f}ms  {row['throughput_rps']:8.1f} req/s  "
+                        f"{row['throughput_rows_per_second']:10.0f} rows/s  "
+                        f"RSS {row['peak_rss_mb']:7.1f}MB  errors {row['errors']}"
+                    )
+        finally:
+            driver.close()
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "config": {k: v for k, v in vars(args).items() if k not in ("baseline", "output")},
+        },
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=4)
+    print(f"Report saved at: {args.output}")
+
+    failures = [f"{key}: {row['errors']} failed requests" for key, row in results.items() if row["errors"]]
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        budget = {"latency": args.latency_budget, "throughput": args.throughput_budget, "rss": args.rss_budget}
+        failures += compare(results, baseline, budget)
+    if failures:
+        print("Serving regressions:\n  " + "\n  ".join(failures))
+        sys.exit(1)
@@ -1,13 +1,19 @@
 from src.milk_quality.components.model_trainer import ModelTrainer
+from src.milk_quality.components.data_transformation import DataTransformationConfig
+from src.milk_quality.stage_cache import stage_cache
 
 if __name__ == "__main__":
     trainer = ModelTrainer()
     model_path, model_name, f1 = trainer.train_and_evaluate(
-        train_csv_path="artifacts/train.csv",
-        test_csv_path="artifacts/test.csv",
+        train_csv_path=DataTransformationConfig.train_csv_path,
+        test_csv_path=DataTransformationConfig.test_csv_path,
         encoder_path="artifacts/label_encoder.pkl",
     )
     print("✅ Model training complete.")
     print(f"🔹 Best model: {model_name}")
     print(f"🎯 F1 Score: {f1}")
     print(f"📦 Model saved at: {model_path}")
+
+    summary = stage_cache.log_summary()
+    for record in summary["stages"]:
+        print(f"⚡ Stage {record['stage']}: {record['status']} ({record['saved_seconds']:.2f}s saved)")
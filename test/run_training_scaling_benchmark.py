@@ -0,0 +1,296 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+from collections import defaultdict
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TRAIN_CSV = os.path.join(ROOT, "artifacts", "train.csv")
+# LabelEncoder order of the grades encoded in train.csv
+GRADE_LABELS = ("high", "low", "medium")
+
+
+def rss_kb() -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1])
+    return 0
+
+
+class PeakRss:
+    """
+    Peak RSS above the starting RSS while the block runs, sampled every few ms.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.start_kb = self.peak_kb = 0
+        self._stop = threading.Event()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_kb = max(self.peak_kb, rss_kb())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.start_kb = self.peak_kb = rss_kb()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_kb = max(self.peak_kb, rss_kb())
+
+    @property
+    def growth_mb(self) -> float:
+        return (self.peak_kb - self.start_kb) / 1024
+
+
+def synthetic_milk(n_rows: int, missing_rate: float, seed: int = 0) -> pd.DataFrame:
+    """
+    Raw milk rows drawn from train.csv: grades in their observed proportions and
+    each feature from its empirical distribution within the grade, so the data
+    stays learnable while rows are new combinations. A missing_rate share of
+    feature values is blanked to exercise the mode imputation.
+    """
+    rng = np.random.default_rng(seed)
+    source = pd.read_csv(TRAIN_CSV)
+    features = [column for column in source.columns if column != "Grade"]
+    grades = source["Grade"].to_numpy()
+    codes, counts = np.unique(grades, return_counts=True)
+    drawn = rng.choice(codes, size=n_rows, p=counts / counts.sum())
+
+    columns = {}
+    for feature in features:
+        values = np.empty(n_rows, dtype=np.float64)
+        for code in codes:
+            rows = drawn == code
+            pool = source.loc[grades == code, feature].to_numpy(dtype=np.float64)
+            values[rows] = rng.choice(pool, size=int(rows.sum()))
+        if missing_rate:
+            values[rng.random(n_rows) < missing_rate] = np.nan
+        columns[feature] = values
+    columns["Grade"] = np.asarray(GRADE_LABELS)[drawn]
+    return pd.DataFrame(columns)
+
+
+class StepTimer:
+    """
+    Wrap functions so every call adds its wall time to a named step.
+
+    Calls made concurrently (the candidates fit on threads) add up, so a step
+    can exceed the stage's wall time.
+    """
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def wrap(self, step: str, fn):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.seconds[step] += time.perf_counter() - start
+                    self.calls[step] += 1
+
+        return timed
+
+    def patch(self, owner, name: str, step: str):
+        setattr(owner, name, self.wrap(step, getattr(owner, name)))
+
+    def report(self) -> dict:
+        return {step: {"seconds": self.seconds[step], "calls": self.calls[step]} for step in self.seconds}
+
+
+def run_child(n_rows: int, missing_rate: float) -> dict:
+    """
+    Run both stages once on n_rows synthetic rows in the current directory.
+    """
+    from src.milk_quality.components import data_transformation, model_trainer
+    from src.milk_quality.components.data_transformation import DataTransformation
+    from src.milk_quality.components.model_trainer import ModelTrainer
+    from src.milk_quality.components.preprocessor import FeaturePreprocessor
+
+    df = synthetic_milk(n_rows, missing_rate)
+
+    transformation_timer = StepTimer()
+    transformation_timer.patch(data_transformation, "enforce_schema", "schema")
+    transformation_timer.patch(data_transformation, "train_test_split", "split")
+    transformation_timer.patch(FeaturePreprocessor, "fit", "mode_imputation")
+    transformation_timer.patch(FeaturePreprocessor, "transform", "mode_imputation")
+    transformation_timer.patch(data_transformation, "write_dataset", "csv_write")
+    transformation_timer.patch(data_transformation, "save_object", "save_artifacts")
+
+    with PeakRss() as transformation_rss:
+        start = time.perf_counter()
+        train_path, test_path, encoder_path = DataTransformation().initiate_data_transformation(df)
+        transformation_seconds = time.perf_counter() - start
+    del df
+
+    trainer = ModelTrainer()
+    training_timer = StepTimer()
+    training_timer.patch(model_trainer, "read_dataset", "csv_read")
+    training_timer.patch(model_trainer, "enforce_schema", "schema")
+    training_timer.patch(model_trainer, "f1_score", "f1")
+    training_timer.patch(model_trainer, "save_object", "save_model")
+    training_timer.patch(model_trainer, "export_model", "export_model")
+
+    with PeakRss() as training_rss:
+        start = time.perf_counter()
+        _, best_model, best_f1 = trainer.train_and_evaluate(train_path, test_path, encoder_path, search=False)
+        training_seconds = time.perf_counter() - start
+
+    # fit_candidate times fit and predict itself; per candidate, from the metrics report
+    with open(trainer.config.metrics_path) as f:
+        candidates = json.load(f)["candidates"]
+    training_steps = training_timer.report()
+    for name, metrics in candidates.items():
+        training_steps[f"fit_{name}"] = {"seconds": metrics["fit_seconds"], "calls": 1}
+        training_steps[f"predict_{name}"] = {"seconds": metrics["predict_seconds"], "calls": 1}
+
+    return {
+        "rows": n_rows,
+        "data_transformation": {
+            "seconds": transformation_seconds,
+            "peak_rss_growth_mb": transformation_rss.growth_mb,
+            "steps": transformation_timer.report(),
+        },
+        "model_training": {
+            "seconds": training_seconds,
+            "peak_rss_growth_mb": training_rss.growth_mb,
+            "steps": training_steps,
+            "best_model": best_model,
+            "best_test_f1": best_f1,
+        },
+        "peak_rss_mb": rss_kb() / 1024,
+    }
+
+
+def run_size(n_rows: int, missing_rate: float, timeout: float) -> dict:
+    """
+    Benchmark one size in a fresh interpreter and scratch directory, so peak
+    memory and caches are per size.
+    """
+    workdir = tempfile.mkdtemp(prefix=f"milk_scaling_{n_rows}_")
+    env = dict(os.environ, PYTHONPATH=ROOT, MILK_STAGE_CACHE="0", MILK_DATASET_FORMAT="csv")
+    try:
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", str(n_rows), "--missing-rate", str(missing_rate)],
+            cwd=workdir,
+            env=env,
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+        )
+        if proc.returncode != 0:
+            return {"rows": n_rows, "error": proc.stderr[-2000:]}
+        return json.loads(proc.stdout.strip().splitlines()[-1])
+    except subprocess.TimeoutExpired:
+        return {"rows": n_rows, "error": f"timed out after {timeout:.0f}s"}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def scaling_exponents(runs: list) -> dict:
+    """
+    Log-log slope of each stage and step's time between consecutive sizes:
+    about 1 is linear, clearly above 1 means it is outgrowing the data.
+    """
+    ok = [run for run in runs if "error" not in run]
+    series = defaultdict(dict)
+    for run in ok:
+        for stage in ("data_transformation", "model_training"):
+            series[stage][run["rows"]] = run[stage]["seconds"]
+            for step, timing in run[stage]["steps"].items():
+                series[f"{stage}.{step}"][run["rows"]] = timing["seconds"]
+
+    exponents = {}
+    for name, points in series.items():
+        sizes = sorted(points)
+        slopes = [
+            float(np.log(points[b] / points[a]) / np.log(b / a))
+            for a, b in zip(sizes, sizes[1:])
+            # Steps that take well under a millisecond are all noise
+            if points[a] > 1e-3 and points[b] > 1e-3
+        ]
+        if slopes:
+            exponents[name] = {"per_interval": slopes, "last": slopes[-1]}
+    return exponents
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Scaling curves of the data transformation and model training stages."
+    )
+    parser.add_argument(
+        "--sizes", nargs="+", type=float, default=[1e3, 1e4, 1e5, 1e6],
+        help="Row counts to benchmark; add 1e7 on a machine with enough memory and time",
+    )
+    parser.add_argument("--missing-rate", type=float, default=0.01)
+    parser.add_argument("--timeout", type=float, default=3600, help="Seconds allowed per size")
+    parser.add_argument("--superlinear-threshold", type=float, default=1.2)
+    parser.add_argument("--output", default=os.path.join(ROOT, "artifacts", "training_scaling_benchmark.json"))
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child, args.missing_rate)))
+        sys.exit(0)
+
+    runs = []
+    for size in args.sizes:
+        run = run_size(int(size), args.missing_rate, args.timeout)
+        runs.append(run)
+        if "error" in run:
+            print(f"{run['rows']:>10} rows: failed: {run['error'].splitlines()[-1] if run['error'] else ''}")
+            continue
+        transformation, training = run["data_transformation"], run["model_training"]
+        print(
+            f"{run['rows']:>10} rows: transformation {transformation['seconds']:8.2f}s "
+            f"(+{transformation['peak_rss_growth_mb']:.0f}MB), training {training['seconds']:8.2f}s "
+            f"(+{training['peak_rss_growth_mb']:.0f}MB), peak RSS {run['peak_rss_mb']:.0f}MB, "
+            f"F1 {training['best_test_f1']:.3f}"
+        )
+        for stage in (transformation, training):
+            steps = sorted(stage["steps"].items(), key=lambda item: -item[1]["seconds"])
+            print("    " + ", ".join(f"{step} {timing['seconds']:.3f}s" for step, timing in steps))
+
+    exponents = scaling_exponents(runs)
+    superlinear = {
+        name: values["last"] for name, values in exponents.items()
+        if values["last"] > args.superlinear_threshold
+    }
+    if exponents:
+        print("Scaling exponents over the last interval (1.0 = linear):")
+        for name, values in sorted(exponents.items(), key=lambda item: -item[1]["last"]):
+            flag = "  <- superlinear" if name in superlinear else ""
+            print(f"    {name:<44} {values['last']:5.2f}{flag}")
+
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "cpu_count": os.cpu_count(),
+        "missing_rate": args.missing_rate,
+        "runs": runs,
+        "scaling_exponents": exponents,
+        "superlinear": superlinear,
+    }
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=4)
+    print(f"Report saved at: {args.output}")
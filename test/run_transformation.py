@@ -1,10 +1,12 @@
-import pandas as pd
 from src.milk_quality.components.data_transformation import DataTransformation
+from src.milk_quality.components.data_ingestion import DataIngestionConfig
+from src.milk_quality.dataset_io import read_dataset
+from src.milk_quality.stage_cache import stage_cache
 
 if __name__ == "__main__":
     try:
         # Load raw data from ingestion step
-        df = pd.read_csv("artifacts/raw.csv")
+        df = read_dataset(DataIngestionConfig.raw_data_path)
         print(f"✅ Raw Data Shape: {df.shape}")
         print("📋 First 5 Rows:")
         print(df.head())
@@ -14,9 +16,13 @@ if __name__ == "__main__":
         train_csv, test_csv, encoder_path = transformer.initiate_data_transformation(df)
 
         print("\n✅ Data transformation completed.")
-        print(f"🔹 Train CSV saved at: {train_csv}")
-        print(f"🔹 Test CSV saved at: {test_csv}")
+        print(f"🔹 Train data saved at: {train_csv}")
+        print(f"🔹 Test data saved at: {test_csv}")
         print(f"🔹 LabelEncoder saved at: {encoder_path}")
 
+        summary = stage_cache.log_summary()
+        for record in summary["stages"]:
+            print(f"⚡ Stage {record['stage']}: {record['status']} ({record['saved_seconds']:.2f}s saved)")
+
     except Exception as e:
         print("❌ Data transformation failed:", e)